@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+'''
+Benchmark of the analysis of articles by ppaxe: sentence splitting and
+annotation, and candidate extraction and prediction. Reports the time of each
+step and sentences per second.
+
+    python benchmarks/pipeline.py [text files...] [--repeat N] [--server URL | --replay FILE]
+
+By default, the texts are annotated by the stand-in of the StanfordCoreNLP
+server in the same process (ppaxe.standin), so the benchmark runs offline and
+measures ppaxe alone. Without files, the texts of the regression corpus of the
+tests are used.
+'''
+from ppaxe import core
+from ppaxe.corenlp import CoreNLPClient
+from ppaxe.replay import RecordReplay
+from ppaxe.standin import StandInAnnotator
+import argparse
+import io
+import json
+import os
+import time
+
+CORPUS = os.path.join(os.path.dirname(__file__), "..", "tests", "data", "sentences.json")
+
+
+def read_texts(paths):
+    '''
+    Returns the texts to analyze: the content of each file in paths, or the
+    texts of the regression corpus if paths is empty.
+    '''
+    if not paths:
+        with io.open(CORPUS, encoding="utf-8") as fh:
+            return [case['text'] for case in json.load(fh)]
+    texts = list()
+    for path in paths:
+        with io.open(path, encoding="utf-8", errors="replace") as fh:
+            texts.append(fh.read())
+    return texts
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of the analysis of articles by ppaxe.")
+    parser.add_argument('files', nargs='*', help="Text files to analyze (e.g. full texts of articles).")
+    parser.add_argument('-n', '--repeat', type=int, default=5, help="Times each text is analyzed. Default: 5")
+    parser.add_argument('--server', help="Address of a StanfordCoreNLP server to annotate the texts.", default=None)
+    parser.add_argument('--replay', help="File of responses recorded with ppaxe --nlp-record (or PPAXE_RECORD) to annotate the texts.", default=None)
+    parser.add_argument('--splitter', help='"regex" or "corenlp" (see ppaxe --splitter). Default: regex', choices=["corenlp", "regex"], default="regex")
+    options = parser.parse_args()
+
+    if options.replay:
+        annotator = RecordReplay(options.replay)
+    elif options.server:
+        annotator = CoreNLPClient(options.server)
+    else:
+        annotator = StandInAnnotator()
+    texts = read_texts(options.files)
+    sentences  = 0
+    candidates = 0
+    annotation = 0.0
+    prediction = 0.0
+    for i in range(options.repeat):
+        for text in texts:
+            article = core.Article(pmid="0", fulltext=text)
+            start = time.time()
+            article.annotate(splitter=options.splitter, client=annotator)
+            annotation += time.time() - start
+            start = time.time()
+            for sentence in article.sentences:
+                sentences += 1
+                sentence.get_candidates()
+                for candidate in sentence.candidates:
+                    candidates += 1
+                    candidate.predict()
+            prediction += time.time() - start
+    print("%s: %s texts, %s repeats" % (annotator, len(texts), options.repeat))
+    print("%s sentences, %s candidates" % (sentences, candidates))
+    print("annotation: %.3f s, %.0f sentences/s" % (annotation, sentences / annotation))
+    print("candidates and prediction: %.3f s, %.0f sentences/s" % (prediction, sentences / prediction))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+'''
+Microbenchmark of the sentence splitter: split_spans and the text of each span
+(as read by Sentence.originaltext). Reports sentences per second.
+
+    python benchmarks/splitter.py [text files...] [--repeat N]
+
+Without files, the texts of the regression corpus of the tests are used.
+'''
+from ppaxe.splitter import split_spans
+import argparse
+import io
+import json
+import os
+import time
+
+CORPUS = os.path.join(os.path.dirname(__file__), "..", "tests", "data", "sentences.json")
+
+
+def read_texts(paths):
+    '''
+    Returns the texts to split: the content of each file in paths, or the
+    texts of the regression corpus if paths is empty.
+    '''
+    if not paths:
+        with io.open(CORPUS, encoding="utf-8") as fh:
+            return [case['text'] for case in json.load(fh)]
+    texts = list()
+    for path in paths:
+        with io.open(path, encoding="utf-8", errors="replace") as fh:
+            texts.append(fh.read())
+    return texts
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark of the sentence splitter.")
+    parser.add_argument('files', nargs='*', help="Text files to split (e.g. full texts of articles).")
+    parser.add_argument('-n', '--repeat', type=int, default=20, help="Times each text is split. Default: 20")
+    options = parser.parse_args()
+
+    texts = read_texts(options.files)
+    chars = sum(len(text) for text in texts)
+    sentences = 0
+    start = time.time()
+    for i in range(options.repeat):
+        for text in texts:
+            for first, last in split_spans(text):
+                sentence = text[first:last]
+                sentences += 1
+    elapsed = time.time() - start
+    print("%s texts, %s characters, %s repeats" % (len(texts), chars, options.repeat))
+    print("%s sentences in %.3f s" % (sentences, elapsed))
+    print("%.0f sentences/s, %.2f MB/s" % (sentences / elapsed, chars * options.repeat / elapsed / 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+'''
+Benchmark of the output formats of the StanfordCoreNLP server. Reports the size
+of the responses and the time to decode them (and to annotate the texts, with
+--server) per sentence.
+
+    python benchmarks/wire.py [text files...] [--repeat N] [--server URL]
+
+Without --server, the responses are built from the sentences of the texts, with
+the words split at spaces: "json (default)" is the indented output with all the
+fields of the tokens, decoded with json.loads as ppaxe did before, and "json" and
+"conll" are the formats of ppaxe.corenlp.OUTPUT_FORMATS decoded to Tokens.
+Without files, the texts of the regression corpus of the tests are used.
+'''
+from ppaxe.corenlp import CoreNLPClient, OUTPUT_FORMATS, decode
+from ppaxe.splitter import split_sentences
+import argparse
+import io
+import json
+import os
+import re
+import time
+
+CORPUS = os.path.join(os.path.dirname(__file__), "..", "tests", "data", "sentences.json")
+
+
+def read_texts(paths):
+    '''
+    Returns the texts to annotate: the content of each file in paths, or the
+    texts of the regression corpus if paths is empty.
+    '''
+    if not paths:
+        with io.open(CORPUS, encoding="utf-8") as fh:
+            return [case['text'] for case in json.load(fh)]
+    texts = list()
+    for path in paths:
+        with io.open(path, encoding="utf-8", errors="replace") as fh:
+            texts.append(fh.read())
+    return texts
+
+def corenlp_tokens(text):
+    '''
+    Returns the tokens of text (split at spaces) with the fields of the JSON
+    output of StanfordCoreNLP
+    '''
+    tokens = list()
+    for match in re.finditer(r"\S+", text):
+        word = match.group()
+        tokens.append({
+            'index': len(tokens) + 1, 'word': word, 'originalText': word, 'lemma': word.lower(),
+            'characterOffsetBegin': match.start(), 'characterOffsetEnd': match.end(),
+            'pos': "NN", 'ner': "P" if word.isupper() else "O", 'before': " ", 'after': " "
+        })
+    return tokens
+
+def responses(text):
+    '''
+    Returns a dictionary with the response for text in each format
+    '''
+    sentences = [ corenlp_tokens(sentence) for sentence in split_sentences(text) ]
+    document = {'sentences': [ {'index': idx, 'tokens': tokens} for idx, tokens in enumerate(sentences) ]}
+    conll = list()
+    for tokens in sentences:
+        for token in tokens:
+            conll.append("%(index)s\t%(word)s\t%(lemma)s\t%(pos)s\t%(ner)s\t%(characterOffsetBegin)s\t%(characterOffsetEnd)s" % token)
+        conll.append("")
+    return dict({
+        'json (default)': json.dumps(document, indent=2),
+        'json': json.dumps(document),
+        'conll': "\n".join(conll) + "\n"
+    })
+
+def report(name, sizes, elapsed, sentences, repeat):
+    print("%-16s %8.0f bytes/sentence %8.1f us/sentence" % (
+        name, sizes / float(sentences), elapsed * 1e6 / (sentences * repeat)))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of the output formats of the StanfordCoreNLP server.")
+    parser.add_argument('files', nargs='*', help="Text files to annotate (e.g. full texts of articles).")
+    parser.add_argument('-n', '--repeat', type=int, default=20, help="Times each response is decoded. Default: 20")
+    parser.add_argument('--server', help="Address of a StanfordCoreNLP server to annotate the texts with each format.", default=None)
+    options = parser.parse_args()
+
+    texts = read_texts(options.files)
+    sentences = sum(1 for text in texts for sentence in split_sentences(text))
+    print("%s texts, %s sentences, %s repeats" % (len(texts), sentences, options.repeat))
+    payloads = [ responses(text) for text in texts ]
+    for name in ('json (default)', 'json', 'conll'):
+        size = sum(len(payload[name].encode('utf-8')) for payload in payloads)
+        start = time.time()
+        for i in range(options.repeat):
+            for payload in payloads:
+                if name == 'json (default)':
+                    json.loads(payload[name])
+                else:
+                    decode(payload[name], name)
+        report(name, size, time.time() - start, sentences, options.repeat)
+    if options.server:
+        print("Annotation by %s" % options.server)
+        client = CoreNLPClient(options.server)
+        start = time.time()
+        size  = 0
+        for text in texts:
+            response = client.annotate(text)
+            size += len(response.encode('utf-8'))
+            json.loads(response)
+        report('json (default)', size, time.time() - start, sentences, 1)
+        for name, properties in OUTPUT_FORMATS.items():
+            start = time.time()
+            size  = 0
+            for text in texts:
+                response = client.annotate(text, properties=properties)
+                size += len(response.encode('utf-8'))
+                decode(response, name)
+            report(name, size, time.time() - start, sentences, 1)
+
+
+if __name__ == "__main__":
+    main()
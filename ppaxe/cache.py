@@ -0,0 +1,374 @@
+'''
+Persistent on-disk caches for ppaxe
+'''
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+
+# Seconds before a cached article (or "not found" identifier) has to be downloaded again
+ARTICLE_TTL  = 30 * 24 * 3600
+NOTFOUND_TTL = 7 * 24 * 3600
+
+# Maximum bytes of compressed annotations kept in an AnnotationCache
+ANNOTATION_MAX_SIZE = 2 * 1024 ** 3
+
+
+# CLASSES
+# ----------------------------------------------
+class ArticleCache(object):
+    '''
+    SQLite store of downloaded articles, keyed by database (PMC or PUBMED) and
+    PubMed/PMC identifier. Texts are stored zlib-compressed, with the time they
+    were downloaded. Identifiers that were not found are also stored (negative
+    cache) so they are not requested again until they expire.
+
+    Attributes
+    ----------
+    path : str, no default
+        Path to the SQLite database file.
+
+    ttl : float, no default
+        Seconds an article is kept in the cache. None to keep it forever.
+
+    notfound_ttl : float, no default
+        Seconds an identifier is kept in the negative cache. None to keep it forever.
+    '''
+    def __init__(self, path, ttl=ARTICLE_TTL, notfound_ttl=NOTFOUND_TTL):
+        '''
+        Parameters
+        ----------
+        path : str, required, no default
+            Path to the SQLite database file. Created if it does not exist.
+
+        ttl : float, optional, default = ARTICLE_TTL (30 days)
+            Seconds an article is kept in the cache. None to keep it forever.
+
+        notfound_ttl : float, optional, default = NOTFOUND_TTL (7 days)
+            Seconds an identifier is kept in the negative cache. None to keep it forever.
+        '''
+        self.path = path
+        self.ttl  = ttl
+        self.notfound_ttl = notfound_ttl
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self.conn:
+            self.conn.execute(
+                """CREATE TABLE IF NOT EXISTS articles (
+                    database TEXT NOT NULL,
+                    pmid     TEXT NOT NULL,
+                    pmcid    TEXT,
+                    fetched  REAL NOT NULL,
+                    data     BLOB NOT NULL,
+                    PRIMARY KEY (database, pmid)
+                )"""
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS articles_pmcid ON articles (database, pmcid)")
+            self.conn.execute(
+                """CREATE TABLE IF NOT EXISTS notfound (
+                    database   TEXT NOT NULL,
+                    identifier TEXT NOT NULL,
+                    fetched    REAL NOT NULL,
+                    PRIMARY KEY (database, identifier)
+                )"""
+            )
+        self.evict()
+
+    def __oldest(self, ttl):
+        '''
+        Returns the oldest download time still valid for ttl.
+        '''
+        if ttl is None:
+            return float("-inf")
+        return time.time() - ttl
+
+    def evict(self):
+        '''
+        Removes the expired articles and identifiers from the cache.
+        '''
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM articles WHERE fetched < ?", (self.__oldest(self.ttl),))
+            self.conn.execute("DELETE FROM notfound WHERE fetched < ?", (self.__oldest(self.notfound_ttl),))
+
+    def get(self, database, identifier):
+        '''
+        Returns the cached article for identifier as a dictionary (keys: pmid, pmcid,
+        journal, year, fulltext, abstract), or None if it is not in the cache.
+
+        Parameters
+        ----------
+        database : str, required, no default
+            Database of the article (PMC or PUBMED).
+
+        identifier : str, required, no default
+            PubMed identifier or PMC identifier (with "PMC" prefix).
+        '''
+        if identifier.upper().startswith("PMC"):
+            query = "SELECT data FROM articles WHERE database = ? AND pmcid = ? AND fetched >= ?"
+            identifier = identifier[3:]
+        else:
+            query = "SELECT data FROM articles WHERE database = ? AND pmid = ? AND fetched >= ?"
+        with self.lock:
+            row = self.conn.execute(query, (database, identifier, self.__oldest(self.ttl))).fetchone()
+        if row is None:
+            return None
+        return json.loads(zlib.decompress(row[0]).decode('utf-8'))
+
+    def is_notfound(self, database, identifier):
+        '''
+        Returns True if identifier is in the negative cache.
+
+        Parameters
+        ----------
+        database : str, required, no default
+            Database of the article (PMC or PUBMED).
+
+        identifier : str, required, no default
+            Identifier as it was requested.
+        '''
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT 1 FROM notfound WHERE database = ? AND identifier = ? AND fetched >= ?",
+                (database, identifier, self.__oldest(self.notfound_ttl))
+            ).fetchone()
+        return row is not None
+
+    def put(self, database, records):
+        '''
+        Stores articles in the cache (in a single transaction).
+
+        Parameters
+        ----------
+        database : str, required, no default
+            Database of the articles (PMC or PUBMED).
+
+        records : list, required, no default
+            Articles as dictionaries (keys: pmid, pmcid, journal, year, fulltext, abstract).
+        '''
+        now  = time.time()
+        rows = list()
+        for record in records:
+            if record['pmid'] is None:
+                continue
+            data = zlib.compress(json.dumps(record).encode('utf-8'))
+            rows.append((database, record['pmid'], record['pmcid'], now, sqlite3.Binary(data)))
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO articles (database, pmid, pmcid, fetched, data) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self.conn.executemany(
+                "DELETE FROM notfound WHERE database = ? AND identifier = ?",
+                [(database, row[1]) for row in rows]
+            )
+
+    def put_notfound(self, database, identifiers):
+        '''
+        Stores identifiers in the negative cache.
+
+        Parameters
+        ----------
+        database : str, required, no default
+            Database of the articles (PMC or PUBMED).
+
+        identifiers : iterable, required, no default
+            Identifiers that were not found.
+        '''
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO notfound (database, identifier, fetched) VALUES (?, ?, ?)",
+                [(database, identifier, now) for identifier in identifiers]
+            )
+
+    def close(self):
+        '''
+        Closes the connection to the database file.
+        '''
+        self.conn.close()
+
+
+class AnnotationCache(object):
+    '''
+    SQLite store of StanfordCoreNLP annotations, keyed by a hash of the annotated
+    text, the properties of the request and the identity of the models of the
+    server. The tokens of each sentence of the text are stored zlib-compressed.
+    When the stored annotations exceed max_size bytes, the least recently used
+    ones are removed. The times of use of the annotations read are kept in
+    memory and written with the next put (or by flush or close).
+
+    Attributes
+    ----------
+    path : str, no default
+        Path to the SQLite database file.
+
+    model : str, no default
+        Identity of the models of the server (e.g. the server properties or the
+        version of the NER model). Annotations of other models are not used.
+
+    max_size : int, no default
+        Maximum bytes of compressed annotations. None for no limit.
+
+    size : int, no default
+        Bytes of compressed annotations stored.
+
+    hits : int, no default
+        Texts found in the cache.
+
+    misses : int, no default
+        Texts not found in the cache.
+
+    used : dict, no default
+        Times of use of the annotations read, by key, not written yet.
+    '''
+    def __init__(self, path, model="", max_size=ANNOTATION_MAX_SIZE):
+        '''
+        Parameters
+        ----------
+        path : str, required, no default
+            Path to the SQLite database file. Created if it does not exist.
+
+        model : str, optional, default = ""
+            Identity of the models of the server.
+
+        max_size : int, optional, default = ANNOTATION_MAX_SIZE (2 GB)
+            Maximum bytes of compressed annotations. None for no limit.
+        '''
+        self.path     = path
+        self.model    = model
+        self.max_size = max_size
+        self.hits     = 0
+        self.misses   = 0
+        self.used     = dict()
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self.conn:
+            self.conn.execute(
+                """CREATE TABLE IF NOT EXISTS annotations (
+                    key  TEXT PRIMARY KEY,
+                    used REAL NOT NULL,
+                    size INTEGER NOT NULL,
+                    data BLOB NOT NULL
+                )"""
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS annotations_used ON annotations (used)")
+        self.size = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM annotations").fetchone()[0]
+        self.evict()
+
+    def key(self, text, properties=None):
+        '''
+        Returns the key of the annotations of text.
+
+        Parameters
+        ----------
+        text : str, required, no default
+            Annotated text.
+
+        properties : dict, optional, default = None
+            Properties of the StanfordCoreNLP request.
+        '''
+        digest = hashlib.sha1()
+        digest.update(self.model.encode('utf-8'))
+        digest.update(b"\0")
+        digest.update(json.dumps(properties, sort_keys=True).encode('utf-8'))
+        digest.update(b"\0")
+        digest.update(text.encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, text, properties=None):
+        '''
+        Returns the annotations of text as a list with the tokens of each sentence,
+        or None if they are not in the cache.
+
+        Parameters
+        ----------
+        text : str, required, no default
+            Annotated text.
+
+        properties : dict, optional, default = None
+            Properties of the StanfordCoreNLP request.
+        '''
+        key = self.key(text, properties)
+        with self.lock:
+            row = self.conn.execute("SELECT data FROM annotations WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.used[key] = time.time()
+        return json.loads(zlib.decompress(row[0]).decode('utf-8'))
+
+    def put(self, items, properties=None):
+        '''
+        Stores annotations in the cache (in a single transaction) and removes the
+        least recently used ones if the cache is too large.
+
+        Parameters
+        ----------
+        items : list, required, no default
+            List of (text, sentences) tuples, where sentences is a list with the
+            tokens of each sentence of text.
+
+        properties : dict, optional, default = None
+            Properties of the StanfordCoreNLP requests.
+        '''
+        now  = time.time()
+        rows = list()
+        for text, sentences in items:
+            data = zlib.compress(json.dumps(sentences).encode('utf-8'))
+            rows.append((self.key(text, properties), now, len(data), sqlite3.Binary(data)))
+        with self.lock, self.conn:
+            self.__write_used()
+            for row in rows:
+                old = self.conn.execute("SELECT size FROM annotations WHERE key = ?", (row[0],)).fetchone()
+                if old is not None:
+                    self.size -= old[0]
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO annotations (key, used, size, data) VALUES (?, ?, ?, ?)",
+                    row
+                )
+                self.size += row[2]
+        self.evict()
+
+    def flush(self):
+        '''
+        Writes the times of use of the annotations read since the last put.
+        '''
+        with self.lock, self.conn:
+            self.__write_used()
+
+    def __write_used(self):
+        '''
+        Updates the times of use of the annotations read (the lock must be
+        held, inside a transaction).
+        '''
+        if self.used:
+            self.conn.executemany("UPDATE annotations SET used = ? WHERE key = ?", [ (used, key) for key, used in self.used.items() ])
+            self.used.clear()
+
+    def evict(self):
+        '''
+        Removes the least recently used annotations until the cache is 10% below
+        max_size, if it is larger than max_size.
+        '''
+        if self.max_size is None or self.size <= self.max_size:
+            return
+        target = self.max_size * 0.9
+        with self.lock, self.conn:
+            keys = list()
+            for key, size in self.conn.execute("SELECT key, size FROM annotations ORDER BY used"):
+                if self.size <= target:
+                    break
+                keys.append((key,))
+                self.size -= size
+            self.conn.executemany("DELETE FROM annotations WHERE key = ?", keys)
+
+    def close(self):
+        '''
+        Writes the times of use of the annotations read and closes the
+        connection to the database file.
+        '''
+        self.flush()
+        self.conn.close()
@@ -0,0 +1,153 @@
+'''
+Checkpoints of ppaxe runs, so interrupted runs can be resumed
+'''
+import io
+import os
+
+
+# CLASSES
+# ----------------------------------------------
+class Checkpoint(object):
+    '''
+    Output file of a run together with a journal of the articles already
+    analyzed. Each line of the journal has the identifier of a completed
+    article (or of an identifier not found) and the size of the output file
+    after writing its interactions. The output is synced to disk before every
+    journal line (if it grew) and the journal after it, so after a crash the
+    output can be truncated to the last completed article and the run continued
+    from there, without duplicated or partial lines.
+
+    Attributes
+    ----------
+    path : str, no default
+        Path to the output file.
+
+    journal_path : str, no default
+        Path to the journal file.
+
+    done : set, no default
+        Identifiers of the completed articles.
+
+    output : file, no default
+        Output file open for writing.
+
+    synced : int, no default
+        Size of the output the last time it was synced to disk.
+    '''
+    def __init__(self, path, resume=False, journal_path=None):
+        '''
+        Parameters
+        ----------
+        path : str, required, no default
+            Path to the output file.
+
+        resume : bool, optional, default = False
+            Continue the run recorded in the journal: completed articles are
+            read from it and new lines are appended to the output. If False,
+            output and journal are overwritten. Raises CheckpointError if the
+            output is not empty and there is no journal.
+
+        journal_path : str, optional, default = None
+            Path to the journal file. path + ".journal" if None.
+        '''
+        self.path = path
+        self.journal_path = journal_path if journal_path is not None else path + ".journal"
+        self.done = set()
+        if resume is True and not os.path.exists(self.journal_path) and os.path.exists(path) and os.path.getsize(path) > 0:
+            raise CheckpointError("Can't resume %s: journal %s not found" % (path, self.journal_path))
+        if resume is True and os.path.exists(self.journal_path):
+            offset = self.__read_journal()
+            if os.path.exists(path):
+                # Remove the lines of articles not completed
+                with open(path, "r+b") as fh:
+                    fh.truncate(min(offset, os.path.getsize(path)))
+            mode = "a"
+        else:
+            mode = "w"
+        self.output  = io.open(path, mode + "b")
+        self.journal = io.open(self.journal_path, mode + "b")
+        self.synced  = self.output.tell()
+
+    def __read_journal(self):
+        '''
+        Reads the completed articles from the journal and returns the size of the
+        output after the last one. An incomplete last line (the run died while
+        writing it) is removed from the journal.
+        '''
+        offset = 0
+        valid  = 0
+        with open(self.journal_path, "rb") as fh:
+            for line in fh:
+                fields = line.rstrip(b"\n").split(b"\t")
+                if not line.endswith(b"\n") or len(fields) != 2 or not fields[1].isdigit():
+                    break
+                self.done.add(fields[0].decode('utf-8'))
+                offset = int(fields[1])
+                valid += len(line)
+        with open(self.journal_path, "r+b") as fh:
+            fh.truncate(valid)
+        return offset
+
+    def write(self, line):
+        '''
+        Writes line (str) to the output.
+        '''
+        self.output.write(line.encode('utf-8'))
+
+    def commit(self, identifier):
+        '''
+        Marks the article identifier as completed, once its lines are on disk.
+
+        Parameters
+        ----------
+        identifier : str, required, no default
+            Identifier of the article.
+        '''
+        self.__journal([identifier])
+
+    def commit_notfound(self, identifiers):
+        '''
+        Marks identifiers without article (not found) as completed, so they are
+        not queried again when the run is resumed.
+
+        Parameters
+        ----------
+        identifiers : iterable, required, no default
+            Identifiers not found.
+        '''
+        self.__journal(identifiers)
+
+    def __journal(self, identifiers):
+        '''
+        Writes a journal line for each identifier after syncing the output to
+        disk, and syncs the journal.
+        '''
+        identifiers = list(identifiers)
+        self.output.flush()
+        offset = self.output.tell()
+        if offset > self.synced:
+            os.fsync(self.output.fileno())
+            self.synced = offset
+        self.journal.write(b"".join([ ("%s\t%s\n" % (identifier, offset)).encode('utf-8') for identifier in identifiers ]))
+        self.journal.flush()
+        os.fsync(self.journal.fileno())
+        self.done.update(identifiers)
+
+    def close(self):
+        '''
+        Closes output and journal.
+        '''
+        self.output.close()
+        self.journal.close()
+
+    def __contains__(self, identifier):
+        return identifier in self.done
+
+
+# EXCEPTIONS
+# ----------------------------------------------
+class CheckpointError(Exception):
+    '''
+    Exception raised when a run can't be resumed.
+    '''
+    pass
@@ -4,62 +4,267 @@ Core classes for ppaxe ppi predictor
 '''
 
 import requests
+from requests.packages.urllib3.exceptions import HTTPError as Urllib3Error
 from xml.dom import minidom
 import json
 import re
-import time
-from pycorenlp import StanfordCoreNLP
 import itertools
-from bisect import bisect_left
+import functools
+from bisect import bisect_left, bisect_right
 import math
 import sys
 import pkg_resources
 from scipy import sparse
 import logging
 import warnings
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from ppaxe import ncbi
+from ppaxe.cache import ArticleCache
+from ppaxe.corenlp import CoreNLPClient, ServerError, ServerUnavailable, OUTPUT_FORMATS, decode
+from ppaxe.idmap import PMCIdIndex
+from ppaxe.splitter import split_spans, unescape
+from ppaxe.tokens import Tokens, LEMMAS, POS, NER
 warnings.filterwarnings("ignore", category=UserWarning)
 
 try:
     # For python 2.7
     import cPickle as pickle
-    from HTMLParser import HTMLParser
     reload(sys)
     sys.setdefaultencoding('utf8')
 except:
     # For python 3
-    import html
     import _pickle as pickle
     from importlib import reload
 
+try:
+    import queue
+except ImportError:
+    # For python 2.7
+    import Queue as queue
 
-NLP = StanfordCoreNLP('http://localhost:9000')
+try:
+    import xml.etree.cElementTree as ElementTree
+except ImportError:
+    import xml.etree.ElementTree as ElementTree
+
+
+# Default StanfordCoreNLP client, used when none is given (see use_annotator)
+NLP = CoreNLPClient('http://localhost:9000')
+# Maximum characters sent to StanfordCoreNLP in each request when annotating
+# whole articles (the server rejects texts longer than -maxCharLength, 100000
+# by default)
+CHUNK_SIZE = 50000
+# Maximum characters of the batches of sentences annotated in a single request
+# (one sentence per line)
+BATCH_CHARS = 10000
+EOLONLY = {'ssplit.eolonly': 'true'}
+if sys.maxunicode > 0xFFFF:
+    ASTRAL_RE = re.compile(u"[\U00010000-\U0010FFFF]")
+else:
+    # Narrow builds already count characters in UTF-16 code units
+    ASTRAL_RE = None
 
 # FUNCTIONS
 # ----------------------------------------------
-def pmid_2_pmc(identifiers):
+def pmid_2_pmc(identifiers, api_key=None, email=None, workers=3, index=None):
     '''
     Transforms a list of PubMed Ids to PMC ids
+
+    Parameters
+    ----------
+    identifiers : list, required, no default
+        List of PubMed identifiers.
+
+    api_key : str, optional, default = None
+        NCBI API key. Raises the request rate limit from 3 to 10 requests per second.
+
+    email : str, optional, default = None
+        Contact e-mail sent to NCBI with every request.
+
+    workers : int, optional, default = 3
+        Maximum number of idconv requests in flight.
+
+    index : PMCIdIndex, optional, default = None
+        Local PMID-PMCID index. Only the identifiers missing from the index
+        are sent to the idconv web service.
     '''
     pmcids = set()
     maxidents = 200
+    if index is not None:
+        (local_pmcids, identifiers) = index.convert(identifiers)
+        pmcids.update(local_pmcids)
 
-    for subset in [identifiers[x:x+maxidents] for x in range(0, len(identifiers),maxidents)]:
-        params = {
+    def convert(subset):
+        params = ncbi.eutils_params({
             'ids': ",".join(subset),
             'format': 'json'
-        }
-        req = requests.get("https://www.ncbi.nlm.nih.gov/pmc/utils/idconv/v1.0/", params=params)
-        if req.status_code == 200:
-            response = json.loads(req.content.decode('latin1'))
+        }, api_key=api_key, email=email)
+        try:
+            req = ncbi.get(ncbi.IDCONV_URL, params=params, api_key=api_key)
+        except requests.exceptions.RequestException as err:
+            raise PubMedQueryError("Can't connect to Pubmed idconv tool: %s" % err)
+        if req.status_code != 200:
+            raise PubMedQueryError("Can't convert identifiers through Pubmed idconv tool.")
+        return json.loads(req.content.decode('latin1'))
+
+    subsets = [identifiers[x:x+maxidents] for x in range(0, len(identifiers),maxidents)]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for response in executor.map(convert, subsets):
             for record in response['records']:
                 if 'status' in record:
                     continue
                 pmcids.add(record['pmcid'][3:])
-        else:
-            raise PubMedQueryError("Can't convert identifiers through Pubmed idconv tool.")
-        time.sleep(3)
     return list(pmcids)
 
+def eutils_request(url, params, api_key=None, email=None, post=False):
+    '''
+    Sends a request to an E-utility (ESearch, EPost, ELink) and returns the
+    root element of the XML response. Raises PubMedQueryError if the request
+    fails or NCBI returns an error.
+
+    Parameters
+    ----------
+    url : str, required, no default
+        URL of the E-utility.
+
+    params : dict, required, no default
+        Parameters of the request.
+
+    api_key : str, optional, default = None
+        NCBI API key.
+
+    email : str, optional, default = None
+        Contact e-mail sent to NCBI with every request.
+
+    post : bool, optional, default = False
+        Send the parameters in the body of a POST request (for long lists of identifiers).
+    '''
+    params = ncbi.eutils_params(params, api_key=api_key, email=email)
+    try:
+        if post is True:
+            req = ncbi.post(url, data=params, api_key=api_key)
+        else:
+            req = ncbi.get(url, params=params, api_key=api_key)
+    except requests.exceptions.RequestException as err:
+        raise PubMedQueryError("Can't connect to NCBI E-utilities: %s" % err)
+    if req.status_code != 200:
+        raise PubMedQueryError("Can't connect to NCBI E-utilities: status code %s" % req.status_code)
+    try:
+        root = ElementTree.fromstring(req.content)
+    except ElementTree.ParseError as err:
+        raise PubMedQueryError("Can't read NCBI E-utilities response: %s" % err)
+    error = first_text(root, 'ERROR')
+    if error:
+        raise PubMedQueryError("NCBI E-utilities error: %s" % error)
+    return root
+
+def esearch(database, term, api_key=None, email=None, webenv=None):
+    '''
+    Runs an ESearch query and stores its results in the NCBI history server.
+    Returns a tuple (webenv, query_key, count).
+
+    Parameters
+    ----------
+    database : str, required, no default
+        Entrez database (pubmed or pmc).
+
+    term : str, required, no default
+        Entrez query. "#<query_key>" refers to a previous result in webenv.
+
+    api_key : str, optional, default = None
+        NCBI API key.
+
+    email : str, optional, default = None
+        Contact e-mail sent to NCBI with every request.
+
+    webenv : str, optional, default = None
+        Web environment of the history server to use.
+    '''
+    params = {
+        'db':         database,
+        'term':       term,
+        'usehistory': 'y',
+        'retmax':     0
+    }
+    if webenv is not None:
+        params['WebEnv'] = webenv
+    root = eutils_request(ncbi.ESEARCH_URL, params, api_key=api_key, email=email, post=True)
+    count = first_text(root, 'Count')
+    return (first_text(root, 'WebEnv'), first_text(root, 'QueryKey'), int(count) if count else 0)
+
+def epost(database, identifiers, api_key=None, email=None):
+    '''
+    Uploads a list of identifiers to the NCBI history server with EPost.
+    Returns a tuple (webenv, query_key).
+
+    Parameters
+    ----------
+    database : str, required, no default
+        Entrez database of the identifiers (pubmed or pmc).
+
+    identifiers : list, required, no default
+        List of identifiers.
+
+    api_key : str, optional, default = None
+        NCBI API key.
+
+    email : str, optional, default = None
+        Contact e-mail sent to NCBI with every request.
+    '''
+    params = {
+        'db': database,
+        'id': ",".join(identifiers)
+    }
+    root = eutils_request(ncbi.EPOST_URL, params, api_key=api_key, email=email, post=True)
+    return (first_text(root, 'WebEnv'), first_text(root, 'QueryKey'))
+
+def elink_history(dbfrom, database, linkname, webenv, query_key, api_key=None, email=None):
+    '''
+    Links the records of a history server query to another database with
+    ELink, keeping the result in the history server. Returns a tuple (webenv,
+    query_key) of the linked records. query_key is None if there are none.
+
+    Parameters
+    ----------
+    dbfrom : str, required, no default
+        Entrez database of the query (e.g. pubmed).
+
+    database : str, required, no default
+        Entrez database to link to (e.g. pmc).
+
+    linkname : str, required, no default
+        Name of the link (e.g. pubmed_pmc).
+
+    webenv : str, required, no default
+        Web environment of the query.
+
+    query_key : str, required, no default
+        Query key of the query.
+
+    api_key : str, optional, default = None
+        NCBI API key.
+
+    email : str, optional, default = None
+        Contact e-mail sent to NCBI with every request.
+    '''
+    params = {
+        'dbfrom':    dbfrom,
+        'db':        database,
+        'linkname':  linkname,
+        'cmd':       'neighbor_history',
+        'WebEnv':    webenv,
+        'query_key': query_key
+    }
+    root = eutils_request(ncbi.ELINK_URL, params, api_key=api_key, email=email)
+    webenv = first_text(root, 'WebEnv') or webenv
+    for history in root.iter('LinkSetDbHistory'):
+        if first_text(history, 'LinkName') == linkname:
+            return (webenv, first_text(history, 'QueryKey'))
+    return (webenv, None)
+
 def take_closest(mylist, mynumber):
     """
     Assumes mylist is sorted. Returns closest value to mynumber.
@@ -95,6 +300,398 @@ def minidom_to_text(minidom):
     '''
     return " ".join(t.nodeValue for t in minidom.childNodes if t.nodeType == t.TEXT_NODE)
 
+def element_to_text(element):
+    '''
+    Takes an ElementTree element and returns the text contained in it without the tags.
+    Like minidom_to_text, only the text directly inside the element is returned
+    (text inside child tags is skipped).
+    '''
+    chunks = [element.text] + [child.tail for child in element]
+    return " ".join(chunk for chunk in chunks if chunk)
+
+def first_text(element, tag):
+    '''
+    Returns the text of the first descendant of element with the given tag,
+    or None if there is no such descendant.
+    '''
+    found = element.find(".//" + tag)
+    if found is None:
+        return None
+    return found.text
+
+def iterparse_records(source, tag):
+    '''
+    Incrementally parses the XML in source and yields every element with the given tag
+    once it has been completely read. Consumed elements are cleared, so memory
+    does not grow with the size of the XML.
+
+    Parameters
+    ----------
+    source : file-like object or str, required, no default
+        XML stream (e.g.: raw HTTP response, opened file) or path to an XML file.
+
+    tag : str, required, no default
+        Tag of the records to yield (e.g.: "article" or "PubmedArticle").
+    '''
+    context = iter(ElementTree.iterparse(source, events=("start", "end")))
+    event, root = next(context)
+    for event, elem in context:
+        if event == "end" and elem.tag == tag:
+            yield elem
+            root.clear()
+
+def article_identifiers(article):
+    '''
+    Returns the PubMed and PMC identifiers (without "PMC" prefix) of a PMC article
+    element as a tuple. Identifiers are taken from the pub-id-type attribute of
+    the article-id tags, or by position (first PMID, then PMCID) if the tags have
+    no type. Missing identifiers are None.
+    '''
+    typed = dict()
+    positional = list()
+    for article_id in article.iter('article-id'):
+        positional.append(article_id.text)
+        id_type = article_id.get('pub-id-type')
+        if id_type and id_type not in typed:
+            typed[id_type] = article_id.text
+    if typed:
+        pmid  = typed.get('pmid')
+        pmcid = typed.get('pmc', typed.get('pmcid'))
+    else:
+        pmid  = positional[0] if len(positional) > 0 else None
+        pmcid = positional[1] if len(positional) > 1 else None
+    if pmcid is not None and pmcid.upper().startswith("PMC"):
+        pmcid = pmcid[3:]
+    return (pmid, pmcid)
+
+def iter_pmc_articles(source):
+    '''
+    Yields Article objects (with fulltext) from a PMC XML stream. Articles
+    without PMC identifier or without body are skipped. Articles without
+    PubMed identifier have pmid None.
+
+    Parameters
+    ----------
+    source : file-like object or str, required, no default
+        PMC XML stream (efetch response or NXML file) or path to it.
+    '''
+    for article in iterparse_records(source, 'article'):
+        (pmid, pmcid) = article_identifiers(article)
+        if pmcid is None:
+            continue
+        body = article.find('.//body')
+        if body is None:
+            continue
+        fulltext = list()
+        for par in body.iter('p'):
+            fulltext.append(element_to_text(par))
+        yield Article(
+            pmid=pmid,
+            pmcid=pmcid,
+            journal=first_text(article, 'journal-id'),
+            year=first_text(article, 'year'),
+            fulltext="\n".join(fulltext)
+        )
+
+def iter_pubmed_articles(source):
+    '''
+    Yields Article objects (with abstract) from a PubMed XML stream. Articles
+    without abstract are skipped.
+
+    Parameters
+    ----------
+    source : file-like object or str, required, no default
+        PubMed XML stream (efetch response or baseline file) or path to it.
+    '''
+    for article in iterparse_records(source, 'PubmedArticle'):
+        abstract_text = list()
+        for abst in article.iter('AbstractText'):
+            abstract_text.append(element_to_text(abst))
+        abstract_text = "\n".join(abstract_text)
+        if not abstract_text.strip():
+            continue
+        journal = article.find('.//Journal')
+        if journal is not None:
+            journal = journal.find('.//Title')
+        yield Article(
+            pmid=element_to_text(article.find('.//PMID')),
+            journal=element_to_text(journal) if journal is not None else None,
+            year=first_text(article, 'Year'),
+            abstract=abstract_text
+        )
+
+def chunked(iterable, size):
+    '''
+    Yields lists of size elements from iterable (the last one can be smaller).
+    '''
+    chunk = list()
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = list()
+    if chunk:
+        yield chunk
+
+def bounded_map(executor, function, tasks, window):
+    '''
+    Like executor.map, but tasks are read and submitted lazily: at most "window"
+    tasks are pending at any time. Yields the results in order.
+
+    Parameters
+    ----------
+    executor : concurrent.futures.Executor, required, no default
+        Thread or process pool.
+
+    function : function, required, no default
+        Function to apply to each task.
+
+    tasks : iterable, required, no default
+        Arguments of function.
+
+    window : int, required, no default
+        Maximum number of submitted tasks whose result has not been yielded.
+    '''
+    pending = deque()
+    for task in tasks:
+        pending.append(executor.submit(function, task))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+def text_chunks(text, size=CHUNK_SIZE):
+    '''
+    Yields (start, end) positions of consecutive pieces of text of at most size
+    characters. Pieces end at a line break if possible, or else after a period
+    or a space, so sentences are not cut.
+
+    Parameters
+    ----------
+    text : str, required, no default
+        Text to split.
+
+    size : int, optional, default = CHUNK_SIZE
+        Maximum length of the pieces.
+    '''
+    start = 0
+    while len(text) - start > size:
+        limit = start + size
+        end = text.rfind("\n", start + size // 2, limit) + 1
+        if end == 0:
+            end = text.rfind(". ", start + size // 2, limit) + 2
+        if end == 1:
+            end = text.rfind(" ", start, limit) + 1
+        if end == 0:
+            end = limit
+        yield (start, end)
+        start = end
+    yield (start, len(text))
+
+def utf16_positions(text):
+    '''
+    Returns a list with the position in text of each UTF-16 offset (the
+    character offsets of StanfordCoreNLP), or None if they are the same
+    (there are no characters outside the Basic Multilingual Plane).
+    '''
+    if ASTRAL_RE is None or ASTRAL_RE.search(text) is None:
+        return None
+    positions = list()
+    for idx, char in enumerate(text):
+        positions.append(idx)
+        if ord(char) > 0xFFFF:
+            positions.append(idx)
+    positions.append(len(text))
+    return positions
+
+def utf16_len(text):
+    '''
+    Returns the length of text in UTF-16 code units (as counted by StanfordCoreNLP).
+    '''
+    if ASTRAL_RE is None or ASTRAL_RE.search(text) is None:
+        return len(text)
+    return len(text.encode("utf-16-le")) // 2
+
+def use_annotator(client):
+    '''
+    Sets the default annotator backend (NLP), used when no client is given:
+    a CoreNLPClient, a CoreNLPPool, a ppaxe.replay.RecordReplay or a
+    ppaxe.standin.StandInAnnotator.
+
+    Parameters
+    ----------
+    client : Annotator, required, no default
+        Annotator backend (see ppaxe.corenlp.Annotator).
+    '''
+    global NLP
+    NLP = client
+
+def annotate_text(text, client=None, properties=None):
+    '''
+    Annotates text with StanfordCoreNLP and returns the Tokens of each sentence.
+    The response is requested in the output format of the client (attribute
+    "output_format", "json" if it has none, see ppaxe.corenlp.OUTPUT_FORMATS).
+    Raises ValueError if the response can't be decoded.
+
+    Parameters
+    ----------
+    text : str, required, no default
+        Text to annotate.
+
+    client : CoreNLPClient, optional, default = None
+        StanfordCoreNLP client. NLP if None.
+
+    properties : dict, optional, default = None
+        Properties of the request.
+    '''
+    client = client if client is not None else NLP
+    output_format = getattr(client, "output_format", "json")
+    request_properties = dict(OUTPUT_FORMATS[output_format])
+    if properties:
+        request_properties.update(properties)
+    return decode(client.annotate(text, properties=request_properties), output_format)
+
+def annotate_batch(sentences, max_chars=BATCH_CHARS, client=None, cache=None):
+    '''
+    Annotates a list of Sentence objects with StanfordCoreNLP sending many of them
+    in each request, one per line (ssplit.eolonly), instead of one request per
+    sentence. The annotated sentences are assigned back to the Sentence objects by
+    their character offsets: if the server splits a line in several sentences,
+    their tokens are joined. Batches that can't be annotated, that time out or
+    that the server fails with (ServerError) are split in halves. Sentences that
+    can't be annotated, and batches that fail for other reasons, keep no tokens
+    and are marked as failed (Sentence.failed), so they are not sent again one
+    by one. Raises ServerUnavailable if no server can be reached: the other
+    sentences would fail too.
+
+    Parameters
+    ----------
+    sentences : list, required, no default
+        List of Sentence objects.
+
+    max_chars : int, optional, default = BATCH_CHARS
+        Maximum characters sent in each request (a longer sentence is sent alone).
+
+    client : CoreNLPClient, optional, default = None
+        StanfordCoreNLP client. NLP if None.
+
+    cache : AnnotationCache, optional, default = None
+        Cache of annotations. Cached sentences are not sent to the server.
+    '''
+    client = client if client is not None else NLP
+    def fail(batch):
+        for sentence in batch:
+            sentence.failed = True
+
+    def annotate(batch, lines):
+        try:
+            annotated = annotate_text("\n".join(lines), client=client, properties=EOLONLY)
+        except (ValueError, ServerError):
+            if len(batch) == 1:
+                logging.warning("Can't annotate sentence: %s", lines[0])
+                fail(batch)
+                return
+            half = len(batch) // 2
+            annotate(batch[:half], lines[:half])
+            annotate(batch[half:], lines[half:])
+            return
+        except ServerUnavailable:
+            raise
+        except requests.exceptions.RequestException as err:
+            if not isinstance(err, requests.exceptions.ReadTimeout):
+                logging.warning("Can't annotate %s sentences (%s)", len(batch), err)
+                fail(batch)
+                return
+            if len(batch) == 1:
+                logging.warning("Can't annotate sentence before the deadline: %s", lines[0])
+                fail(batch)
+                return
+            half = len(batch) // 2
+            annotate(batch[:half], lines[:half])
+            annotate(batch[half:], lines[half:])
+            return
+        starts = list()
+        offset = 0
+        for line in lines:
+            starts.append(offset)
+            offset += utf16_len(line) + 1
+        tokens = [ Tokens() for sentence in batch ]
+        for annotated_tokens in annotated:
+            if annotated_tokens:
+                idx = bisect_right(starts, annotated_tokens.begin) - 1
+                tokens[idx].extend(annotated_tokens)
+        for sentence, sentence_tokens in zip(batch, tokens):
+            sentence.tokens = sentence_tokens
+        if cache is not None:
+            cache.put([ (line, [sentence_tokens.to_json()]) for line, sentence_tokens in zip(lines, tokens) ], EOLONLY)
+
+    batch = list()
+    lines = list()
+    size  = 0
+    for sentence in sentences:
+        line = sentence.originaltext.replace("\n", " ")
+        if not line.strip():
+            continue
+        if cache is not None:
+            cached = cache.get(line, EOLONLY)
+            if cached is not None:
+                sentence.tokens = Tokens.from_json(cached[0])
+                continue
+        if batch and size + len(line) + 1 > max_chars:
+            annotate(batch, lines)
+            batch = list()
+            lines = list()
+            size  = 0
+        batch.append(sentence)
+        lines.append(line)
+        size += len(line) + 1
+    if batch:
+        annotate(batch, lines)
+
+def annotate_articles(articles, source="fulltext", splitter="regex", client=None, workers=1, cache=None, prefilter=None, index=None):
+    '''
+    Yields the articles with their sentences extracted and annotated (see
+    Article.annotate), in the same order. Up to workers articles are annotated at
+    the same time by different threads, to use all the threads of the server.
+
+    Parameters
+    ----------
+    articles : iterable, required, no default
+        Article objects. They are read lazily.
+
+    source : str, optional, default = "fulltext"
+        Use the "fulltext" or the "abstract" to extract sentences.
+
+    splitter : str, optional, default = "regex"
+        "corenlp" or "regex". See Article.annotate.
+
+    client : CoreNLPClient, optional, default = None
+        StanfordCoreNLP client. NLP if None.
+
+    workers : int, optional, default = 1
+        Number of articles annotated at the same time.
+
+    cache : AnnotationCache, optional, default = None
+        Cache of annotations. Cached sentences are not sent to the server.
+
+    prefilter : Prefilter, optional, default = None
+        Only keep the sentences that may have two proteins. See Article.annotate.
+
+    index : SentenceIndex, optional, default = None
+        Sentences analyzed before in the run. See Article.annotate.
+    '''
+    def annotate(article):
+        article.annotate(source=source, splitter=splitter, client=client, cache=cache, prefilter=prefilter, index=index)
+        return article
+
+    if workers <= 1:
+        for article in articles:
+            yield annotate(article)
+        return
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for article in bounded_map(executor, annotate, articles, window=2 * workers):
+            yield article
+
 # CLASSES
 # ----------------------------------------------
 class PMQuery(object):
@@ -119,114 +716,464 @@ class PMQuery(object):
     notfound : set, no default
         PubMed identifiers of the articles not found in database.
 
+    api_key : str, no default
+        NCBI API key used in the requests.
+
+    email : str, no default
+        Contact e-mail sent to NCBI in the requests.
+
+    workers : int, no default
+        Maximum number of requests to NCBI in flight.
+
+    cache : ArticleCache, no default
+        Local store of downloaded articles. None if no cache is used.
+
+    pmc_index : PMCIdIndex, no default
+        Local PMID-PMCID index. None if the idconv web service is used for every identifier.
+
+    sources : list, no default
+        Paths to the local files or directories (databases "LOCAL_PMC" and "LOCAL_PUBMED").
+
+    failed : set, no default
+        PubMed identifiers that could not be downloaded because of errors (also in "notfound",
+        but not stored in the negative cache). With history, all the identifiers not found
+        if any page of the history server could not be retrieved.
+
+    pending_notfound : collections.deque, no default
+        Lists of identifiers not found (and not failed), appended once as each batch is
+        retrieved, for the caller to consume (e.g. to record them) while the articles
+        are retrieved.
+
+    sizer : ncbi.BatchSizer, no default
+        Adaptive number of articles per efetch request. None with local databases.
+
+    term : str, no default
+        Entrez query to retrieve the articles from. None if only ids are retrieved.
+
+    history : bool, no default
+        Use the NCBI history server (ESearch/EPost) and page through the results.
+
     '''
-    def __init__(self, ids, database="PMC"):
+    def __init__(self, ids, database="PMC", api_key=None, email=None, workers=3, cache=None, pmc_index=None, sources=None, term=None, history=False):
         '''
         Parameters
         ----------
         ids : list, required, no default
-            List of PubMed identifiers. Required. No default.
+            List of PubMed identifiers. Required. No default. With local databases
+            it can be empty (or None) to read all the articles in sources.
 
         database: str, optional, default = "PMC"
-            Database to download the articles or the Abstracts. Can be PMC or PUBMED.
+            Database to download the articles or the Abstracts. Can be PMC or PUBMED,
+            or LOCAL_PMC/LOCAL_PUBMED to read the articles from local files of the
+            PMC Open Access dump or the PubMed baseline.
+
+        api_key : str, optional, default = None
+            NCBI API key. Raises the request rate limit from 3 to 10 requests per second.
+
+        email : str, optional, default = None
+            Contact e-mail sent to NCBI with every request.
+
+        workers : int, optional, default = 3
+            Maximum number of requests to NCBI in flight. All of them share
+            the same rate limiter, so NCBI limits are always respected. With
+            local databases, number of worker processes parsing the files.
+
+        cache : str or ArticleCache, optional, default = None
+            Path to a SQLite file (or ArticleCache object) to store the downloaded
+            articles. Articles already in the cache (and identifiers recently not found)
+            are not requested again.
+
+        pmc_index : str or PMCIdIndex, optional, default = None
+            Path to a local PMID-PMCID index (or PMCIdIndex object) built with PMCIdIndex.build.
+            Used to convert PubMed ids to PMC ids when database is "PMC". Identifiers
+            not in the index are converted with the idconv web service.
+
+        sources : list, optional, default = None
+            Paths to the local files or directories to read with databases "LOCAL_PMC"
+            (NXML files, directories or .tar.gz tarballs of the PMC Open Access dump)
+            and "LOCAL_PUBMED" (.xml.gz files of the PubMed baseline or directories).
+
+        term : str, optional, default = None
+            Entrez query (e.g. "MAPK1[tiab] AND 2015[dp]") run with ESearch in PMC or
+            PubMed. The articles found are retrieved instead of ids (ids can be empty).
+            Implies history.
+
+        history : bool, optional, default = False
+            Upload ids once with EPost (linked to PMC with ELink if database is "PMC",
+            instead of using idconv and pmc_index) and page through them with efetch
+            from the NCBI history server, instead of sending the identifiers of every
+            batch in the query string. Recommended for very large lists of identifiers.
         '''
-        self.ids = ids
+        self.ids = ids if ids is not None else list()
         self.database = database
+        self.api_key  = api_key
+        self.email    = email
+        self.workers  = workers
+        if cache is not None and not isinstance(cache, ArticleCache):
+            cache = ArticleCache(cache)
+        self.cache    = cache
+        if pmc_index is not None and not isinstance(pmc_index, PMCIdIndex):
+            pmc_index = PMCIdIndex(pmc_index)
+        self.pmc_index = pmc_index
+        self.sources  = sources
         self.articles = list()
         self.found    = set()
         self.notfound = set()
+        self.failed   = set()
+        self.pending_notfound = deque()
+        self.sizer    = None
+        if database in ncbi.BATCH_SIZES:
+            self.sizer = ncbi.BatchSizer.for_database(database)
+        self.term     = term
+        self.history  = history or term is not None
+
+    def __parse_response(self, req, parser, dbname):
+        '''
+        Parses a streamed efetch response with parser and returns the list of Article objects.
+        '''
+        try:
+            if req.status_code != 200:
+                raise PubMedQueryError("Can't connect to %s: status code %s" % (dbname, req.status_code))
+            req.raw.decode_content = True
+            try:
+                return list(parser(req.raw))
+            except (ElementTree.ParseError, EnvironmentError, Urllib3Error, requests.exceptions.RequestException) as err:
+                raise PubMedQueryError("Can't read %s response: %s" % (dbname, err))
+        finally:
+            req.close()
 
     def __get_pmc(self, req):
         '''
-        Gets PMC article request and fills articles attribute
+        Parses PMC article request and returns the list of Article objects in it.
 
         Parameters
         ----------
         req : requests.models.Response, required, no default
-            response object to pubmedCentral
+            streamed response object to pubmedCentral
         '''
-        if req.status_code == 200:
-            article_text = minidom.parseString(req.content)
-            articles = article_text.getElementsByTagName('article')
-            for article in articles:
-                pmid    = article.getElementsByTagName('article-id')[0].firstChild.nodeValue
-                journal = article.getElementsByTagName('journal-id')[0].firstChild.nodeValue
-                year = article.getElementsByTagName('year')[0].firstChild.nodeValue
-                try:
-                    pmcid = article.getElementsByTagName('article-id')[1].firstChild.nodeValue
-                except:
-                    continue
-                body =  article.getElementsByTagName('body')
-                if len(body) == 0:
-                    continue
-                self.found.add(pmid)
-                paragraphs = body[0].getElementsByTagName('p')
-                fulltext = list()
-                for par in paragraphs:
-                    fulltext.append(minidom_to_text(par))
-                self.articles.append(Article(pmid=pmid, pmcid=pmcid, journal=journal, year=year, fulltext="\n".join(fulltext)))
-            self.notfound = set(self.ids).difference(self.found)
-        else:
-            PubMedQueryError("Can't connect to PMC...")
+        return self.__parse_response(req, iter_pmc_articles, "PMC")
 
     def __get_pubmed(self, req):
         '''
-        Gets PUBMED article request and fills article attribute.
+        Parses PUBMED article request and returns the list of Article objects in it.
 
         Parameters
         ----------
         req : requests.models.Response, required, no default
-            response object to pubmed
+            streamed response object to pubmed
         '''
-        if req.status_code == 200:
-            article_text = minidom.parseString(req.content)
-            articles = article_text.getElementsByTagName('PubmedArticle')
-            for article in articles:
-                pmid = article.getElementsByTagName('PMID')[0]
-                pmid_text = minidom_to_text(pmid)
-                journal = article.getElementsByTagName('Journal')[0].getElementsByTagName('Title')[0]
-                journal_text = minidom_to_text(journal)
-                year = article.getElementsByTagName('Year')[0].firstChild.nodeValue
-                abstracts = article.getElementsByTagName('AbstractText')
-                abstract_text = list()
-                for abst in abstracts:
-                    abstract_text.append(minidom_to_text(abst))
-                abstract_text = "\n".join(abstract_text)
-                if not abstract_text.strip():
-                    continue
-                self.found.add(pmid_text)
-                self.articles.append(Article(pmid=pmid_text, journal=journal_text, year=year, abstract=abstract_text))
-            self.notfound = set(self.ids).difference(self.found)
+        return self.__parse_response(req, iter_pubmed_articles, "PubMed")
+
+    def __fetch(self, subset, retries=ncbi.MAX_RETRIES):
+        '''
+        Downloads and parses one batch of articles from PMC or PubMed.
+        Returns the list of Article objects.
+
+        Parameters
+        ----------
+        subset : list, required, no default
+            PubMed identifiers of the batch.
+
+        retries : int, optional, default = ncbi.MAX_RETRIES
+            Maximum number of retries of the efetch request.
+        '''
+        if self.database == "PMC":
+            # Do fulltext query
+            params = {
+                'id': ",".join(pmid_2_pmc(subset, api_key=self.api_key, email=self.email, workers=1, index=self.pmc_index)),
+                'db': 'pmc',
+            }
+        else:
+            # Do abstract query
+            params = {
+                'id':      ",".join(subset),
+                'db':      'pubmed',
+                'retmode': 'xml'
+            }
+        if not params['id']:
+            # None of the identifiers is in PMC
+            return list()
+        return self.__efetch(params, retries)
+
+    def __fetch_page(self, webenv, query_key, page, retries=ncbi.MAX_RETRIES):
+        '''
+        Downloads and parses one page of a query stored in the NCBI history server.
+        Returns the list of Article objects.
+
+        Parameters
+        ----------
+        webenv : str, required, no default
+            Web environment of the query.
+
+        query_key : str, required, no default
+            Query key of the query.
+
+        page : range, required, no default
+            Positions of the records of the page in the query.
+
+        retries : int, optional, default = ncbi.MAX_RETRIES
+            Maximum number of retries of the efetch request.
+        '''
+        params = {
+            'db':        self.database.lower(),
+            'WebEnv':    webenv,
+            'query_key': query_key,
+            'retstart':  page[0],
+            'retmax':    len(page),
+            'retmode':   'xml'
+        }
+        return self.__efetch(params, retries)
+
+    def __efetch(self, params, retries):
+        '''
+        Sends an efetch request with params and returns the list of Article objects.
+        '''
+        params = ncbi.eutils_params(params, api_key=self.api_key, email=self.email)
+        try:
+            req = ncbi.get(ncbi.EFETCH_URL, params=params, api_key=self.api_key, retries=retries, stream=True)
+        except requests.exceptions.RequestException as err:
+            raise PubMedQueryError("Can't connect to NCBI efetch: %s" % err)
+        if self.database == "PMC":
+            return self.__get_pmc(req)
         else:
-            PubMedQueryError("Can't connect to PubMed...")
+            return self.__get_pubmed(req)
+
+    def __fetch_split(self, fetch, subset):
+        '''
+        Downloads and parses one batch of articles, updating the batch size with
+        the time taken and the text received. If the batch fails, it is split in
+        two halves that are retrieved separately, so a single bad identifier (or
+        an oversized response) does not take the whole batch down. Runs in the
+        worker threads of get_articles. Returns a tuple with the subset, the list
+        of Article objects and the set of identifiers (or positions) that failed.
+
+        Parameters
+        ----------
+        fetch : function, required, no default
+            Function that downloads a batch (__fetch or __fetch_page).
+
+        subset : list or range, required, no default
+            PubMed identifiers of the batch, or positions in the history server query.
+        '''
+        # Batches that can be split are retried only once: splitting them is faster
+        # than waiting for the same request to time out again
+        retries = ncbi.MAX_RETRIES if len(subset) == 1 else 1
+        start = time.time()
+        try:
+            articles = fetch(subset, retries=retries)
+        except PubMedQueryError as err:
+            self.sizer.failure(len(subset))
+            if len(subset) == 1:
+                logging.warning("Can't retrieve %s: %s", subset[0], err)
+                return (subset, list(), set(subset))
+            logging.warning("Batch of %s articles failed (%s). Splitting it...", len(subset), err)
+            half = len(subset) // 2
+            first  = self.__fetch_split(fetch, subset[:half])
+            second = self.__fetch_split(fetch, subset[half:])
+            return (subset, first[1] + second[1], first[2] | second[2])
+        chars = sum(len(article.fulltext or article.abstract or "") for article in articles)
+        self.sizer.success(len(subset), time.time() - start, chars)
+        return (subset, articles, set())
+
+    def __post_history(self, identifiers):
+        '''
+        Stores the query in the NCBI history server: the results of term, or the
+        PubMed identifiers uploaded with EPost (linked to their PMC articles if
+        database is "PMC"). Returns a tuple (webenv, query_key, count).
+        '''
+        database = self.database.lower()
+        if self.term is not None:
+            return esearch(database, self.term, api_key=self.api_key, email=self.email)
+        if not identifiers:
+            return (None, None, 0)
+        (webenv, query_key) = epost("pubmed", identifiers, api_key=self.api_key, email=self.email)
+        if self.database == "PMC":
+            (webenv, query_key) = elink_history(
+                "pubmed", "pmc", "pubmed_pmc", webenv, query_key,
+                api_key=self.api_key, email=self.email
+            )
+            if query_key is None:
+                # None of the identifiers is in PMC
+                return (webenv, None, 0)
+        # Number of records of the query
+        return esearch(database, "#%s" % query_key, api_key=self.api_key, email=self.email, webenv=webenv)
+
+    def __iter_subsets(self, identifiers):
+        '''
+        Yields the batches of identifiers (or positions) to download. The size of each batch is
+        taken from the sizer when the batch is submitted, so it follows the
+        responses received so far.
+        '''
+        start = 0
+        while start < len(identifiers):
+            end = start + self.sizer.size
+            yield identifiers[start:end]
+            start = end
 
     def get_articles(self):
         '''
-        Retrieves the Fulltext or the abstracts of the specified Articles
-        '''
-        maxidents = 200 # max number of articles per GET request
-
-        for subset in [self.ids[x:x+maxidents] for x in range(0, len(self.ids), maxidents)]:
-            if self.database == "PMC":
-                # Do fulltext query
-
-                params = {
-                    'id': ",".join(pmid_2_pmc(subset)),
-                    'db': 'pmc',
-                }
-                req = requests.get("https://eutils.ncbi.nlm.nih.gov/entrez/eutils/efetch.fcgi", params=params)
-                self.__get_pmc(req)
-            elif self.database == "PUBMED":
-                # Do abstract query
-                params = {
-                    'id':      ",".join(subset),
-                    'db':      'pubmed',
-                    'retmode': 'xml'
-                }
-                req = requests.get("https://eutils.ncbi.nlm.nih.gov/entrez/eutils/efetch.fcgi", params=params)
-                self.__get_pubmed(req)
+        Retrieves the Fulltext or the abstracts of the specified Articles.
+        Batches are downloaded and parsed concurrently by "workers" threads,
+        and added in order.
+        '''
+        for articles in self.__iter_batches():
+            pass
+
+    def iter_articles(self, keep=False):
+        '''
+        Generator of articles. Batches are retrieved on demand as articles are
+        consumed, so arbitrarily large lists of identifiers can be processed in
+        constant memory. Attributes "found" and "notfound" are updated as
+        batches are retrieved.
+
+        Parameters
+        ----------
+        keep : bool, optional, default = False
+            Also add the articles to the attribute "articles" (needed, for
+            instance, to make a report of the query afterwards).
+        '''
+        for articles in self.__iter_batches(keep=keep):
+            for article in articles:
+                yield article
+
+    def prefetch(self, depth=2, keep=True):
+        '''
+        Generator of articles that retrieves them in a background thread, so the
+        articles can be analyzed while the next batches are being downloaded. The
+        thread starts with the first article read, and is stopped when the
+        generator is closed (or garbage collected) before the last one.
+
+        Parameters
+        ----------
+        depth : int, optional, default = 2
+            Maximum number of retrieved batches waiting to be consumed. Bounds
+            the memory used by articles downloaded in advance.
+
+        keep : bool, optional, default = True
+            Also add the articles to the attribute "articles".
+        '''
+        prefetcher = Prefetcher(self.__iter_batches(keep=keep), depth=depth)
+        try:
+            for articles in prefetcher:
+                for article in articles:
+                    yield article
+        finally:
+            prefetcher.close()
+
+    def __add_batch(self, articles, keep):
+        '''
+        Adds a batch of retrieved articles to the attribute "found", and
+        to "articles" if keep is True.
+        '''
+        for article in articles:
+            self.found.add(article.pmid if article.pmid is not None else "PMC" + article.pmcid)
+            if keep is True:
+                self.articles.append(article)
+
+    def __iter_batches(self, keep=True):
+        '''
+        Retrieves the articles and yields them in batches (lists of Article objects):
+        first the articles in the cache and then the downloaded ones (or the ones read
+        from local files). Attributes "found", "notfound" and "pending_notfound" (and
+        "articles" if keep is True) are updated as batches are retrieved. At most
+        2 * workers batches are requested in advance, with the number of articles
+        given by the sizer.
+        '''
+        maxidents = 200 # articles per batch of local or cached articles
+        lost = 0        # records of the history server that could not be retrieved
+
+        if self.database in ("LOCAL_PMC", "LOCAL_PUBMED"):
+            for articles in chunked(self.__iter_local(), maxidents):
+                self.__add_batch(articles, keep)
+                yield articles
+        elif self.database in ("PMC", "PUBMED"):
+            missing = list()
+            if self.term is None:
+                for articles in chunked(self.__iter_cached(missing), maxidents):
+                    self.__add_batch(articles, keep)
+                    yield articles
+                if self.notfound:
+                    # Identifiers in the negative cache
+                    self.pending_notfound.append(sorted(self.notfound))
+            if self.history is True:
+                (webenv, query_key, count) = self.__post_history(missing)
+                logging.info("%s records stored in the NCBI history server.", count)
+                fetch   = functools.partial(self.__fetch_page, webenv, query_key)
+                subsets = self.__iter_subsets(range(count))
             else:
-                logging.error('%s: Incorrect database. Choose "PMC" or "PUBMED"', self.database)
+                fetch   = self.__fetch
+                subsets = self.__iter_subsets(missing)
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                batches = bounded_map(executor, functools.partial(self.__fetch_split, fetch), subsets, 2 * self.workers)
+                for subset, articles, failed in batches:
+                    self.__add_batch(articles, keep)
+                    batch_notfound = set()
+                    if self.history is True:
+                        # Pages are positions in the query, not identifiers
+                        lost += len(failed)
+                    else:
+                        self.failed.update(failed)
+                        batch_notfound = set(subset).difference(self.found).difference(failed)
+                        self.notfound.update(batch_notfound)
+                        if batch_notfound:
+                            self.pending_notfound.append(sorted(batch_notfound))
+                    if self.cache is not None:
+                        self.cache.put(self.database, [article.to_dict() for article in articles])
+                        self.cache.put_notfound(self.database, batch_notfound)
+                    yield articles
+            if lost:
+                logging.warning("%s records of the NCBI history server could not be retrieved.", lost)
+        else:
+            logging.error('%s: Incorrect database. Choose "PMC", "PUBMED", "LOCAL_PMC" or "LOCAL_PUBMED"', self.database)
+            return
+        notfound = set(self.ids).difference(self.found)
+        if lost:
+            # The identifiers of the lost records are unknown
+            self.failed.update(notfound.difference(self.notfound))
+        # Not found after the last batch (history server and local files)
+        pending = notfound.difference(self.notfound).difference(self.failed)
+        if pending:
+            self.pending_notfound.append(sorted(pending))
+        self.notfound = notfound
+        if self.failed:
+            logging.warning("%s articles could not be retrieved because of errors.", len(self.failed))
+
+    def __iter_local(self):
+        '''
+        Yields the articles in the local PMC or PubMed files in sources. If ids
+        is not empty, only the articles with those identifiers are yielded.
+        '''
+        from ppaxe import loaders
+        ids = set(self.ids) if self.ids else None
+        if self.database == "LOCAL_PMC":
+            return loaders.iter_local_pmc(self.sources, ids=ids, processes=self.workers)
+        else:
+            return loaders.iter_local_pubmed(self.sources, ids=ids, processes=self.workers)
+
+    def __iter_cached(self, missing):
+        '''
+        Yields the articles stored in the cache, and fills the list missing with
+        the identifiers that have to be downloaded. Identifiers in the negative
+        cache are added to "notfound".
+        '''
+        seen = set()
+        cached = 0
+        for identifier in self.ids:
+            if identifier in seen:
+                continue
+            seen.add(identifier)
+            record = None
+            if self.cache is not None:
+                record = self.cache.get(self.database, identifier)
+            if record is not None:
+                cached += 1
+                yield Article(**record)
+            elif self.cache is not None and self.cache.is_notfound(self.database, identifier):
+                self.notfound.add(identifier)
+            else:
+                missing.append(identifier)
+        if self.cache is not None:
+            logging.info("%s articles read from cache.", cached)
 
     def __iter__(self):
         return iter(self.articles)
@@ -234,6 +1181,94 @@ class PMQuery(object):
     def __getitem__(self, index):
         return self.articles[index]
 
+# ----------------------------------------------
+class Prefetcher(object):
+    '''
+    Iterator that consumes an iterable in a background thread, keeping at most
+    "depth" items ready to be read. Exceptions raised by the iterable are
+    raised again when the corresponding item is read.
+
+    Attributes
+    ----------
+    queue : queue.Queue, no default
+        Items retrieved in advance.
+
+    thread : threading.Thread, no default
+        Background thread consuming the iterable.
+    '''
+    _END   = object()
+    _ERROR = object()
+
+    def __init__(self, iterable, depth=2):
+        '''
+        Parameters
+        ----------
+        iterable : iterable, required, no default
+            Iterable to consume in the background (e.g.: a generator of batches).
+
+        depth : int, optional, default = 2
+            Maximum number of items retrieved in advance.
+        '''
+        self.queue   = queue.Queue(maxsize=max(1, depth))
+        self.stopped = threading.Event()
+        self.thread  = threading.Thread(target=self.__produce, args=(iterable,))
+        self.thread.daemon = True
+        self.thread.start()
+
+    def __put(self, item):
+        '''
+        Puts item in the queue, waiting for free space unless the prefetcher is closed.
+        Returns False if it was closed.
+        '''
+        while not self.stopped.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def __produce(self, iterable):
+        '''
+        Consumes the iterable. Runs in the background thread.
+        '''
+        iterator = iter(iterable)
+        try:
+            for item in iterator:
+                if not self.__put(item):
+                    break
+        except Exception as err:
+            self.__put((Prefetcher._ERROR, err))
+        finally:
+            if hasattr(iterator, "close"):
+                iterator.close()
+        self.__put(Prefetcher._END)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.stopped.is_set():
+            raise StopIteration
+        item = self.queue.get()
+        if item is Prefetcher._END:
+            self.stopped.set()
+            raise StopIteration
+        if isinstance(item, tuple) and len(item) == 2 and item[0] is Prefetcher._ERROR:
+            self.stopped.set()
+            raise item[1]
+        return item
+
+    # For python 2.7
+    next = __next__
+
+    def close(self):
+        '''
+        Stops the background thread. Items not read yet are discarded.
+        '''
+        self.stopped.set()
+        self.thread.join()
+
 # ----------------------------------------------
 class Article(object):
     '''
@@ -261,6 +1296,10 @@ class Article(object):
 
     sentences : list, no default
         List of Sentence objects in article (fulltext or abstract).
+
+    text : str, no default
+        Text of the article (with HTML entities unescaped) set by extract_sentences
+        or annotate_sentences. Sentences are positions in this text.
     '''
     def __init__(self, pmid, pmcid=None, journal=None, year=None, fulltext=None, abstract=None):
         '''
@@ -285,8 +1324,23 @@ class Article(object):
         self.abstract   = abstract
         self.fulltext   = fulltext
         self.sentences  = list()
+        self.text       = None
+
+    def to_dict(self):
+        '''
+        Returns the article metadata and texts as a dictionary. Article(**article.to_dict())
+        creates a copy of the article without sentences.
+        '''
+        return dict({
+            'pmid':     self.pmid,
+            'pmcid':    self.pmcid,
+            'journal':  self.journal,
+            'year':     self.year,
+            'fulltext': self.fulltext,
+            'abstract': self.abstract
+        })
 
-    def extract_interactions(self, source="fulltext", only_dict=False):
+    def extract_interactions(self, source="fulltext", only_dict=False, splitter="regex", client=None, cache=None):
         '''
         Simple wrapper method to avoid calls to multiple methods.
 
@@ -294,10 +1348,65 @@ class Article(object):
         ----------
         source : str, optional, default = "fulltext"
             Retrieve the interactions in the article from the source (fulltext or abstract).
+
+        splitter : str, optional, default = "regex"
+            "corenlp" or "regex". See annotate.
+
+        client : CoreNLPClient, optional, default = None
+            StanfordCoreNLP client. NLP if None.
+
+        cache : AnnotationCache, optional, default = None
+            Cache of annotations. See annotate.
         '''
-        self.extract_sentences(source=source)
+        self.annotate(source=source, splitter=splitter, client=client, cache=cache)
         for sentence in self.sentences:
-            sentence.extract_interactions(only_dict)
+            sentence.extract_interactions(only_dict, client=client, cache=cache)
+
+    def annotate(self, source="fulltext", splitter="regex", client=None, cache=None, prefilter=None, index=None):
+        '''
+        Extracts the sentences of the article and annotates them.
+
+        Parameters
+        ----------
+        source : str, optional, default = "fulltext"
+            Use the "fulltext" or the "abstract" to extract sentences.
+
+        splitter : str, optional, default = "regex"
+            Split and annotate the sentences with StanfordCoreNLP in a few requests
+            per article ("corenlp", see annotate_sentences) or split them with
+            ppaxe and annotate them in batches ("regex", see extract_sentences and
+            annotate_batch).
+
+        client : CoreNLPClient, optional, default = None
+            StanfordCoreNLP client. NLP if None.
+
+        cache : AnnotationCache, optional, default = None
+            Cache of annotations. Cached texts are not sent to the server. Only
+            the splitter "regex" caches each sentence; "corenlp" caches pieces
+            of the article (see annotate_sentences).
+
+        prefilter : Prefilter, optional, default = None
+            Remove the sentences that can't have two proteins (see
+            ppaxe.prefilter) before annotating them. Requires splitter "regex",
+            as the sentences must be known before sending them to the server.
+
+        index : SentenceIndex, optional, default = None
+            Sentences analyzed before in the run (see ppaxe.dedup). With splitter
+            "regex", the sentences found in it are not annotated: they get the
+            results of the stored ones with SentenceIndex.share.
+        '''
+        if splitter == "corenlp":
+            if prefilter is not None:
+                raise ValueError('The prefilter requires splitter "regex"')
+            self.annotate_sentences(source=source, client=client, cache=cache)
+        else:
+            self.extract_sentences(source=source)
+            if prefilter is not None:
+                self.sentences = prefilter.filter(self.sentences)
+            sentences = self.sentences
+            if index is not None:
+                sentences = [ sentence for sentence in sentences if sentence not in index ]
+            annotate_batch(sentences, client=client, cache=cache)
         
 
     @property
@@ -339,62 +1448,78 @@ class Article(object):
         if mode == "no-split":
             # Don't try to separate the sentence.
             # Everything in the text is just one sentence!
-            self.sentences.append(Sentence(originaltext=text))
+            self.text = text
+            self.sentences.append(Sentence(buffer=text))
         else:
-            caps = "([A-Z])"
-            prefixes = "(Mr|Fig|fig|St|Mrs|Ms|Dr)[.]"
-            digits = "([0-9])"
-            fig_letters = "([A-Ka-k])"
-            suffixes = "(Inc|Ltd|Jr|Sr|Co)"
-            starters = r"(Mr|Mrs|Ms|Dr|He\s|She\s|It\s|They\s|Their\s|Our\s|We\s|But\s|However\s|That\s|This\s|Wherever)"
-            acronyms = "([A-Z][.][A-Z][.](?:[A-Z][.])?)"
-            websites = "[.](com|net|org|io|gov)"
-            species = r"([A-Z])[.] ?([a-z]+)"
-            text = " " + text + "  "
-            text = text.replace("\n"," ")
-            text = re.sub(prefixes,"\\1<prd>",text)
-            text = re.sub(websites,"<prd>\\1",text)
-            if "Ph.D" in text:
-                text = text.replace("Ph.D.","Ph<prd>D<prd>")
-            text = re.sub(r"\s" + caps + "[.] "," \\1<prd> ",text)
-            text = re.sub(acronyms+" "+starters,"\\1<stop> \\2",text)
-            text = re.sub(caps + "[.]" + caps + "[.]" + caps + "[.]","\\1<prd>\\2<prd>\\3<prd>",text)
-            text = re.sub(caps + "[.]" + caps + "[.]","\\1<prd>\\2<prd>",text)
-            text = re.sub(" "+suffixes+"[.] "+starters," \\1<stop> \\2",text)
-            text = re.sub(" "+suffixes+"[.]"," \\1<prd>",text)
-            text = re.sub(" " + caps + "[.]"," \\1<prd>",text)
-            text = re.sub(digits + caps + "[.]"," \\1<prd>",text)
-            text = re.sub(digits + "[.]" + digits,"\\1<prd>\\2",text)
-            text = re.sub(digits + "[.]" + fig_letters,"\\1<prd>\\2",text)
-            text = re.sub(species, "\\1<prd> \\2", text)
-            if "”"    in text:
-                text = text.replace(".”","”.")
-            if "\""   in text:
-                text = text.replace(".\"","\".")
-            if "!"    in text:
-                text = text.replace("!\"","\"!")
-            if "?"    in text:
-                text = text.replace("?\"","\"?")
-            if "e.g." in text:
-                text = text.replace("e.g.","e<prd>g<prd>")
-            if "i.e." in text:
-                text = text.replace("i.e.","i<prd>e<prd>")
-            text = text.replace(".",".<stop>")
-            text = text.replace("?","?<stop>")
-            text = text.replace("!","!<stop>")
-            text = text.replace("<prd>",".")
-            sentences = text.split("<stop>")
-            #sentences = sentences[:-1]
-            sentences = [ s.strip() for s in sentences ]
-            try:
-                html = HTMLParser()
-            except:
-                import html
-            for sentence in sentences:
-                sentence = str(html.unescape(sentence))
-                if not sentence.strip() or not isinstance(sentence, str):
+            self.text = unescape(text)
+            for start, end in split_spans(self.text):
+                self.sentences.append(Sentence(buffer=self.text, start=start, end=end))
+
+    def annotate_sentences(self, source="fulltext", chunk_size=CHUNK_SIZE, client=None, cache=None):
+        '''
+        Splits the text in sentences and annotates them with StanfordCoreNLP,
+        sending the whole text (or pieces of chunk_size characters) in each request
+        instead of one request per sentence. Saves them in the attribute
+        "sentences" as a list of Sentence objects with their tokens. Pieces that
+        can't be annotated (or not before the deadline) are split with the ppaxe
+        splitter and annotated in batches (see annotate_batch). Raises
+        ServerUnavailable if no server can be reached.
+
+        Parameters
+        ----------
+        source : str, optional, default = "fulltext"
+            Use the "fulltext" or the "abstract" to extract sentences.
+
+        chunk_size : int, optional, default = CHUNK_SIZE
+            Maximum characters sent in each request.
+
+        client : CoreNLPClient, optional, default = None
+            StanfordCoreNLP client. NLP if None.
+
+        cache : AnnotationCache, optional, default = None
+            Cache of annotations of the whole pieces of text: a piece is only
+            found if the same piece of the same text was annotated before, so
+            identical sentences of other articles are not reused (see
+            annotate_batch, used by the splitter "regex", for that).
+        '''
+        client = client if client is not None else NLP
+        if source == "fulltext":
+            text = str(self.fulltext)
+        else:
+            text = str(self.abstract)
+        self.text = unescape(text)
+        for start, end in text_chunks(self.text, chunk_size):
+            chunk = self.text[start:end]
+            if not chunk.strip():
+                continue
+            annotated = cache.get(chunk) if cache is not None else None
+            if annotated is not None:
+                annotated = [ Tokens.from_json(tokens) for tokens in annotated ]
+            else:
+                try:
+                    annotated = annotate_text(chunk, client=client)
+                except ServerUnavailable:
+                    raise
+                except (ValueError, requests.exceptions.RequestException):
+                    logging.warning("Can't annotate %s characters of article %s. Splitting them...", len(chunk), self.pmid)
+                    sentences = [ Sentence(buffer=self.text, start=start + first, end=start + last) for first, last in split_spans(chunk) ]
+                    annotate_batch(sentences, client=client, cache=cache)
+                    self.sentences.extend(sentences)
+                    continue
+                if cache is not None:
+                    cache.put([(chunk, [ tokens.to_json() for tokens in annotated ])])
+            positions = utf16_positions(chunk)
+            for tokens in annotated:
+                if not tokens:
                     continue
-                self.sentences.append(Sentence(originaltext=sentence))
+                first = tokens.begin
+                last  = tokens.end
+                if positions is not None:
+                    first = positions[first]
+                    last  = positions[last]
+                sentence = Sentence(buffer=self.text, start=start + first, end=start + last)
+                sentence.tokens = tokens
+                self.sentences.append(sentence)
 
     def count_genes(self):
         '''
@@ -506,11 +1631,21 @@ class Sentence(object):
     Attributes
     ----------
     originaltext : str, no default
-        Original text string of the sentence.
+        Original text string of the sentence. Created from buffer when needed.
+
+    buffer : str, no default
+        Text containing the sentence (the normalized text of the article).
+
+    start : int, no default
+        Position of the sentence in buffer.
+
+    end : int, no default
+        Position in buffer after the end of the sentence.
 
-    tokens : list, no default
-        List of tokens retrieved from StanfordCoreNLP. Each element is a dictionary
-        with keys:
+    tokens : Tokens, no default
+        Tokens retrieved from StanfordCoreNLP (see ppaxe.tokens). Lists of
+        StanfordCoreNLP tokens are converted when assigned. Each element is a
+        dictionary with keys:
             "index" : Position of token (1-Indexed).
             "word"  : Word of the token.
             "lemma" : Lemma of the token.
@@ -523,37 +1658,110 @@ class Sentence(object):
     proteins : list, no default
         List of Protein objects found in sentence.
 
+    failed : bool, default = False
+        True if the sentence was sent to StanfordCoreNLP in a batch and couldn't
+        be annotated (see annotate_batch). It is not annotated again.
+
     '''
-    def __init__(self, originaltext):
+    def __init__(self, originaltext=None, buffer=None, start=0, end=None):
         '''
         Parameters
         ----------
-        originaltext : str, required, no default
-            Original text string of the sentence.
+        originaltext : str, optional, default = None
+            Original text string of the sentence. Required if buffer is None.
+
+        buffer : str, optional, default = None
+            Text containing the sentence. The sentence is buffer[start:end].
+
+        start : int, optional, default = 0
+            Position of the sentence in buffer.
+
+        end : int, optional, default = None
+            Position in buffer after the end of the sentence. len(buffer) if None.
         '''
-        self.originaltext = originaltext
-        self.tokens       = list()
+        if buffer is None:
+            buffer = originaltext
+        self.buffer       = buffer
+        self.start        = start
+        self.end          = len(buffer) if end is None else end
+        self.__text       = None
+        self.tokens       = Tokens()
         self.tree         = list()
         self.candidates   = list()
         self.proteins     = list()
+        self.failed       = False
 
-    def annotate(self):
+    @property
+    def originaltext(self):
+        '''
+        Text of the sentence (sliced from buffer the first time)
+        '''
+        if self.__text is None:
+            if self.start == 0 and self.end == len(self.buffer):
+                self.__text = self.buffer
+            else:
+                self.__text = self.buffer[self.start:self.end]
+        return self.__text
+
+    @originaltext.setter
+    def originaltext(self, text):
+        self.buffer = text
+        self.start  = 0
+        self.end    = len(text)
+        self.__text = text
+
+    @property
+    def tokens(self):
+        '''
+        Tokens of the sentence
+        '''
+        return self.__tokens
+
+    @tokens.setter
+    def tokens(self, tokens):
+        self.__tokens = Tokens.from_corenlp(tokens)
+
+    @property
+    def span(self):
+        '''
+        (start, end) positions of the sentence in buffer
+        '''
+        return (self.start, self.end)
+
+    def annotate(self, client=None, cache=None):
         '''
         Annotates the genes/proteins in the sentence using StanfordCoreNLP
         trained NER tagger. Will add a list of tokens to the attribute "tokens".
+
+        Parameters
+        ----------
+        client : CoreNLPClient, optional, default = None
+            StanfordCoreNLP client. NLP if None.
+
+        cache : AnnotationCache, optional, default = None
+            Cache of annotations. If the sentence is cached, it is not sent to the server.
         '''
-        if not self.originaltext.strip():
+        client = client if client is not None else NLP
+        text = self.originaltext
+        if not text.strip():
             self.tokens = ""
-        annotated = json.loads(NLP.annotate(self.originaltext))
-        if annotated['sentences']:
-            self.tokens = annotated['sentences'][0]['tokens']
+            return
+        annotated = cache.get(text) if cache is not None else None
+        if annotated is not None:
+            annotated = [ Tokens.from_json(tokens) for tokens in annotated ]
+        else:
+            annotated = annotate_text(text, client=client)
+            if cache is not None:
+                cache.put([(text, [ tokens.to_json() for tokens in annotated ])])
+        if annotated:
+            self.tokens = annotated[0]
 
     def get_candidates(self, only_dict=False):
         '''
         Gets interaction candidates candidates for sentence (attribute: candidates)
         and all the proteins (attribute: proteins).
         '''
-        if not self.tokens:
+        if not self.tokens and not self.failed:
             self.annotate()
         if self.candidates:
             return
@@ -562,12 +1770,13 @@ class Sentence(object):
         prot_counter = 0
         state        = 0
         prot_list = list()
-        for token in self.tokens:
-            if token['ner'] == "P":
+        protein_tag = NER.id("P")
+        for idx, tag in enumerate(self.tokens.ner):
+            if tag == protein_tag:
                 state = 1
                 if len(prot_list) - 1 < prot_counter :
                     prot_list.append(list())
-                prot_list[prot_counter].append(token['index'])
+                prot_list[prot_counter].append(idx + 1)
             else:
                 if state == 1:
                     prot_counter += 1
@@ -577,7 +1786,7 @@ class Sentence(object):
         for prot_pos in prot_list:
             # Must substract 1 to token_idx because Stanford CoreNLP has indexes from 1-n, while
             # python lists go from 0-n
-            protein_symbol = " ".join([self.tokens[token_idx - 1]['word'] for token_idx in prot_pos])
+            protein_symbol = " ".join([self.tokens.words[token_idx - 1] for token_idx in prot_pos])
             protein = Protein(
                 symbol=protein_symbol,
                 positions=prot_pos,
@@ -604,13 +1813,15 @@ class Sentence(object):
 
         state = 0
         html_list = list()
-        for token in self.tokens:
-            word = token['word']
+        tokens = self.tokens
+        for word, ner, pos in zip(tokens.words, tokens.ner, tokens.pos):
+            ner = NER[ner]
+            pos = POS[pos]
             word = re.sub("-LRB-", "(", word)
             word = re.sub("-RRB-", ")", word)
             if state == 0:
-                if token['ner'] == "O":
-                    if re.match('VB[DGNPZ]?', token['pos']):
+                if ner == "O":
+                    if re.match('VB[DGNPZ]?', pos):
                         html_list.append('<span class="verb">%s</span>' % word)
                     else:
                         html_list.append(word)
@@ -620,10 +1831,10 @@ class Sentence(object):
                     html_list.append('<span class="prot">')
                     html_list.append(word)
             else:
-                if token['ner'] == "O":
+                if ner == "O":
                     # End of protein
                     html_list.append("</span>")
-                    if re.match('VB[DGNPZ]?', token['pos']):
+                    if re.match('VB[DGNPZ]?', pos):
                         html_list.append('<span class="verb">%s</span>' % word)
                     else:
                         html_list.append(word)
@@ -633,11 +1844,12 @@ class Sentence(object):
                     html_list.append(word)
         return " ".join(html_list)
 
-    def extract_interactions(self, only_dict):
+    def extract_interactions(self, only_dict, client=None, cache=None):
         """
         Extracts interactions described in sentence.
         """
-        self.annotate()
+        if not self.tokens:
+            self.annotate(client=client, cache=cache)
         self.get_candidates(only_dict)
         for candidate in self.candidates:
             candidate.predict()
@@ -707,6 +1919,9 @@ class InteractionCandidate(object):
         "discharge":1, "mediate":1, "modulate":1, "repress":1, "transactivate":1
     })
 
+    # Verb POS tags by their id in ppaxe.tokens.POS
+    verb_tags = dict([ (POS.id(tag), tag) for tag in ("VB", "VBD", "VBG", "VBN", "VBP", "VBZ") ])
+
     PRED_FILE = pkg_resources.resource_filename('ppaxe', 'data/RF_scikit.pkl')
     with open(PRED_FILE, 'rb') as f:
         try:
@@ -762,7 +1977,7 @@ class InteractionCandidate(object):
         '''
         Token distance from protein A to protein B.
         '''
-        subsentence = self.prot1.sentence.tokens[self.between_idxes[0]:self.between_idxes[1]]
+        subsentence = self.prot1.sentence.tokens.words[self.between_idxes[0]:self.between_idxes[1]]
         if len(subsentence) > 0:
             self.feat_cols.append(self.feat_current_col)
             self.feat_vals.append(len(subsentence))
@@ -789,21 +2004,16 @@ class InteractionCandidate(object):
             Count number of times proteins appears in whole sentence (mode="all") or only
             between candidate proteins (mode="between").
         '''
-        prota_count = 0
-        protb_count = 0
-        tokens = list()
+        words = list()
         if mode == "all":
-            tokens = self.prot1.sentence.tokens
+            words = self.prot1.sentence.tokens.words
         else:
             init_coord  = self.between_idxes[0] - 1
             final_coord = self.between_idxes[1] + 1
-            tokens = self.prot1.sentence.tokens[init_coord:final_coord]
+            words = self.prot1.sentence.tokens.words[init_coord:final_coord]
 
-        for token in tokens:
-            if token['word'] == self.prot1.symbol:
-                prota_count += 1
-            if token['word'] == self.prot2.symbol:
-                protb_count += 1
+        prota_count = words.count(self.prot1.symbol)
+        protb_count = words.count(self.prot2.symbol)
 
         # These features are always > 0
         # We always need to add them
@@ -815,37 +2025,21 @@ class InteractionCandidate(object):
 
     def __get_token_pos(self, mode="all"):
         '''
-        Returns a string with the token POS annotations for coordinates 'from'-'to'.
+        Returns a Counter with the number of tokens of each POS tag id.
 
         Parameters
         ----------
         mode : str, optional, default = "all"
-            Protein object of the first protein involved in the possible interaction.
-
-        prot2 : Protein, required, no default.
-            Protein object of the second protein involved in the possible interaction.
-
+            Count POS tags in whole sentence (mode="all") or between candidate proteins
+            (mode="between").
         '''
-        init_coord  = None
-        final_coord = None
-        if mode == "all":
-            '''
-            Retrieve POS for all the sentence
-            '''
-            init_coord  = 0
-            final_coord = len(self.prot1.sentence.tokens)
-        else:
+        pos = self.prot1.sentence.tokens.pos
+        if mode != "all":
             '''
             Retrieve POS between candidate genes
             '''
-            init_coord  = self.between_idxes[0] - 1
-            final_coord = self.between_idxes[1] + 1
-
-        pos_str = list()
-        subsentence = self.prot1.sentence.tokens[init_coord:final_coord]
-        for token in subsentence:
-            pos_str.append(token['pos'])
-        return ",".join(pos_str)
+            pos = pos[self.between_idxes[0] - 1:self.between_idxes[1] + 1]
+        return Counter(pos)
 
     def __pos_features(self, mode):
         '''
@@ -873,9 +2067,17 @@ class InteractionCandidate(object):
         }
 
         if mode == "all" or mode == "between":
-            for pos in self.__get_token_pos(mode=mode).split(","):
-                if pos in pos_counts:
-                    pos_counts[pos] += 1
+            tag_counts = self.__get_token_pos(mode=mode)
+            # The model was trained counting the tags of a comma-separated string:
+            # each "," tag counted as two empty tags, and no tags as one.
+            if not tag_counts:
+                pos_counts[""] += 1
+            for tag_id, count in tag_counts.items():
+                pos = POS[tag_id]
+                if pos == ",":
+                    pos_counts[""] += 2 * count
+                elif pos in pos_counts:
+                    pos_counts[pos] += count
         for postag in sorted(pos_counts):
             if pos_counts[postag] > 0:
                 self.feat_cols.append(self.feat_current_col)
@@ -923,22 +2125,26 @@ class InteractionCandidate(object):
         totalscore = 0
         verb_idxes = list()
         someverb_flag = False
-        tokens_to_work = list()
+        tokens = self.prot1.sentence.tokens
 
         if flag == "between":
-            tokens_to_work = self.prot1.sentence.tokens[self.between_idxes[0]:self.between_idxes[1]]
+            start = self.between_idxes[0]
+            end   = min(self.between_idxes[1], len(tokens))
         else:
-            tokens_to_work = self.prot1.sentence.tokens
+            start = 0
+            end   = len(tokens)
 
-        for token in tokens_to_work:
-            if re.match('VB[DGNPZ]?', token['pos']):
+        for idx in range(start, end):
+            verb = InteractionCandidate.verb_tags.get(tokens.pos[idx])
+            if verb is not None:
                 someverb_flag = True
-                numverbs[token['pos']]  += 1
-                verb_idxes.append(token['index'])
-                if token['lemma'] in InteractionCandidate.verb_scores:
-                    totalscore +=  InteractionCandidate.verb_scores[token['lemma']]
-                    if InteractionCandidate.verb_scores[token['lemma']] > maxscore:
-                        maxscore = InteractionCandidate.verb_scores[token['lemma']]
+                numverbs[verb]  += 1
+                verb_idxes.append(idx + 1)
+                score = InteractionCandidate.verb_scores.get(LEMMAS[tokens.lemmas[idx]])
+                if score is not None:
+                    totalscore +=  score
+                    if score > maxscore:
+                        maxscore = score
 
         # Compute verb distances for the two proteins
         (cl1, far1, cl2, far2) = (0,0,0,0)
@@ -983,17 +2189,16 @@ class InteractionCandidate(object):
         'ubiquitinylate': 0, 'up-regulate': 0, 'upregulate': 0
         })
 
-        tokens = list()
-        if mode == "all":
-            tokens = self.prot1.sentence.tokens
-        else:
+        lemmas = self.prot1.sentence.tokens.lemmas
+        if mode != "all":
             init_coord  = self.between_idxes[0] - 1
             final_coord = self.between_idxes[1] + 1
-            tokens = self.prot1.sentence.tokens[init_coord:final_coord]
+            lemmas = lemmas[init_coord:final_coord]
 
-        for token in tokens:
-            if token['lemma'] in keywords:
-                keywords[token['lemma']] += 1
+        for lemma_id, count in Counter(lemmas).items():
+            lemma = LEMMAS[lemma_id]
+            if lemma in keywords:
+                keywords[lemma] += count
 
         for word, value in sorted(keywords.items()):
             if value > 0:
@@ -1048,15 +2253,15 @@ class InteractionCandidate(object):
         prot2_coords = [pos - 1 for pos in self.prot2.positions]
         html_str = list()
         between = range(init_coord, final_coord)
-        for i in range(0, len(self.prot1.sentence.tokens)):
-            token = self.prot1.sentence.tokens[i]
-            word = token['word']
+        tokens = self.prot1.sentence.tokens
+        for i in range(0, len(tokens)):
+            word = tokens.words[i]
             word = re.sub("-LRB-", "(", word)
             word = re.sub("-RRB-", ")", word)
             word = re.sub("-LSB-", "[", word)
             word = re.sub("-RSB-", "]", word)
             if i in between:
-                if re.match('VB[DGNPZ]?', token['pos']):
+                if re.match('VB[DGNPZ]?', POS[tokens.pos[i]]):
                     # Verb in between
                     html_str.append('<span class="verb">%s</span>' % word)
                 else:
@@ -0,0 +1,674 @@
+'''
+Annotator backends: clients for StanfordCoreNLP servers. See also ppaxe.replay
+(annotations stored on disk) and ppaxe.standin (local stand-in server).
+'''
+from array import array
+import json
+import logging
+import threading
+import time
+import requests
+from ppaxe.ncbi import backoff_time
+from ppaxe.tokens import Tokens, LEMMAS, POS, NER
+
+DEFAULT_URL = "http://localhost:9000"
+TIMEOUT     = (10, 300) # (connect, read) seconds
+
+# Deadline of each request: DEADLINE_TIME seconds plus DEADLINE_RATE seconds per
+# character of text, up to the read timeout of the client.
+DEADLINE_TIME = 30
+DEADLINE_RATE = 0.01
+
+# Timeout of the GET requests that check a server (connect, read) seconds, and
+# seconds between the checks of the servers of a CoreNLPPool
+CHECK_TIMEOUT  = (5, 10)
+CHECK_INTERVAL = 60
+
+# Text annotated by CoreNLPPool.check to test the output format of the servers
+PROBE_TEXT = "MAPK1 binds TP53."
+
+# Start of the error message of the server when the annotation of a text takes
+# longer than its own timeout (answered with status 500)
+TIMEOUT_MESSAGE = "CoreNLP request timed out"
+
+# Seconds an endpoint of a CoreNLPPool is not used after FAILURE_THRESHOLD
+# consecutive failures (connection errors and server errors, not timeouts).
+# Doubled after each failure until a request succeeds, up to MAX_EJECT_TIME.
+# When all the servers are ejected, requests wait up to MAX_WAIT seconds for
+# the end of an ejection.
+EJECT_TIME        = 30
+MAX_EJECT_TIME    = 600
+FAILURE_THRESHOLD = 3
+MAX_WAIT          = 120
+
+# Rounds of retries over the servers of a CoreNLPPool after connection errors,
+# with the exponential backoff of ppaxe.ncbi between them.
+RETRIES = 2
+
+# Concurrency limit of each endpoint of a CoreNLPPool (additive increase,
+# multiplicative decrease): at most MAX_INFLIGHT requests at the same time,
+# multiplied by DECREASE_FACTOR after a failure or a request SLOW_FACTOR times
+# slower (per character, plus LATENCY_CHARS) than the usual latency of the
+# server, which is a moving average with weight LATENCY_WEIGHT.
+MAX_INFLIGHT    = 16
+DECREASE_FACTOR = 0.5
+SLOW_FACTOR     = 3.0
+LATENCY_CHARS   = 100
+LATENCY_WEIGHT  = 0.1
+
+# time.monotonic is not available in python 2.7
+_clock = getattr(time, "monotonic", time.time)
+
+# Properties of the output formats of the server. "json" is the default output
+# without indentation. "conll" only has the columns used by ppaxe, one token per
+# line, and is decoded without building a dictionary per token.
+CONLL_COLUMNS  = "idx,word,lemma,pos,ner,characterOffsetBegin,characterOffsetEnd"
+OUTPUT_FORMATS = dict({
+    'json':  {'outputFormat': 'json', 'output.prettyPrint': 'false'},
+    'conll': {'outputFormat': 'conll', 'output.columns': CONLL_COLUMNS}
+})
+
+
+# FUNCTIONS
+# ----------------------------------------------
+def decode_json(response):
+    '''
+    Returns the Tokens of each sentence of a JSON response of the server.
+    Raises ValueError if response is not valid JSON or has no sentences.
+    '''
+    try:
+        return [ Tokens.from_corenlp(sentence['tokens']) for sentence in json.loads(response)['sentences'] ]
+    except (KeyError, TypeError) as err:
+        raise ValueError("Not a JSON response with sentences (%s): %s" % (err, response[:100]))
+
+def decode_conll(response):
+    '''
+    Returns the Tokens of each sentence of a CoNLL response of the server with
+    the columns of CONLL_COLUMNS (sentences are separated by empty lines). Raises
+    ValueError if a line doesn't have those columns (e.g. an error message).
+    '''
+    sentences = list()
+    ncolumns  = CONLL_COLUMNS.count(",") + 1
+    for block in response.replace("\r\n", "\n").split("\n\n"):
+        rows = [ line.split("\t") for line in block.split("\n") if line.strip() ]
+        if not rows:
+            continue
+        for row in rows:
+            if len(row) != ncolumns:
+                raise ValueError("Not a CoNLL line: %s" % "\t".join(row)[:100])
+        sentences.append(Tokens(
+            words=[ row[1] for row in rows ],
+            lemmas=array('i', [ LEMMAS.id(row[2]) for row in rows ]),
+            pos=array('i', [ POS.id(row[3]) for row in rows ]),
+            ner=array('i', [ NER.id(row[4]) for row in rows ]),
+            begin=int(rows[0][5]), end=int(rows[-1][6])
+        ))
+    return sentences
+
+def decode(response, output_format="json"):
+    '''
+    Returns the Tokens of each sentence of a response of the server in
+    output_format ("json" or "conll", see OUTPUT_FORMATS).
+    '''
+    if output_format == "conll":
+        return decode_conll(response)
+    return decode_json(response)
+
+def check_format(output_format):
+    '''
+    Raises ValueError if output_format is not in OUTPUT_FORMATS.
+    '''
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError('Incorrect output format "%s". Choose "%s"' % (output_format, '" or "'.join(sorted(OUTPUT_FORMATS))))
+
+
+# CLASSES
+# ----------------------------------------------
+class Annotator(object):
+    '''
+    Interface of the annotator backends used by ppaxe (see ppaxe.core.annotate_text).
+    A backend answers like the StanfordCoreNLP server: annotate returns the
+    response to a request (a string in the requested "outputFormat"), and
+    raises requests.exceptions.RequestException if the annotations can't be
+    obtained.
+
+    Attributes
+    ----------
+    output_format : str, no default
+        Output format requested by ppaxe (see OUTPUT_FORMATS).
+    '''
+    output_format = "json"
+
+    def annotate(self, text, properties=None):
+        '''
+        Annotates text and returns the response of the backend.
+
+        Parameters
+        ----------
+        text : str, required, no default
+            Text to annotate.
+
+        properties : dict, optional, default = None
+            Properties of the request (as in the StanfordCoreNLP server).
+        '''
+        raise NotImplementedError("%s can't annotate texts" % self.__class__.__name__)
+
+
+class CoreNLPClient(Annotator):
+    '''
+    Thread-safe client for the StanfordCoreNLP server, with the annotate method
+    of pycorenlp.StanfordCoreNLP. Each thread has its own requests.Session, so
+    every worker keeps a persistent connection to the server and the requests of
+    different threads are processed at the same time by the server threads
+    (option -threads). pycorenlp checks the server and opens a new connection
+    for every request.
+
+    Attributes
+    ----------
+    url : str, no default
+        Address of the server.
+
+    timeout : tuple, no default
+        Connect and read timeouts in seconds. The read timeout of each request
+        is its deadline (see deadline).
+
+    output_format : str, no default
+        Output format requested by ppaxe (see OUTPUT_FORMATS and ppaxe.core.annotate_text).
+    '''
+    def __init__(self, url=DEFAULT_URL, timeout=TIMEOUT, output_format="json"):
+        '''
+        Parameters
+        ----------
+        url : str, optional, default = DEFAULT_URL
+            Address of the server.
+
+        timeout : tuple, optional, default = TIMEOUT
+            Connect and maximum read timeouts in seconds.
+
+        output_format : str, optional, default = "json"
+            "json" or "conll" (requires a server that supports output.columns).
+        '''
+        check_format(output_format)
+        self.url     = url.rstrip("/")
+        self.timeout = timeout
+        self.output_format = output_format
+        self.local   = threading.local()
+
+    @property
+    def session(self):
+        '''
+        requests.Session of the current thread
+        '''
+        session = getattr(self.local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update({'Connection': 'keep-alive'})
+            self.local.session = session
+        return session
+
+    def deadline(self, text):
+        '''
+        Returns the (connect, read) timeouts of a request to annotate text: the
+        read timeout grows with the length of text (DEADLINE_TIME seconds plus
+        DEADLINE_RATE seconds per character) up to the one of the client, so a
+        stalled request of a short text is not waited for minutes.
+        '''
+        connect, read = self.timeout if isinstance(self.timeout, tuple) else (self.timeout, self.timeout)
+        return (connect, min(read, DEADLINE_TIME + DEADLINE_RATE * len(text)))
+
+    def annotate(self, text, properties=None):
+        '''
+        Annotates text and returns the response of the server (JSON string).
+        Raises requests.exceptions.RequestException if the server can't be
+        reached, requests.exceptions.ReadTimeout if it doesn't answer before the
+        deadline of the request (or its own timeout), ServerError if it answers
+        with another error (status 5xx), or requests.exceptions.HTTPError if the
+        request is rejected (status 4xx).
+
+        Parameters
+        ----------
+        text : str, required, no default
+            Text to annotate.
+
+        properties : dict, optional, default = None
+            Properties of the request (they override the ones of the server).
+        '''
+        params = dict()
+        if properties:
+            params['properties'] = json.dumps(properties)
+        req = self.session.post(self.url, params=params, data=text.encode('utf-8'), timeout=self.deadline(text))
+        req.encoding = 'utf-8'
+        if req.status_code >= 500:
+            if req.text.startswith(TIMEOUT_MESSAGE):
+                raise requests.exceptions.ReadTimeout("%s: %s" % (self.url, req.text[:100]), response=req)
+            raise ServerError("%s answered %s: %s" % (self.url, req.status_code, req.text[:100]), response=req)
+        req.raise_for_status()
+        return req.text
+
+    def __str__(self):
+        return "StanfordCoreNLP server at %s" % self.url
+
+
+class Endpoint(object):
+    '''
+    StanfordCoreNLP server of a CoreNLPPool with its state and statistics.
+
+    Attributes
+    ----------
+    client : CoreNLPClient, no default
+        Client of the server.
+
+    outstanding : int, no default
+        Requests sent and not answered yet.
+
+    requests : int, no default
+        Requests answered.
+
+    failures : int, no default
+        Requests that failed (connection errors and server errors).
+
+    timeouts : int, no default
+        Requests not answered before their deadline.
+
+    consecutive : int, no default
+        Failures since the last answered request.
+
+    latency : float, no default
+        Total seconds of the answered requests.
+
+    max_latency : float, no default
+        Seconds of the slowest answered request.
+
+    ejected_until : float, no default
+        Time until the endpoint is not used. 0 if it is healthy.
+
+    eject_time : float, no default
+        Seconds of the next ejection.
+
+    limit : float, no default
+        Current limit of outstanding requests (its integer part is used).
+
+    max_limit : int, no default
+        Maximum limit of outstanding requests.
+
+    usual_rate : float, no default
+        Moving average of the seconds per character of the answered requests.
+        None until a request is answered.
+
+    decreased_at : float, no default
+        Time of the last decrease of limit.
+    '''
+    def __init__(self, client, max_limit=MAX_INFLIGHT):
+        '''
+        Parameters
+        ----------
+        client : CoreNLPClient, required, no default
+            Client of the server.
+
+        max_limit : int, optional, default = MAX_INFLIGHT
+            Maximum number of outstanding requests.
+        '''
+        self.client        = client
+        self.outstanding   = 0
+        self.requests      = 0
+        self.failures      = 0
+        self.timeouts      = 0
+        self.consecutive   = 0
+        self.latency       = 0.0
+        self.max_latency   = 0.0
+        self.ejected_until = 0
+        self.eject_time    = EJECT_TIME
+        self.limit         = float(max_limit)
+        self.max_limit     = max_limit
+        self.usual_rate    = None
+        self.decreased_at  = 0
+
+    @property
+    def url(self):
+        return self.client.url
+
+    def stats(self):
+        '''
+        Returns a dictionary with the statistics of the endpoint.
+        '''
+        return dict({
+            'url':          self.url,
+            'requests':     self.requests,
+            'failures':     self.failures,
+            'timeouts':     self.timeouts,
+            'outstanding':  self.outstanding,
+            'limit':        int(self.limit),
+            'mean_latency': self.latency / self.requests if self.requests else 0.0,
+            'max_latency':  self.max_latency,
+            'ejected':      self.ejected_until > 0
+        })
+
+    def __str__(self):
+        return "%(url)s: %(requests)s requests, %(failures)s failures, %(timeouts)s timeouts, %(mean_latency).3f s mean latency, %(max_latency).3f s max latency, %(limit)s concurrent requests" % self.stats()
+
+
+class CoreNLPPool(Annotator):
+    '''
+    Client for several StanfordCoreNLP servers, with the annotate method of
+    CoreNLPClient. Each request is sent to the available server with the fewest
+    outstanding requests.
+
+    Each server has a limit of outstanding requests (requests wait for a free
+    slot): it grows by one every limit answered requests and is halved after a
+    failure, a timeout or an answer much slower than usual, so a slow server
+    gets fewer requests instead of queueing them until they time out. A server
+    that fails (connection error or ServerError) FAILURE_THRESHOLD times in a
+    row is ejected (not used) for EJECT_TIME seconds, doubled after each
+    failure, and is checked with a GET request and a single request before
+    using it again. A timeout doesn't eject the server: the text may be too
+    slow to annotate anywhere, so it is not sent again. The servers that are not
+    ejected are checked every CHECK_INTERVAL seconds, and ejected if they can't
+    be reached. Failed requests are sent to another server, and retried for
+    RETRIES rounds after a backoff. If all servers are ejected, requests wait
+    up to max_wait seconds for the end of an ejection (or for a free slot if
+    none is released).
+
+    Attributes
+    ----------
+    endpoints : list, no default
+        List of Endpoint objects.
+
+    output_format : str, no default
+        Output format requested by ppaxe (see CoreNLPClient).
+
+    retries : int, no default
+        Rounds of retries after connection errors.
+
+    max_wait : float, no default
+        Maximum seconds a request waits for a server when all are ejected, or
+        for a free slot when all are busy (since the last released slot).
+
+    releases : int, no default
+        Number of finished requests (to detect stalled waits for a slot).
+
+    next_check : float, no default
+        Time (see _clock) of the next check of the servers.
+    '''
+    def __init__(self, urls, timeout=TIMEOUT, output_format="json", max_inflight=MAX_INFLIGHT, retries=RETRIES, max_wait=MAX_WAIT):
+        '''
+        Parameters
+        ----------
+        urls : list, required, no default
+            Addresses of the servers.
+
+        timeout : tuple, optional, default = TIMEOUT
+            Connect and maximum read timeouts in seconds (see CoreNLPClient.deadline).
+
+        output_format : str, optional, default = "json"
+            "json" or "conll" (see CoreNLPClient).
+
+        max_inflight : int, optional, default = MAX_INFLIGHT
+            Maximum number of outstanding requests of each server.
+
+        retries : int, optional, default = RETRIES
+            Rounds of retries after connection errors.
+
+        max_wait : float, optional, default = MAX_WAIT
+            Maximum seconds a request waits for a server when all are ejected,
+            or for a free slot when all are busy.
+        '''
+        check_format(output_format)
+        self.endpoints = [ Endpoint(CoreNLPClient(url, timeout=timeout, output_format=output_format), max_limit=max_inflight) for url in urls ]
+        self.output_format = output_format
+        self.retries   = retries
+        self.max_wait  = max_wait
+        self.lock      = threading.Lock()
+        self.released  = threading.Condition(self.lock)
+        self.releases  = 0
+        self.next_check = _clock() + CHECK_INTERVAL
+
+    def annotate(self, text, properties=None):
+        '''
+        Annotates text in one of the servers and returns its response (JSON
+        string). Raises requests.exceptions.ReadTimeout if the text is not
+        annotated before its deadline, the last ServerError if the servers fail
+        to annotate it, requests.exceptions.HTTPError if the text is rejected
+        (status 4xx), or ServerUnavailable if no server can be reached (or all
+        are ejected, or busy, for more than max_wait seconds).
+
+        Parameters
+        ----------
+        text : str, required, no default
+            Text to annotate.
+
+        properties : dict, optional, default = None
+            Properties of the request (they override the ones of the server).
+        '''
+        self.__check_periodically()
+        error = None
+        for attempt in range(self.retries + 1):
+            if attempt > 0:
+                time.sleep(backoff_time(attempt - 1))
+            tried = list()
+            while True:
+                endpoint = self.__acquire(tried)
+                if endpoint is None:
+                    break
+                tried.append(endpoint)
+                start  = _clock()
+                result = "failed"
+                try:
+                    if endpoint.ejected_until and not self.__is_healthy(endpoint):
+                        raise requests.exceptions.ConnectionError("%s is not available" % endpoint.url)
+                    start    = _clock()
+                    response = endpoint.client.annotate(text, properties)
+                    result   = "answered"
+                except requests.exceptions.ReadTimeout as err:
+                    # A slow text is not sent again (it can be split)
+                    result = "timeout"
+                    logging.warning("StanfordCoreNLP server %s timed out (%s).", endpoint.url, err)
+                    raise
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout, ServerError) as err:
+                    error = err
+                    logging.warning("StanfordCoreNLP server %s failed (%s).", endpoint.url, err)
+                except requests.exceptions.HTTPError:
+                    # Rejected text (status 4xx): the server answered
+                    result = "answered"
+                    raise
+                else:
+                    return response
+                finally:
+                    # Any other error (e.g. a broken response) is a failure
+                    self.__release(endpoint, start, len(text), failed=(result == "failed"), timeout=(result == "timeout"))
+            if not tried:
+                break
+        if isinstance(error, ServerError):
+            raise error
+        if error is None:
+            raise ServerUnavailable("All StanfordCoreNLP servers are ejected or busy: %s" % " ".join(endpoint.url for endpoint in self.endpoints))
+        raise ServerUnavailable("Can't reach the StanfordCoreNLP servers (%s)" % error)
+
+    def check(self):
+        '''
+        Checks all the servers, ejects the ones that can't be reached and
+        returns the number of available servers. Each available server annotates
+        PROBE_TEXT: raises ValueError if a response can't be decoded in the
+        output format (e.g. a server that doesn't support output.columns).
+        '''
+        available = 0
+        for endpoint in self.endpoints:
+            healthy = self.__is_healthy(endpoint) and self.__probe(endpoint)
+            with self.lock:
+                if healthy:
+                    available += 1
+                    endpoint.ejected_until = 0
+                    endpoint.eject_time    = EJECT_TIME
+                    endpoint.consecutive   = 0
+                else:
+                    self.__eject(endpoint)
+                self.released.notify_all()
+        return available
+
+    def __probe(self, endpoint):
+        '''
+        Returns True if the server of endpoint annotates PROBE_TEXT, False if it
+        can't be reached. Raises ValueError if the response can't be decoded in
+        the output format.
+        '''
+        try:
+            response = endpoint.client.annotate(PROBE_TEXT, OUTPUT_FORMATS[self.output_format])
+        except requests.exceptions.RequestException:
+            return False
+        try:
+            decode(response, self.output_format)
+        except ValueError as err:
+            raise ValueError('StanfordCoreNLP server %s doesn\'t answer in "%s" format: %s' % (endpoint.url, self.output_format, err))
+        return True
+
+    def stats(self):
+        '''
+        Returns a list with the statistics of each server (see Endpoint.stats).
+        '''
+        with self.lock:
+            return [ endpoint.stats() for endpoint in self.endpoints ]
+
+    def __check_periodically(self):
+        '''
+        Checks the servers that are not ejected if CHECK_INTERVAL seconds have
+        passed since the last check (in the thread of the first request after
+        that), and ejects the ones that can't be reached.
+        '''
+        with self.lock:
+            now = _clock()
+            if now < self.next_check:
+                return
+            self.next_check = now + CHECK_INTERVAL
+            endpoints = [ endpoint for endpoint in self.endpoints if not endpoint.ejected_until ]
+        for endpoint in endpoints:
+            if self.__is_healthy(endpoint):
+                continue
+            with self.lock:
+                if not endpoint.ejected_until:
+                    self.__eject(endpoint)
+                self.released.notify_all()
+
+    def __acquire(self, tried):
+        '''
+        Returns the endpoint not in tried with fewest outstanding requests among
+        the ones below their limit (one request at a time if the ejection is
+        over), waiting for a slot if they are all busy. If all the endpoints not
+        in tried are ejected, waits for the end of the first ejection (up to
+        max_wait seconds). Returns None if there are no endpoints left to try,
+        if the wait would be longer, or if no slot is released for max_wait
+        seconds while they are busy.
+        '''
+        with self.lock:
+            give_up  = _clock() + self.max_wait
+            releases = self.releases
+            while True:
+                now = _clock()
+                untried    = [ endpoint for endpoint in self.endpoints if endpoint not in tried ]
+                candidates = [ endpoint for endpoint in untried if endpoint.ejected_until <= now ]
+                if not candidates:
+                    if not untried:
+                        return None
+                    first = min(endpoint.ejected_until for endpoint in untried)
+                    if first > give_up:
+                        return None
+                    self.released.wait(min(1, first - now))
+                    continue
+                available = [ endpoint for endpoint in candidates if endpoint.outstanding < (1 if endpoint.ejected_until else int(endpoint.limit)) ]
+                if available:
+                    endpoint = min(available, key=lambda endpoint: (endpoint.outstanding, endpoint.requests))
+                    endpoint.outstanding += 1
+                    return endpoint
+                if self.releases != releases:
+                    give_up  = now + self.max_wait
+                    releases = self.releases
+                elif now >= give_up:
+                    return None
+                # Checked again at least every second (ejections end)
+                self.released.wait(max(0, min(1, give_up - now)))
+
+    def __release(self, endpoint, start, chars, failed=False, timeout=False):
+        '''
+        Records the end of a request of endpoint for chars characters of text,
+        sent at start (see _clock), and updates its limit. A failed endpoint is
+        ejected after FAILURE_THRESHOLD consecutive failures (or at once if it
+        was ejected before); an answered one is healthy again. A timeout only
+        decreases the limit.
+        '''
+        with self.lock:
+            endpoint.outstanding -= 1
+            self.releases        += 1
+            if timeout:
+                endpoint.timeouts += 1
+                self.__decrease(endpoint, start)
+            elif failed:
+                endpoint.failures    += 1
+                endpoint.consecutive += 1
+                if endpoint.ejected_until or endpoint.consecutive >= FAILURE_THRESHOLD:
+                    self.__eject(endpoint)
+                self.__decrease(endpoint, start)
+            else:
+                latency = _clock() - start
+                endpoint.requests     += 1
+                endpoint.latency      += latency
+                endpoint.max_latency   = max(endpoint.max_latency, latency)
+                endpoint.ejected_until = 0
+                endpoint.eject_time    = EJECT_TIME
+                endpoint.consecutive   = 0
+                rate = latency / (chars + LATENCY_CHARS)
+                if endpoint.usual_rate is None:
+                    endpoint.usual_rate = rate
+                if rate > SLOW_FACTOR * endpoint.usual_rate:
+                    self.__decrease(endpoint, start)
+                elif endpoint.outstanding + 1 >= int(endpoint.limit):
+                    # Only grows while the limit is reached
+                    endpoint.limit = min(endpoint.max_limit, endpoint.limit + 1.0 / endpoint.limit)
+                # Slow requests only raise the usual latency gradually
+                endpoint.usual_rate += LATENCY_WEIGHT * (min(rate, SLOW_FACTOR * endpoint.usual_rate) - endpoint.usual_rate)
+            self.released.notify_all()
+
+    def __decrease(self, endpoint, start):
+        '''
+        Decreases the limit of endpoint after a problem with a request sent at
+        start, once for all the requests that were outstanding at the last
+        decrease (the lock must be held).
+        '''
+        if start >= endpoint.decreased_at:
+            endpoint.limit = max(1.0, endpoint.limit * DECREASE_FACTOR)
+            endpoint.decreased_at = _clock()
+
+    def __eject(self, endpoint):
+        '''
+        Ejects endpoint (the lock must be held).
+        '''
+        endpoint.ejected_until = _clock() + endpoint.eject_time
+        logging.warning("StanfordCoreNLP server %s ejected for %s seconds.", endpoint.url, endpoint.eject_time)
+        endpoint.eject_time    = min(endpoint.eject_time * 2, MAX_EJECT_TIME)
+
+    def __is_healthy(self, endpoint):
+        '''
+        Returns True if the server of endpoint answers a GET request.
+        '''
+        try:
+            req = endpoint.client.session.get(endpoint.url, timeout=CHECK_TIMEOUT)
+            req.close()
+        except requests.exceptions.RequestException:
+            return False
+        return req.status_code < 500
+
+    def __str__(self):
+        return "Pool of %s StanfordCoreNLP servers" % len(self.endpoints)
+
+
+# EXCEPTIONS
+# ----------------------------------------------
+class ServerUnavailable(requests.exceptions.ConnectionError):
+    '''
+    Exception raised when all the servers of a CoreNLPPool are ejected.
+    '''
+    pass
+
+class ServerError(requests.exceptions.HTTPError):
+    '''
+    Exception raised when a StanfordCoreNLP server answers with an error
+    (status 5xx).
+    '''
+    pass
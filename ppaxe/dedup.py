@@ -0,0 +1,126 @@
+'''
+Run-level deduplication of sentences: identical sentences (e.g. boilerplate,
+repeated figure legends or the same abstract in PubMed and PMC) are annotated
+and predicted once, and the results are shared by all of them.
+'''
+from collections import OrderedDict
+import hashlib
+import threading
+import unicodedata
+
+# Maximum number of distinct sentences remembered by a SentenceIndex
+MAX_SENTENCES = 100000
+
+
+# FUNCTIONS
+# ----------------------------------------------
+def normalize(text):
+    '''
+    Returns text as it is compared with other sentences: NFC form with
+    whitespace collapsed.
+    '''
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+def sentence_key(text):
+    '''
+    Returns the key of a sentence in a SentenceIndex (sha1 of the normalized text).
+    '''
+    return hashlib.sha1(normalize(text).encode("utf-8")).hexdigest()
+
+
+# CLASSES
+# ----------------------------------------------
+class SentenceIndex(object):
+    '''
+    Results of the sentences analyzed in a run, keyed by a hash of their
+    normalized text. The tokens, proteins and candidates (with their
+    predictions) of the first sentence with a text are shared by reference by
+    the next sentences with the same text, so they are not annotated or predicted
+    again. Each Article keeps its own Sentence objects, so the interactions are
+    still reported for every article that contains them. When more than
+    max_sentences texts are stored, the least recently used ones are forgotten.
+
+    Attributes
+    ----------
+    max_sentences : int, no default
+        Maximum number of distinct sentences stored. None for no limit.
+
+    sentences : OrderedDict, no default
+        Sentence with the results of each key, in order of use.
+
+    hits : int, no default
+        Sentences that reused the results of an identical one.
+    '''
+    def __init__(self, max_sentences=MAX_SENTENCES):
+        '''
+        Parameters
+        ----------
+        max_sentences : int, optional, default = MAX_SENTENCES
+            Maximum number of distinct sentences stored. None for no limit.
+        '''
+        self.max_sentences = max_sentences
+        self.sentences     = OrderedDict()
+        self.hits          = 0
+        self.lock          = threading.Lock()
+
+    def __contains__(self, sentence):
+        '''
+        True if the results of a sentence with the same text are stored.
+        '''
+        with self.lock:
+            return sentence_key(sentence.originaltext) in self.sentences
+
+    def __len__(self):
+        return len(self.sentences)
+
+    def share(self, sentence):
+        '''
+        Gives sentence the tokens, proteins and candidates of an identical
+        sentence analyzed before. Returns True if they were found.
+
+        Parameters
+        ----------
+        sentence : Sentence, required, no default
+            Sentence to complete.
+        '''
+        key = sentence_key(sentence.originaltext)
+        with self.lock:
+            shared = self.sentences.get(key)
+            if shared is None:
+                return False
+            self.sentences.pop(key)
+            self.sentences[key] = shared
+            self.hits += 1
+        sentence.tokens     = shared.tokens
+        sentence.proteins   = shared.proteins
+        sentence.candidates = shared.candidates
+        return True
+
+    def add(self, sentence):
+        '''
+        Stores the results of sentence (after predicting its candidates). Only
+        the text of the sentence is kept, not the text of its article: its
+        proteins point to a Sentence with the sentence text alone.
+
+        Parameters
+        ----------
+        sentence : Sentence, required, no default
+            Annotated sentence with its candidates predicted.
+        '''
+        shared = sentence.__class__(sentence.originaltext)
+        shared.tokens     = sentence.tokens
+        shared.proteins   = sentence.proteins
+        shared.candidates = sentence.candidates
+        for protein in shared.proteins:
+            protein.sentence = shared
+        key = sentence_key(shared.originaltext)
+        with self.lock:
+            if key in self.sentences:
+                return
+            self.sentences[key] = shared
+            if self.max_sentences is not None:
+                while len(self.sentences) > self.max_sentences:
+                    self.sentences.popitem(last=False)
+
+    def __str__(self):
+        return "Sentence index: %s sentences stored, %s reused" % (len(self.sentences), self.hits)
@@ -0,0 +1,129 @@
+'''
+Offline PubMed id to PMC id mapping, built from the NCBI PMC-ids.csv dump
+(https://ftp.ncbi.nlm.nih.gov/pub/pmc/PMC-ids.csv.gz).
+
+The index is built once with:
+
+    from ppaxe.idmap import PMCIdIndex
+    PMCIdIndex.build("PMC-ids.csv.gz", "pmc-ids.npy")
+'''
+import csv
+import gzip
+import io
+import numpy as np
+
+
+# CLASSES
+# ----------------------------------------------
+class PMCIdIndex(object):
+    '''
+    Sorted, memory-mapped table of (PMID, PMCID) pairs. Lookups are binary
+    searches on the memory-mapped file, so opening the index is instantaneous
+    and only the pages touched by the searches are read from disk.
+
+    Attributes
+    ----------
+    path : str, no default
+        Path to the index file.
+
+    table : numpy.ndarray, no default
+        Memory-mapped array of shape (n, 2) with PMIDs (column 0, sorted)
+        and numeric PMCIDs (column 1).
+    '''
+    def __init__(self, path):
+        '''
+        Parameters
+        ----------
+        path : str, required, no default
+            Path to the index file created with PMCIdIndex.build.
+        '''
+        self.path  = path
+        self.table = np.load(path, mmap_mode='r')
+        self.pmids = self.table[:, 0]
+
+    @classmethod
+    def build(cls, csv_path, index_path):
+        '''
+        Builds the index from the PMC-ids.csv dump (plain or gzipped) and returns it.
+
+        Parameters
+        ----------
+        csv_path : str, required, no default
+            Path to PMC-ids.csv or PMC-ids.csv.gz.
+
+        index_path : str, required, no default
+            Path of the index file to create.
+        '''
+        if csv_path.endswith(".gz"):
+            fh = io.TextIOWrapper(gzip.open(csv_path, "rb"), encoding="utf-8", errors="replace")
+        else:
+            fh = io.open(csv_path, "r", encoding="utf-8", errors="replace")
+        pmids  = list()
+        pmcids = list()
+        with fh:
+            reader = csv.reader(fh)
+            header = next(reader)
+            pmid_col  = header.index("PMID")
+            pmcid_col = header.index("PMCID")
+            for row in reader:
+                if len(row) <= max(pmid_col, pmcid_col):
+                    continue
+                pmid  = row[pmid_col].strip()
+                pmcid = row[pmcid_col].strip()
+                if not pmid.isdigit() or not pmcid.startswith("PMC"):
+                    continue
+                pmids.append(int(pmid))
+                pmcids.append(int(pmcid[3:]))
+        table = np.column_stack((
+            np.array(pmids, dtype=np.uint32),
+            np.array(pmcids, dtype=np.uint32)
+        ))
+        table = table[np.argsort(table[:, 0], kind="mergesort")]
+        with open(index_path, "wb") as out:
+            np.save(out, table)
+        return cls(index_path)
+
+    def get(self, pmid):
+        '''
+        Returns the PMC identifier (without "PMC" prefix) of pmid, or None if
+        pmid is not in the index.
+
+        Parameters
+        ----------
+        pmid : str, required, no default
+            PubMed identifier.
+        '''
+        pmid = str(pmid).strip()
+        if not pmid.isdigit() or int(pmid) > np.iinfo(np.uint32).max:
+            return None
+        pos = np.searchsorted(self.pmids, int(pmid))
+        if pos < len(self.pmids) and self.pmids[pos] == int(pmid):
+            return str(self.table[pos, 1])
+        return None
+
+    def convert(self, identifiers):
+        '''
+        Maps a list of PubMed identifiers to PMC identifiers. Returns a tuple
+        with the list of PMC identifiers found and the list of identifiers
+        not in the index.
+
+        Parameters
+        ----------
+        identifiers : list, required, no default
+            List of PubMed identifiers.
+        '''
+        pmcids  = list()
+        missing = list()
+        for identifier in identifiers:
+            pmcid = self.get(identifier)
+            if pmcid is None:
+                missing.append(identifier)
+            else:
+                pmcids.append(pmcid)
+        return (pmcids, missing)
+
+    def __contains__(self, pmid):
+        return self.get(pmid) is not None
+
+    def __len__(self):
+        return len(self.pmids)
@@ -0,0 +1,173 @@
+'''
+Loaders to read articles from local copies of PMC and PubMed
+'''
+import gzip
+import io
+import logging
+import multiprocessing
+import os
+import tarfile
+from concurrent.futures import ProcessPoolExecutor
+from ppaxe import core
+
+NXML_EXTENSIONS    = (".nxml", ".xml")
+TARBALL_EXTENSIONS = (".tar.gz", ".tgz", ".tar")
+PUBMED_EXTENSIONS  = (".xml.gz", ".xml")
+
+
+# FUNCTIONS
+# ----------------------------------------------
+def iter_nxml_files(paths):
+    '''
+    Yields tuples (name, data) for every NXML file in paths. For files in
+    tarballs, data is the content of the file (bytes). For files on disk,
+    data is None and name is the path of the file.
+
+    Parameters
+    ----------
+    paths : list, required, no default
+        Paths to NXML files, to directories with NXML files (searched recursively)
+        or to tarballs of the PMC Open Access bulk dump (.tar.gz).
+    '''
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path):
+                dirnames.sort()
+                for filename in sorted(filenames):
+                    if filename.endswith(NXML_EXTENSIONS):
+                        yield (os.path.join(dirpath, filename), None)
+        elif path.endswith(TARBALL_EXTENSIONS):
+            # Stream mode: members are read in order without seeking
+            with tarfile.open(path, "r|*") as tar:
+                for member in tar:
+                    if member.isfile() and member.name.endswith(NXML_EXTENSIONS):
+                        yield (member.name, tar.extractfile(member).read())
+        else:
+            yield (path, None)
+
+def iter_pubmed_files(paths):
+    '''
+    Yields the paths of the PubMed XML files in paths.
+
+    Parameters
+    ----------
+    paths : list, required, no default
+        Paths to PubMed baseline/update files (.xml.gz or .xml) or to directories
+        with these files.
+    '''
+    for path in paths:
+        if os.path.isdir(path):
+            for filename in sorted(os.listdir(path)):
+                if filename.endswith(PUBMED_EXTENSIONS):
+                    yield os.path.join(path, filename)
+        else:
+            yield path
+
+def parallel_map(function, tasks, processes=None):
+    '''
+    Applies function to every task in worker processes and yields the results
+    in order. At most 2 tasks per process are pending at any time, so tasks
+    are read lazily and memory stays bounded.
+
+    Parameters
+    ----------
+    function : function, required, no default
+        Module-level function (it has to be pickled).
+
+    tasks : iterable, required, no default
+        Arguments of function.
+
+    processes : int, optional, default = None
+        Number of worker processes. Number of CPUs if None. With 1, tasks
+        are run in the current process.
+    '''
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    if processes <= 1:
+        for task in tasks:
+            yield function(task)
+        return
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        for result in core.bounded_map(executor, function, tasks, 2 * processes):
+            yield result
+
+def parse_pmc_files(files):
+    '''
+    Parses a list of NXML files (as returned by iter_nxml_files) and returns
+    the list of Article objects in them. Files that can't be parsed are skipped.
+    Run in the worker processes of iter_local_pmc.
+    '''
+    articles = list()
+    for name, data in files:
+        source = name if data is None else io.BytesIO(data)
+        try:
+            articles.extend(core.iter_pmc_articles(source))
+        except (core.ElementTree.ParseError, EnvironmentError) as err:
+            logging.warning("Can't parse %s: %s", name, err)
+    return articles
+
+def parse_pubmed_file(path):
+    '''
+    Parses a PubMed XML file (gzipped or not) and returns the list of Article
+    objects with abstract in it. If the file is corrupted, the articles read
+    before the error are returned. Run in the worker processes of iter_local_pubmed.
+    '''
+    articles = list()
+    opener = gzip.open if path.endswith(".gz") else open
+    try:
+        with opener(path, "rb") as fh:
+            for article in core.iter_pubmed_articles(fh):
+                articles.append(article)
+    except (core.ElementTree.ParseError, EnvironmentError, EOFError) as err:
+        logging.warning("Can't parse %s: %s", path, err)
+    return articles
+
+def iter_local_pmc(paths, ids=None, processes=None, chunksize=32):
+    '''
+    Yields Article objects (with fulltext) from local NXML files, directories
+    or tarballs of the PMC Open Access dump. Files are parsed in parallel by
+    worker processes. Articles are the same as the ones retrieved from PMC
+    with PMQuery.
+
+    Parameters
+    ----------
+    paths : list, required, no default
+        Paths to NXML files, directories with NXML files or .tar.gz tarballs.
+
+    ids : set, optional, default = None
+        Only yield articles with these PubMed identifiers (or PMC identifiers with
+        "PMC" prefix). All articles are yielded if None.
+
+    processes : int, optional, default = None
+        Number of worker processes. Number of CPUs if None.
+
+    chunksize : int, optional, default = 32
+        Number of files sent to a worker process at once.
+    '''
+    tasks = core.chunked(iter_nxml_files(paths), chunksize)
+    for articles in parallel_map(parse_pmc_files, tasks, processes):
+        for article in articles:
+            if ids is None or article.pmid in ids or "PMC" + article.pmcid in ids:
+                yield article
+
+def iter_local_pubmed(paths, ids=None, processes=None):
+    '''
+    Yields Article objects (with abstract) from local PubMed baseline/update
+    files. Each file is parsed by a worker process, applying the same rules
+    as PMQuery with database "PUBMED" (articles without abstract are skipped).
+
+    Parameters
+    ----------
+    paths : list, required, no default
+        Paths to .xml.gz/.xml PubMed files or to directories with these files.
+
+    ids : set, optional, default = None
+        Only yield articles with these PubMed identifiers. All articles are yielded if None.
+
+    processes : int, optional, default = None
+        Number of worker processes. Number of CPUs if None.
+    '''
+    for articles in parallel_map(parse_pubmed_file, iter_pubmed_files(paths), processes):
+        for article in articles:
+            if ids is None or article.pmid in ids:
+                yield article
@@ -0,0 +1,356 @@
+'''
+Helpers to talk to the NCBI web services (E-utilities and idconv)
+'''
+import logging
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+
+EFETCH_URL  = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/efetch.fcgi"
+ESEARCH_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi"
+EPOST_URL   = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/epost.fcgi"
+ELINK_URL   = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/elink.fcgi"
+IDCONV_URL = "https://www.ncbi.nlm.nih.gov/pmc/utils/idconv/v1.0/"
+TOOL_NAME  = "ppaxe"
+
+# Requests per second allowed by NCBI
+ANONYMOUS_RATE = 3
+APIKEY_RATE    = 10
+
+# Connection pool and retry policy
+POOL_SIZE      = 10
+MAX_RETRIES    = 5
+BACKOFF_FACTOR = 1.0
+MAX_BACKOFF    = 60
+TIMEOUT        = (10, 300) # (connect, read) seconds
+RETRY_STATUS   = frozenset([429, 500, 502, 503, 504])
+
+# efetch batch sizes per database: (initial, maximum) number of articles.
+# Full texts are large and slow, abstracts small and fast.
+BATCH_SIZES = {
+    'PMC':    (20, 200),
+    'PUBMED': (200, 200)
+}
+BATCH_TARGET_TIME  = 30         # seconds per efetch request
+BATCH_TARGET_CHARS = 2000000    # characters of text per efetch request
+
+# time.monotonic is not available in python 2.7
+_clock = getattr(time, "monotonic", time.time)
+
+
+# FUNCTIONS
+# ----------------------------------------------
+_LIMITERS = dict()
+_LIMITERS_LOCK = threading.Lock()
+
+def get_rate_limiter(api_key=None):
+    '''
+    Returns the TokenBucket shared by every request made with the same api_key.
+    NCBI counts requests per key (or per IP when there is no key), so all the
+    threads and PMQuery objects of a run must draw from the same bucket.
+
+    Parameters
+    ----------
+    api_key : str, optional, default = None
+        NCBI API key. Without it the anonymous limit (3 req/s) is used. With it,
+        the limit is 10 req/s.
+    '''
+    with _LIMITERS_LOCK:
+        if api_key not in _LIMITERS:
+            rate = APIKEY_RATE if api_key else ANONYMOUS_RATE
+            _LIMITERS[api_key] = TokenBucket(rate=rate)
+        return _LIMITERS[api_key]
+
+_SESSION = None
+_SESSION_LOCK = threading.Lock()
+
+def get_session():
+    '''
+    Returns the requests.Session shared by all the NCBI requests of the process.
+    The session keeps a pool of keep-alive connections, so consecutive batches
+    reuse the same TLS connection instead of doing a new handshake each time.
+    '''
+    global _SESSION
+    with _SESSION_LOCK:
+        if _SESSION is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update({
+                'Accept-Encoding': 'gzip, deflate',
+                'Connection':      'keep-alive',
+                'User-Agent':      TOOL_NAME
+            })
+            _SESSION = session
+        return _SESSION
+
+def backoff_time(attempt, retry_after=None):
+    '''
+    Returns the seconds to wait before retrying a request: exponential backoff
+    with full jitter, or the Retry-After value sent by the server if larger
+    (at most MAX_BACKOFF seconds).
+
+    Parameters
+    ----------
+    attempt : int, required, no default
+        Number of the failed attempt (0-indexed).
+
+    retry_after : str, optional, default = None
+        Value of the Retry-After header of the failed response.
+    '''
+    wait = random.uniform(0, min(MAX_BACKOFF, BACKOFF_FACTOR * (2 ** attempt)))
+    if retry_after:
+        try:
+            wait = max(wait, min(MAX_BACKOFF, float(retry_after)))
+        except ValueError:
+            pass
+    return wait
+
+def get(url, params, api_key=None, retries=MAX_RETRIES, timeout=TIMEOUT, stream=False):
+    '''
+    GET request to an NCBI service through the shared session. Every attempt
+    waits for the rate limiter. Connection errors, timeouts and 429/5xx
+    responses are retried with exponential backoff and jitter.
+
+    Returns the last requests.models.Response. Raises the last
+    requests.exceptions.RequestException if no response could be obtained.
+
+    Parameters
+    ----------
+    url : str, required, no default
+        URL of the service.
+
+    params : dict, required, no default
+        Query parameters of the request.
+
+    api_key : str, optional, default = None
+        NCBI API key. Selects the rate limiter to use.
+
+    retries : int, optional, default = MAX_RETRIES
+        Maximum number of retries after the first attempt.
+
+    timeout : tuple, optional, default = TIMEOUT
+        Connect and read timeouts in seconds.
+
+    stream : bool, optional, default = False
+        Do not download the body of the response until it is read (response.raw).
+        The caller must close the response.
+    '''
+    return _request("get", url, api_key, retries, params=params, timeout=timeout, stream=stream)
+
+def post(url, data, api_key=None, retries=MAX_RETRIES, timeout=TIMEOUT):
+    '''
+    POST request to an NCBI service, with the same rate limiting and retries
+    as get. Used for requests with too many identifiers for a query string.
+
+    Parameters
+    ----------
+    url : str, required, no default
+        URL of the service.
+
+    data : dict, required, no default
+        Form parameters of the request.
+
+    api_key : str, optional, default = None
+        NCBI API key. Selects the rate limiter to use.
+
+    retries : int, optional, default = MAX_RETRIES
+        Maximum number of retries after the first attempt.
+
+    timeout : tuple, optional, default = TIMEOUT
+        Connect and read timeouts in seconds.
+    '''
+    return _request("post", url, api_key, retries, data=data, timeout=timeout)
+
+def _request(method, url, api_key, retries, **kwargs):
+    '''
+    Sends a request with the session method (get or post) and kwargs, retrying
+    transient errors. See get.
+    '''
+    session = get_session()
+    limiter = get_rate_limiter(api_key)
+    attempt = 0
+    while True:
+        limiter.acquire()
+        try:
+            req = getattr(session, method)(url, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as err:
+            if attempt >= retries:
+                raise
+            logging.warning("Request to %s failed (%s). Retrying...", url, err)
+            time.sleep(backoff_time(attempt))
+        else:
+            if req.status_code not in RETRY_STATUS or attempt >= retries:
+                return req
+            logging.warning("Request to %s returned %s. Retrying...", url, req.status_code)
+            req.close()
+            time.sleep(backoff_time(attempt, req.headers.get('Retry-After')))
+        attempt += 1
+
+def eutils_params(params, api_key=None, email=None):
+    '''
+    Returns a copy of params with the identification parameters NCBI asks
+    every client to send (tool, email and api_key).
+
+    Parameters
+    ----------
+    params : dict, required, no default
+        Query parameters of the request.
+
+    api_key : str, optional, default = None
+        NCBI API key.
+
+    email : str, optional, default = None
+        Contact e-mail of the user running the queries.
+    '''
+    params = dict(params)
+    params['tool'] = TOOL_NAME
+    if email:
+        params['email'] = email
+    if api_key:
+        params['api_key'] = api_key
+    return params
+
+
+# CLASSES
+# ----------------------------------------------
+class TokenBucket(object):
+    '''
+    Thread-safe token bucket rate limiter.
+
+    Attributes
+    ----------
+    rate : float, no default
+        Tokens added to the bucket per second.
+
+    capacity : float, no default
+        Maximum number of tokens in the bucket (maximum burst).
+
+    tokens : float, no default
+        Tokens currently available.
+    '''
+    def __init__(self, rate, capacity=1):
+        '''
+        Parameters
+        ----------
+        rate : float, required, no default
+            Tokens added to the bucket per second.
+
+        capacity : float, optional, default = 1
+            Maximum burst. The default spaces requests evenly, which is what
+            NCBI expects (bursts are counted against the per-second limit).
+        '''
+        self.rate     = float(rate)
+        self.capacity = float(capacity)
+        self.tokens   = self.capacity
+        self.last     = _clock()
+        self.lock     = threading.Lock()
+
+    def acquire(self):
+        '''
+        Takes one token from the bucket, blocking until one is available.
+        '''
+        while True:
+            with self.lock:
+                now = _clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class BatchSizer(object):
+    '''
+    Thread-safe adaptive batch size for efetch requests. After every successful
+    batch, the size moves towards the number of articles that would take
+    target_time seconds and target_chars characters of text (at most doubling
+    it each time). After a failed batch, the size is halved.
+
+    Attributes
+    ----------
+    size : int, no default
+        Current batch size.
+
+    minsize : int, no default
+        Minimum batch size.
+
+    maxsize : int, no default
+        Maximum batch size.
+
+    target_time : float, no default
+        Desired seconds per request.
+
+    target_chars : float, no default
+        Desired characters of text per request.
+    '''
+    def __init__(self, size, maxsize=None, minsize=1, target_time=BATCH_TARGET_TIME, target_chars=BATCH_TARGET_CHARS):
+        '''
+        Parameters
+        ----------
+        size : int, required, no default
+            Initial batch size.
+
+        maxsize : int, optional, default = None
+            Maximum batch size. Same as size if None.
+
+        minsize : int, optional, default = 1
+            Minimum batch size.
+
+        target_time : float, optional, default = BATCH_TARGET_TIME
+            Desired seconds per request.
+
+        target_chars : float, optional, default = BATCH_TARGET_CHARS
+            Desired characters of text per request.
+        '''
+        self.maxsize = maxsize if maxsize is not None else size
+        self.minsize = minsize
+        self.size    = max(minsize, min(size, self.maxsize))
+        self.target_time  = float(target_time)
+        self.target_chars = float(target_chars)
+        self.lock = threading.Lock()
+
+    @classmethod
+    def for_database(cls, database):
+        '''
+        Returns a BatchSizer with the default sizes of database (PMC or PUBMED).
+        '''
+        size, maxsize = BATCH_SIZES[database]
+        return cls(size, maxsize=maxsize)
+
+    def success(self, count, elapsed, chars):
+        '''
+        Updates the batch size after a successful request.
+
+        Parameters
+        ----------
+        count : int, required, no default
+            Number of identifiers requested.
+
+        elapsed : float, required, no default
+            Seconds taken by the request.
+
+        chars : int, required, no default
+            Characters of text in the response.
+        '''
+        if count < 1:
+            return
+        ideal = float("inf")
+        if elapsed > 0:
+            ideal = min(ideal, self.target_time * count / elapsed)
+        if chars > 0:
+            ideal = min(ideal, self.target_chars * count / chars)
+        with self.lock:
+            size = min(ideal, 2 * self.size)
+            self.size = int(max(self.minsize, min(size, self.maxsize)))
+
+    def failure(self, count):
+        '''
+        Halves the batch size after a failed request of count identifiers.
+        '''
+        with self.lock:
+            self.size = max(self.minsize, min(self.size, count) // 2)
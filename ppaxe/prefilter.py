@@ -0,0 +1,185 @@
+'''
+Prefilter of sentences before annotation: sentences that can't have two
+protein mentions have no interaction candidates, so they don't need to be sent
+to the StanfordCoreNLP server.
+'''
+import re
+import threading
+
+# Words of the sentences (protein symbols can have hyphens, slashes, dots and quotes inside)
+WORD_RE = re.compile(r"\w+(?:[-'/.]\w+)*", re.UNICODE)
+# Clitics split from the end of a word by the tokenizer of the server ("ERK2's"
+# is "ERK2" and "'s", "doesn't" is "does" and "n't"). They are not mentions.
+CLITIC_RE = re.compile(r"(?:'(?:s|re|ve|ll|d|m)|n't)$", re.IGNORECASE | re.UNICODE)
+# Separators of the parts of a word ("Sak-p53")
+PARTS_RE = re.compile(r"[-/]")
+# Words that look like gene or protein symbols: capital letter and digit (MAPK1,
+# Grb7, Cdc42), short lowercase prefix and digit (p53) or several capitals (AHNAK)
+SYMBOL_RE = re.compile(r"[A-Z][A-Za-z0-9]*[0-9]|[a-z]{1,3}[0-9]|[A-Z]{2}", re.UNICODE)
+# Suffixes of enzyme names (kinase, peroxidase)
+ENZYME_SUFFIXES = ("ASE", "ASES")
+MODES = ("recall", "speed")
+
+
+# FUNCTIONS
+# ----------------------------------------------
+def normalize(word):
+    '''
+    Returns word as it is looked up in the dictionary (see Protein.is_in_dict).
+    '''
+    return word.upper().replace("'", "").replace('"', '')
+
+def split_words(text):
+    '''
+    Returns the words of text (see WORD_RE) without their clitics (see
+    CLITIC_RE), as they are tokenized by the server.
+    '''
+    return [ CLITIC_RE.sub("", word) or word for word in WORD_RE.findall(text) ]
+
+
+# CLASSES
+# ----------------------------------------------
+class Prefilter(object):
+    '''
+    Finds the sentences that may have two protein mentions. Mentions are the
+    aliases of a gene dictionary, matched by words with a trie (aliases can have
+    several words) and, in "recall" mode, also the words that look like gene or
+    protein symbols or enzyme names, or have a part in the dictionary. In "speed" mode, only
+    dictionary aliases (or parts of words in the dictionary) are mentions: with
+    option -e (only proteins in the dictionary) almost no candidate is lost,
+    but without it sentences with proteins not in the dictionary are skipped.
+
+    Attributes
+    ----------
+    mode : str, no default
+        "recall" or "speed".
+
+    min_mentions : int, no default
+        Mentions needed to keep a sentence.
+
+    words : set, no default
+        Aliases of a single word.
+
+    trie : dict, no default
+        Trie of the aliases of several words: each node is a dictionary of words,
+        and the key None marks the end of an alias.
+
+    checked : int, no default
+        Sentences checked.
+
+    skipped : int, no default
+        Sentences skipped.
+    '''
+    def __init__(self, dictionary, mode="recall", min_mentions=2):
+        '''
+        Parameters
+        ----------
+        dictionary : iterable, required, no default
+            Gene/protein aliases (e.g. Protein.GENEDICT).
+
+        mode : str, optional, default = "recall"
+            "recall" or "speed".
+
+        min_mentions : int, optional, default = 2
+            Mentions needed to keep a sentence.
+        '''
+        if mode not in MODES:
+            raise ValueError('Incorrect prefilter mode "%s". Choose "recall" or "speed"' % mode)
+        self.mode = mode
+        self.min_mentions = min_mentions
+        self.words   = set()
+        self.trie    = dict()
+        self.checked = 0
+        self.skipped = 0
+        self.lock    = threading.Lock()
+        for alias in dictionary:
+            alias = [ normalize(word) for word in split_words(alias) ]
+            if len(alias) == 1:
+                self.words.add(alias[0])
+            elif alias:
+                node = self.trie
+                for word in alias:
+                    node = node.setdefault(word, dict())
+                node[None] = True
+
+    def mentions(self, text, limit=None):
+        '''
+        Returns the number of protein mentions in text (at most limit).
+
+        Parameters
+        ----------
+        text : str, required, no default
+            Text of the sentence.
+
+        limit : int, optional, default = None
+            Stop counting when limit mentions are found.
+        '''
+        original = split_words(text)
+        words = [ normalize(word) for word in original ]
+        count = 0
+        idx   = 0
+        while idx < len(words) and (limit is None or count < limit):
+            # Longest alias of several words starting here
+            node = self.trie
+            end  = 0
+            for pos in range(idx, len(words)):
+                node = node.get(words[pos])
+                if node is None:
+                    break
+                if None in node:
+                    end = pos + 1
+            if end:
+                count += 1
+                idx = end
+                continue
+            if words[idx] in self.words:
+                count += 1
+            elif self.mode == "recall":
+                count += sum(1 for part in PARTS_RE.split(original[idx]) if self.__looks_like_protein(part))
+            else:
+                # The tokenizer of the server may split it (MAPK1/ERK2)
+                count += sum(1 for part in PARTS_RE.split(words[idx]) if part in self.words)
+            idx += 1
+        return count
+
+    def __looks_like_protein(self, word):
+        '''
+        Returns True if word is in the dictionary or looks like a gene or protein
+        symbol or an enzyme name.
+        '''
+        normalized = normalize(word)
+        return (
+            normalized in self.words or SYMBOL_RE.match(word) is not None
+            or (len(normalized) > 5 and normalized.endswith(ENZYME_SUFFIXES))
+        )
+
+    def keep(self, text):
+        '''
+        Returns True if text may have min_mentions protein mentions.
+
+        Parameters
+        ----------
+        text : str, required, no default
+            Text of the sentence.
+        '''
+        keep = self.mentions(text, limit=self.min_mentions) >= self.min_mentions
+        with self.lock:
+            self.checked += 1
+            if not keep:
+                self.skipped += 1
+        return keep
+
+    def filter(self, sentences):
+        '''
+        Returns the list of the Sentence objects in sentences that may have
+        min_mentions protein mentions.
+
+        Parameters
+        ----------
+        sentences : list, required, no default
+            List of Sentence objects.
+        '''
+        return [ sentence for sentence in sentences if self.keep(sentence.originaltext) ]
+
+    def __str__(self):
+        return "Prefilter (%s): %s of %s sentences skipped" % (self.mode, self.skipped, self.checked)
@@ -0,0 +1,133 @@
+'''
+Record/replay annotator backend: responses of a StanfordCoreNLP server stored
+on disk and served again without the server, so runs, tests and benchmarks are
+deterministic and work offline.
+'''
+import hashlib
+import io
+import json
+import os
+import threading
+import requests
+from ppaxe.corenlp import Annotator
+
+
+# FUNCTIONS
+# ----------------------------------------------
+def request_key(text, properties=None):
+    '''
+    Returns the key of a request (sha1 of its properties and text).
+    '''
+    digest = hashlib.sha1()
+    digest.update(json.dumps(properties or dict(), sort_keys=True).encode('utf-8'))
+    digest.update(b"\0")
+    digest.update(text.encode('utf-8'))
+    return digest.hexdigest()
+
+
+# CLASSES
+# ----------------------------------------------
+class RecordReplay(Annotator):
+    '''
+    Annotator that answers the requests recorded in a file. Requests that are
+    not recorded are sent to client, if any, and its responses are appended to
+    the file (record mode). Without client, they raise AnnotationNotRecorded
+    (replay mode). The file has a JSON object per line with the key, the
+    properties, the text and the response of each request.
+
+    Attributes
+    ----------
+    path : str, no default
+        Path to the file of recorded requests.
+
+    client : Annotator, no default
+        Backend used for the requests that are not recorded. None to only replay.
+
+    output_format : str, no default
+        Output format of client, or the one given if there is no client.
+
+    responses : dict, no default
+        Recorded response of each key.
+
+    hits : int, no default
+        Requests answered with a recorded response.
+
+    misses : int, no default
+        Requests that were not recorded.
+    '''
+    def __init__(self, path, client=None, output_format="json"):
+        '''
+        Parameters
+        ----------
+        path : str, required, no default
+            Path to the file of recorded requests. Created in record mode if it
+            does not exist.
+
+        client : Annotator, optional, default = None
+            Backend used for the requests that are not recorded (e.g. a
+            CoreNLPClient). None to only replay.
+
+        output_format : str, optional, default = "json"
+            Output format of the recorded responses, if client is None.
+        '''
+        self.path   = path
+        self.client = client
+        self.output_format = client.output_format if client is not None else output_format
+        self.responses = dict()
+        self.hits   = 0
+        self.misses = 0
+        self.lock   = threading.Lock()
+        if os.path.exists(path):
+            with io.open(path, encoding="utf-8") as fh:
+                for line in fh:
+                    if line.strip():
+                        record = json.loads(line)
+                        self.responses[record['key']] = record['response']
+        elif client is None:
+            raise IOError("%s does not exist" % path)
+
+    def annotate(self, text, properties=None):
+        '''
+        Returns the recorded response to the request, or the response of client
+        (recording it).
+
+        Parameters
+        ----------
+        text : str, required, no default
+            Text to annotate.
+
+        properties : dict, optional, default = None
+            Properties of the request.
+        '''
+        key = request_key(text, properties)
+        with self.lock:
+            response = self.responses.get(key)
+            if response is not None:
+                self.hits += 1
+                return response
+            self.misses += 1
+        if self.client is None:
+            raise AnnotationNotRecorded("Request not recorded in %s: %s" % (self.path, text[:100]))
+        response = self.client.annotate(text, properties)
+        record = json.dumps({'key': key, 'properties': properties, 'text': text, 'response': response}, ensure_ascii=False)
+        with self.lock:
+            self.responses[key] = response
+            with io.open(self.path, "a", encoding="utf-8") as fh:
+                fh.write(record + u"\n")
+        return response
+
+    def __len__(self):
+        return len(self.responses)
+
+    def __str__(self):
+        return "%s recorded StanfordCoreNLP requests in %s" % (len(self.responses), self.path)
+
+
+# EXCEPTIONS
+# ----------------------------------------------
+class AnnotationNotRecorded(requests.exceptions.RequestException):
+    '''
+    Exception raised when a request is not recorded and there is no client to send it to.
+    A RequestException, so the sentences of the request are counted as failed.
+    '''
+    pass
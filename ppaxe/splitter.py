@@ -0,0 +1,278 @@
+'''
+Sentence splitter for the texts of the articles.
+
+Periods that do not end a sentence (abbreviations, initials, decimals, species
+names...) are marked as <prd> and extra sentence boundaries as <stop>. These
+are the rules, applied in this order (a period marked by a rule is no longer
+a period for the following ones):
+
+    1.  Mr. Mrs. Ms. Dr. St. Fig. fig.
+    2.  Web domains (.com .net .org .io .gov).
+    3.  Ph.D.
+    4.  Initials between whitespace and a space (" A. "). The whitespace becomes a space.
+    5.  Acronyms (A.B. or A.B.C.) followed by a sentence starter: boundary after them.
+    6.  Runs of initials (A.B.C.), in groups of three...
+    7.  ... and of two.
+    8.  Inc. Ltd. Jr. Sr. Co. followed by a sentence starter: the period is
+        replaced by a boundary.
+    9.  Other Inc. Ltd. Jr. Sr. Co.
+    10. Initials after a space (" A.").
+    11. Digit, capital letter and period ("2A."). The letter is removed.
+    12. Decimals (1.5).
+    13. Digit followed by a figure letter (2.a, 3.B).
+    14. Species names (S. mediterranea). A space is added after the period.
+
+Every rule involves one or a few periods and some characters around them, so
+instead of rewriting the whole text once per rule, the periods that some rule
+may apply to are found with a single regular expression and the rules are
+evaluated on them in one pass.
+'''
+import re
+
+try:
+    # For python 3
+    from html import unescape
+except ImportError:
+    # For python 2.7
+    from HTMLParser import HTMLParser
+    unescape = HTMLParser().unescape
+
+PRD  = "<prd>"
+STOP = "<stop>"
+# Marks of split_spans (one character, so positions don't change)
+MARK     = "\x00"
+BOUNDARY = "\x01"
+BOUNDARY_RE = re.compile("[.?!\x01]")
+
+# Periods some rule may apply to. Any other period ends a sentence.
+CANDIDATE_RE = re.compile(
+    r"\.(?:"
+    r"(?<=[\s.0-9][A-Z]\.)"                       # rules 3-7, 10, 11
+    r"|(?<=[A-Z]\.)(?=[a-z]| [a-z]|[A-Z]\.)"      # rules 6, 7, 14
+    r"|(?<=[0-9]\.)(?=[0-9A-Ka-k])"               # rules 12, 13
+    r"|(?<=Mr\.|Ms\.|St\.|Dr\.|Jr\.|Sr\.|Co\.|Ph\.)"  # rules 1, 3, 8, 9
+    r"|(?<=Fig\.|fig\.|Mrs\.|Inc\.|Ltd\.)"        # rules 1, 8, 9
+    r"|(?=com|net|org|io|gov)"                    # rule 2
+    r")"
+)
+STARTER_RE = re.compile(
+    r"Mr|Mrs|Ms|Dr|He\s|She\s|It\s|They\s|Their\s|Our\s|We\s|But\s|However\s|That\s|This\s|Wherever"
+)
+PREFIXES = ("Mr", "St", "Ms", "Dr", "Fig", "fig", "Mrs")
+SUFFIXES = (" Inc", " Ltd", " Jr", " Sr", " Co")
+DOMAINS  = ("com", "net", "org", "io", "gov")
+CAPS     = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZ")
+LOWER    = frozenset("abcdefghijklmnopqrstuvwxyz")
+DIGITS   = frozenset("0123456789")
+FIG_LETTERS = frozenset("ABCDEFGHIJKabcdefghijk")
+
+
+# FUNCTIONS
+# ----------------------------------------------
+def split_sentences(text):
+    '''
+    Yields the sentences of text (stripped and with HTML entities unescaped).
+
+    Parameters
+    ----------
+    text : str, required, no default
+        Text to split.
+    '''
+    text = mark_periods(text)
+    if "”"    in text:
+        text = text.replace(".”","”.")
+    if "\""   in text:
+        text = text.replace(".\"","\".")
+    if "!"    in text:
+        text = text.replace("!\"","\"!")
+    if "?"    in text:
+        text = text.replace("?\"","\"?")
+    if "e.g." in text:
+        text = text.replace("e.g.","e<prd>g<prd>")
+    if "i.e." in text:
+        text = text.replace("i.e.","i<prd>e<prd>")
+    text = text.replace(".",".<stop>")
+    text = text.replace("?","?<stop>")
+    text = text.replace("!","!<stop>")
+    text = text.replace("<prd>",".")
+    for sentence in text.split(STOP):
+        sentence = str(unescape(sentence.strip()))
+        if sentence.strip():
+            yield sentence
+
+def split_spans(text):
+    '''
+    Returns the list of (start, end) positions of the sentences of text, with
+    the sentence boundaries of split_sentences. text[start:end] is the sentence
+    as written in text: without surrounding whitespace, but without the changes
+    of split_sentences (HTML entities, whitespace inside the sentence, the
+    characters changed by rules 8, 11 and 14, and closing quotes, which stay
+    after the period). Boundaries are found in a single copy of text of the same
+    length, so the sentences don't need a string of their own.
+
+    Parameters
+    ----------
+    text : str, required, no default
+        Text to split.
+    '''
+    # Padded like mark_periods, with the marked periods replaced by MARK
+    # (and the ones replaced by a boundary by BOUNDARY)
+    padded = " " + text.replace("\n", " ") + "  "
+    pieces = list()
+    last   = 0
+    extra  = list() # boundaries after periods of rule 5
+    for i, start, end, replacement in _marks(padded):
+        pieces.append(padded[last:i])
+        if replacement == STOP:
+            pieces.append(BOUNDARY)
+        elif PRD in replacement:
+            pieces.append(MARK)
+        else:
+            pieces.append(".")
+        if replacement.endswith(STOP) and replacement != STOP:
+            extra.append(i + 1)
+        last = i + 1
+    pieces.append(padded[last:])
+    shadow = "".join(pieces)
+    for old, new in ((".”", "”."), (".\"", "\"."), ("!\"", "\"!"), ("?\"", "\"?")):
+        if old in shadow:
+            shadow = shadow.replace(old, new)
+    for old, new in (("e.g.", "e" + MARK + "g" + MARK), ("i.e.", "i" + MARK + "e" + MARK)):
+        if old in shadow:
+            shadow = shadow.replace(old, new)
+    boundaries = sorted(set([ match.end() for match in BOUNDARY_RE.finditer(shadow) ] + extra))
+    spans = list()
+    start = 1
+    for boundary in boundaries + [len(text) + 1]:
+        end = min(boundary, len(text) + 1)
+        while start < end and padded[start].isspace():
+            start += 1
+        last = end
+        while last > start and padded[last - 1].isspace():
+            last -= 1
+        if last > start:
+            spans.append((start - 1, last - 1))
+        start = max(start, end)
+    return spans
+
+def mark_periods(text):
+    '''
+    Returns text (padded with spaces and without newlines) with the periods that
+    do not end a sentence replaced by <prd> and the extra sentence boundaries
+    marked with <stop>, according to the rules of the module docstring.
+
+    Parameters
+    ----------
+    text : str, required, no default
+        Text to mark.
+    '''
+    text = " " + text.replace("\n", " ") + "  "
+    pieces = list()
+    last   = 0 # end of the text already copied to pieces
+    for i, start, end, replacement in _marks(text):
+        pieces.append(text[last:start])
+        pieces.append(replacement)
+        last = end
+    pieces.append(text[last:])
+    return "".join(pieces)
+
+def _marks(text):
+    '''
+    Yields the changes of mark_periods in text (already padded) for each period
+    some rule may apply to, as tuples (position of the period, start, end,
+    replacement of text[start:end]).
+    '''
+    rules    = dict() # periods in runs of initials -> rule 6 or 7
+    r8_end   = 0      # end of the last match of rule 8
+    r12_last = -1     # period of the last match of rule 12
+    for match in CANDIDATE_RE.finditer(text):
+        i = match.start()
+        before = text[i - 1]
+        after  = text[i + 1]
+        start  = i
+        end    = i + 1
+        replacement = PRD
+        rule = rules.get(i)
+        if rule is None:
+            rule = _early_rule(text, i)
+            if rule == 0 and before in CAPS and not _is_initial(text, i - 2):
+                # First initial of a run
+                run = [i]
+                while _is_initial(text, run[-1] + 2):
+                    run.append(run[-1] + 2)
+                grouped = len(run) - len(run) % 3
+                for period in run[:grouped]:
+                    rules[period] = 6
+                if len(run) % 3 == 2:
+                    rules[run[-2]] = 7
+                    rules[run[-1]] = 7
+                rule = rules.get(i, 0)
+        if rule == 4:
+            start = i - 2
+            replacement = " " + before + PRD
+        elif rule == 0:
+            if text.endswith(SUFFIXES, 0, i):
+                rule = 9
+                # Matches of rule 8 can't overlap
+                if after == " " and text.rfind(" ", 0, i) >= r8_end:
+                    starter = STARTER_RE.match(text, i + 2)
+                    if starter is not None:
+                        rule = 8
+                        r8_end = starter.end()
+                        replacement = STOP
+            elif before in CAPS:
+                if text[i - 2] == " ":
+                    rule = 10
+                elif text[i - 2] in DIGITS:
+                    rule = 11
+                    start = i - 2
+                    replacement = " " + text[i - 2] + PRD
+                elif after in LOWER or (after == " " and text[i + 2] in LOWER):
+                    rule = 14
+                    replacement = PRD + " "
+                    if after == " ":
+                        end = i + 2
+            elif before in DIGITS:
+                if after in DIGITS:
+                    # Rule 11 puts a space between this period and the next digit
+                    # in "1.2A.", and matches of rule 12 can't overlap (1.2.3)
+                    j = i + 3
+                    rule_11 = (
+                        text[j - 1:j] in CAPS and text[j:j + 1] == "."
+                        and not _early_rule(text, j) and not _is_initial(text, j + 2)
+                    )
+                    if r12_last != i - 2 and not rule_11:
+                        rule = 12
+                        r12_last = i
+                elif after in FIG_LETTERS:
+                    rule = 13
+        if rule == 0:
+            replacement = "."
+        if before in CAPS and text[i - 2] == "." and text[i - 3] in CAPS and after == " " \
+                and STARTER_RE.match(text, i + 2) and not _early_rule(text, i - 2):
+            # Rule 5
+            replacement += STOP
+        yield (i, start, end, replacement)
+
+def _early_rule(text, i):
+    '''
+    Returns the rule (1 to 4) that marks the period at position i of text, or 0.
+    '''
+    if text.endswith(PREFIXES, 0, i):
+        return 1
+    if text.startswith(DOMAINS, i + 1):
+        return 2
+    if i >= 2 and text.startswith("Ph.D.", i - 2) and not text.startswith(DOMAINS, i + 3):
+        return 3
+    if i >= 4 and text.startswith("Ph.D.", i - 4):
+        return 3
+    if text[i - 1] in CAPS and text[i - 2].isspace() and text[i + 1] == " ":
+        return 4
+    return 0
+
+def _is_initial(text, i):
+    '''
+    Returns True if position i of text is a period after a capital letter
+    not marked by rules 1 to 4 (a candidate for rules 6 and 7).
+    '''
+    return text[i - 1:i] in CAPS and text[i:i + 1] == "." and not _early_rule(text, i)
@@ -0,0 +1,278 @@
+'''
+Stand-in for the StanfordCoreNLP server: a small rule-based annotator with the
+HTTP interface of the server, for offline runs, tests and benchmarks of ppaxe.
+Its annotations are NOT the ones of the trained NER model: words of the gene
+dictionary and words that look like protein symbols are proteins, and POS tags
+and lemmas come from a few rules.
+
+    python -m ppaxe.standin [--port 9000]
+'''
+from ppaxe.corenlp import Annotator
+from ppaxe.prefilter import SYMBOL_RE, ENZYME_SUFFIXES, normalize
+import argparse
+import json
+import re
+import threading
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urlparse, parse_qs
+except ImportError:
+    # For python 2.7
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import urlparse, parse_qs
+
+# Tokens: words (with inner hyphens, slashes, dots and quotes) or punctuation
+TOKEN_RE = re.compile(r"\w+(?:[-'/.]\w+)*|[^\w\s]", re.UNICODE)
+SENTENCE_END = (".", "!", "?")
+CONLL_DEFAULT_COLUMNS = "idx,word,lemma,pos,ner,headidx,deprel"
+CONLL_KEYS = dict({'idx': 'index'})
+PUNCTUATION = dict({
+    ".": ".", "!": ".", "?": ".", ",": ",", ":": ":", ";": ":",
+    "(": "-LRB-", ")": "-RRB-", "[": "-LRB-", "]": "-RRB-", "'": "''", '"': "''"
+})
+FUNCTION_WORDS = dict({
+    "the": "DT", "a": "DT", "an": "DT", "this": "DT", "these": "DT", "that": "IN",
+    "of": "IN", "in": "IN", "with": "IN", "for": "IN", "by": "IN", "to": "TO", "on": "IN",
+    "from": "IN", "at": "IN", "as": "IN", "and": "CC", "or": "CC", "but": "CC",
+    "not": "RB", "also": "RB", "however": "RB", "it": "PRP", "we": "PRP", "they": "PRP",
+    "which": "WDT", "is": "VBZ", "are": "VBP", "was": "VBD", "were": "VBD", "be": "VB",
+    "been": "VBN", "has": "VBZ", "have": "VBP", "had": "VBD"
+})
+AUXILIARY_LEMMAS = dict({
+    "is": "be", "are": "be", "was": "be", "were": "be", "been": "be", "has": "have", "had": "have"
+})
+
+
+# CLASSES
+# ----------------------------------------------
+class StandInAnnotator(Annotator):
+    '''
+    Rule-based annotator that answers like the StanfordCoreNLP server (JSON or
+    CoNLL output, ssplit.eolonly). Sentences end after ".", "!" or "?", or at
+    blank lines (every line break with ssplit.eolonly).
+
+    Attributes
+    ----------
+    dictionary : set, no default
+        Protein aliases (in upper case).
+
+    verbs : set, no default
+        Lemmas of the verbs recognized.
+    '''
+    def __init__(self, dictionary=None, verbs=None):
+        '''
+        Parameters
+        ----------
+        dictionary : iterable, optional, default = None
+            Protein aliases. Protein.GENEDICT if None.
+
+        verbs : iterable, optional, default = None
+            Lemmas of the verbs recognized. The verbs of the features of
+            InteractionCandidate if None.
+        '''
+        if dictionary is None or verbs is None:
+            from ppaxe import core
+            dictionary = core.Protein.GENEDICT if dictionary is None else dictionary
+            verbs = core.InteractionCandidate.verb_scores if verbs is None else verbs
+        self.dictionary = set(normalize(alias) for alias in dictionary)
+        self.verbs      = set(verbs) | set(["seem", "show", "find", "use"])
+
+    def annotate(self, text, properties=None):
+        '''
+        Annotates text and returns the response of a StanfordCoreNLP server.
+
+        Parameters
+        ----------
+        text : str, required, no default
+            Text to annotate.
+
+        properties : dict, optional, default = None
+            Properties of the request: "outputFormat" ("json" or "conll"),
+            "output.columns" and "ssplit.eolonly" are used.
+        '''
+        properties = properties or dict()
+        eolonly   = str(properties.get('ssplit.eolonly', "false")).lower() == "true"
+        sentences = self.sentences(text, eolonly)
+        if properties.get('outputFormat', "json") == "conll":
+            columns = properties.get('output.columns', CONLL_DEFAULT_COLUMNS).split(",")
+            lines = list()
+            for tokens in sentences:
+                for token in tokens:
+                    lines.append("\t".join([ u"%s" % token.get(CONLL_KEYS.get(column, column), "_") for column in columns ]))
+                lines.append("")
+            return "\n".join(lines) + "\n"
+        return json.dumps({'sentences': [ {'index': idx, 'tokens': tokens} for idx, tokens in enumerate(sentences) ]})
+
+    def sentences(self, text, eolonly=False):
+        '''
+        Returns the list of tokens (dictionaries like the ones of
+        StanfordCoreNLP) of each sentence of text.
+        '''
+        offsets = self.__utf16_offsets(text)
+        sentences = list()
+        tokens = list()
+        previous = None
+        previous_end = 0
+        for match in TOKEN_RE.finditer(text):
+            gap = text[previous_end:match.start()]
+            if previous is not None:
+                previous['after'] = gap
+            if tokens and (gap.count("\n") >= (1 if eolonly else 2)):
+                sentences.append(tokens)
+                tokens = list()
+            word = match.group()
+            lemma, pos = self.__tag(word)
+            previous = {
+                'index': len(tokens) + 1, 'word': word, 'originalText': word, 'lemma': lemma,
+                'characterOffsetBegin': offsets[match.start()], 'characterOffsetEnd': offsets[match.end()],
+                'pos': pos, 'ner': "P" if pos == "NN" and self.__is_protein(word) else "O",
+                'before': gap, 'after': ""
+            }
+            tokens.append(previous)
+            previous_end = match.end()
+            if word in SENTENCE_END and not eolonly:
+                sentences.append(tokens)
+                tokens = list()
+        if previous is not None:
+            previous['after'] = text[previous_end:]
+        if tokens:
+            sentences.append(tokens)
+        return sentences
+
+    def __tag(self, word):
+        '''
+        Returns the lemma and the POS tag of word.
+        '''
+        lower = word.lower()
+        if word in PUNCTUATION:
+            return (word, PUNCTUATION[word])
+        if lower in FUNCTION_WORDS:
+            return (AUXILIARY_LEMMAS.get(lower, lower), FUNCTION_WORDS[lower])
+        if lower.replace(".", "").isdigit():
+            return (word, "CD")
+        if lower in self.verbs:
+            return (lower, "VBP")
+        for suffix, pos in (("ing", "VBG"), ("ed", "VBN"), ("es", "VBZ"), ("s", "VBZ")):
+            if lower.endswith(suffix):
+                stem = lower[:-len(suffix)]
+                for lemma in (stem, stem + "e"):
+                    if lemma in self.verbs:
+                        return (lemma, pos)
+        return (lower if word.islower() else word, "NN")
+
+    def __is_protein(self, word):
+        '''
+        Returns True if word is in the dictionary or looks like a protein
+        symbol or an enzyme name.
+        '''
+        normalized = normalize(word)
+        return (
+            normalized in self.dictionary or SYMBOL_RE.match(word) is not None
+            or (len(normalized) > 5 and normalized.endswith(ENZYME_SUFFIXES))
+        )
+
+    def __utf16_offsets(self, text):
+        '''
+        Returns a list with the UTF-16 offset of each position of text.
+        '''
+        offsets = [0]
+        for char in text:
+            offsets.append(offsets[-1] + (2 if ord(char) > 0xFFFF else 1))
+        return offsets
+
+    def __str__(self):
+        return "Stand-in for the StanfordCoreNLP server (%s protein aliases)" % len(self.dictionary)
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    '''
+    Answers the requests of the StanfordCoreNLP HTTP interface with the
+    annotator of the server
+    '''
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        text  = self.rfile.read(int(self.headers['Content-Length'])).decode('utf-8')
+        query = parse_qs(urlparse(self.path).query)
+        properties = json.loads(query['properties'][0]) if 'properties' in query else None
+        try:
+            body   = self.server.annotator.annotate(text, properties)
+            status = 200
+        except Exception as err:
+            body   = "ppaxe stand-in error: %s" % err
+            status = 500
+        self.__respond(status, body)
+
+    def do_GET(self):
+        self.__respond(200, "live")
+
+    def __respond(self, status, body):
+        body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StandInServer(ThreadingMixIn, HTTPServer):
+    '''
+    HTTP server with the interface of the StanfordCoreNLP server.
+
+    Attributes
+    ----------
+    annotator : Annotator, no default
+        Annotator of the requests.
+    '''
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 9000), annotator=None):
+        '''
+        Parameters
+        ----------
+        address : tuple, optional, default = ("127.0.0.1", 9000)
+            Host and port of the server (port 0 for any free port).
+
+        annotator : Annotator, optional, default = None
+            Annotator of the requests. A StandInAnnotator if None.
+        '''
+        HTTPServer.__init__(self, address, StandInHandler)
+        self.annotator = annotator if annotator is not None else StandInAnnotator()
+
+    @property
+    def url(self):
+        return "http://%s:%s" % self.server_address[:2]
+
+    def start(self):
+        '''
+        Serves requests in a daemon thread and returns the server.
+        '''
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self
+
+
+# FUNCTIONS
+# ----------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Stand-in for the StanfordCoreNLP server (rule-based annotations, for tests and benchmarks).")
+    parser.add_argument('--host', help="Address to listen to. Default: 127.0.0.1", default="127.0.0.1")
+    parser.add_argument('-p', '--port', help="Port to listen to. Default: 9000", type=int, default=9000)
+    options = parser.parse_args()
+    server = StandInServer((options.host, options.port))
+    print("%s listening at %s" % (server.annotator, server.url))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+'''
+Compact representation of the tokens annotated by StanfordCoreNLP: one array
+per field instead of one dictionary per token. POS tags, lemmas and NER tags
+are interned as integer ids shared by all the sentences of the run.
+'''
+from array import array
+import threading
+
+
+# CLASSES
+# ----------------------------------------------
+class Vocabulary(object):
+    '''
+    Table of interned strings: each string has an integer id.
+
+    Attributes
+    ----------
+    ids : dict, no default
+        Id of each string.
+
+    strings : list, no default
+        String of each id.
+    '''
+    def __init__(self):
+        self.ids     = dict()
+        self.strings = list()
+        self.lock    = threading.Lock()
+
+    def id(self, string):
+        '''
+        Returns the id of string (adding it if it is new).
+        '''
+        idx = self.ids.get(string)
+        if idx is None:
+            with self.lock:
+                idx = self.ids.get(string)
+                if idx is None:
+                    idx = len(self.strings)
+                    self.strings.append(string)
+                    self.ids[string] = idx
+        return idx
+
+    def __getitem__(self, idx):
+        return self.strings[idx]
+
+    def __len__(self):
+        return len(self.strings)
+
+
+LEMMAS = Vocabulary()
+POS    = Vocabulary()
+NER    = Vocabulary()
+
+
+class Tokens(object):
+    '''
+    Tokens of a sentence as a struct of arrays. Indexing returns the token as a
+    dictionary like the ones of StanfordCoreNLP (with keys "index", "word",
+    "lemma", "pos" and "ner"), and slicing returns a Tokens object, but the
+    feature computations work on the arrays directly.
+
+    Attributes
+    ----------
+    words : list, no default
+        Word of each token.
+
+    lemmas : array, no default
+        Id of the lemma of each token in LEMMAS.
+
+    pos : array, no default
+        Id of the Part-of-Speech tag of each token in POS.
+
+    ner : array, no default
+        Id of the NER tag ("P" or "O") of each token in NER.
+
+    begin : int, no default
+        Character offset of the start of the first token in the annotated text.
+
+    end : int, no default
+        Character offset of the end of the last token in the annotated text.
+    '''
+    __slots__ = ("words", "lemmas", "pos", "ner", "begin", "end")
+
+    def __init__(self, words=None, lemmas=None, pos=None, ner=None, begin=0, end=0):
+        self.words  = words if words is not None else list()
+        self.lemmas = lemmas if lemmas is not None else array('i')
+        self.pos    = pos if pos is not None else array('i')
+        self.ner    = ner if ner is not None else array('i')
+        self.begin  = begin
+        self.end    = end
+
+    @classmethod
+    def from_corenlp(cls, tokens):
+        '''
+        Returns the Tokens of a list of StanfordCoreNLP tokens (dictionaries).
+        Missing fields are empty strings.
+        '''
+        if isinstance(tokens, Tokens):
+            return tokens
+        compact = cls()
+        if not tokens:
+            return compact
+        for token in tokens:
+            compact.words.append(token.get('word', ""))
+            compact.lemmas.append(LEMMAS.id(token.get('lemma', "")))
+            compact.pos.append(POS.id(token.get('pos', "")))
+            compact.ner.append(NER.id(token.get('ner', "")))
+        compact.begin = tokens[0].get('characterOffsetBegin', 0)
+        compact.end   = tokens[-1].get('characterOffsetEnd', 0)
+        return compact
+
+    @classmethod
+    def from_json(cls, data):
+        '''
+        Returns the Tokens stored with to_json (or a list of StanfordCoreNLP tokens).
+        '''
+        if isinstance(data, list):
+            return cls.from_corenlp(data)
+        return cls(
+            words=list(data['word']),
+            lemmas=array('i', [ LEMMAS.id(lemma) for lemma in data['lemma'] ]),
+            pos=array('i', [ POS.id(tag) for tag in data['pos'] ]),
+            ner=array('i', [ NER.id(tag) for tag in data['ner'] ]),
+            begin=data['begin'], end=data['end']
+        )
+
+    def extend(self, other):
+        '''
+        Appends the tokens of other (the next sentence of the text).
+        '''
+        if not self.words:
+            self.begin = other.begin
+        self.words.extend(other.words)
+        self.lemmas.extend(other.lemmas)
+        self.pos.extend(other.pos)
+        self.ner.extend(other.ner)
+        self.end = other.end
+
+    def to_json(self):
+        '''
+        Returns the tokens as a dictionary of lists of strings (to store them as JSON).
+        '''
+        return dict({
+            'word':  self.words,
+            'lemma': [ LEMMAS[idx] for idx in self.lemmas ],
+            'pos':   [ POS[idx] for idx in self.pos ],
+            'ner':   [ NER[idx] for idx in self.ner ],
+            'begin': self.begin,
+            'end':   self.end
+        })
+
+    def __len__(self):
+        return len(self.words)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return Tokens(self.words[idx], self.lemmas[idx], self.pos[idx], self.ner[idx], self.begin, self.end)
+        if idx < 0:
+            idx += len(self.words)
+        return dict({
+            'index': idx + 1,
+            'word':  self.words[idx],
+            'lemma': LEMMAS[self.lemmas[idx]],
+            'pos':   POS[self.pos[idx]],
+            'ner':   NER[self.ner[idx]]
+        })
+
+    def __iter__(self):
+        for idx in range(len(self.words)):
+            yield self[idx]
+
+    def __eq__(self, other):
+        if isinstance(other, Tokens):
+            return (self.words, self.lemmas, self.pos, self.ner) == (other.words, other.lemmas, other.pos, other.ner)
+        if isinstance(other, (list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "Tokens(%r)" % self.words
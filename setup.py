@@ -1,13 +1,14 @@
 import setuptools
 
 requires = [
-    'pycorenlp',
+    'numpy',
     'scipy',
     'sklearn',
     'requests',
     'networkx',
     'uuid',
-    'matplotlib'
+    'matplotlib',
+    'futures; python_version < "3"'
     ]
 
 setuptools.setup(name='ppaxe',
@@ -0,0 +1,17 @@
+'''
+Annotator backend of the tests. The tests that annotate texts without a client
+use the StanfordCoreNLP server at http://localhost:9000, unless:
+
+    PPAXE_RECORD=FILE  records the responses of the server in FILE
+    PPAXE_REPLAY=FILE  answers with the responses recorded in FILE (no server needed)
+'''
+from ppaxe import core
+from ppaxe.replay import RecordReplay
+import os
+
+
+def pytest_configure(config):
+    if os.environ.get("PPAXE_REPLAY"):
+        core.use_annotator(RecordReplay(os.environ["PPAXE_REPLAY"]))
+    elif os.environ.get("PPAXE_RECORD"):
+        core.use_annotator(RecordReplay(os.environ["PPAXE_RECORD"], client=core.NLP))
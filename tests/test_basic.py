@@ -3,8 +3,14 @@
 Tests for the main classes of ppaxe
 '''
 from ppaxe import core
-from pycorenlp import StanfordCoreNLP
+from ppaxe import cache
+from ppaxe import dedup
 import json
+import pytest
+import io
+import re
+import threading
+import time
 
 def test_sentence_separator():
     '''
@@ -23,25 +29,225 @@ def test_sentence_separator():
     article.extract_sentences()
     assert(len(article.sentences) == 8)
 
+def test_sentence_spans():
+    '''
+    Tests if sentences are positions in the text of the article
+    '''
+    article = core.Article(pmid="1234", fulltext="Dr. Smith studied TP53.\n It binds MDM2 (e.g. in vitro).")
+    article.extract_sentences()
+    assert(article.text == "Dr. Smith studied TP53.\n It binds MDM2 (e.g. in vitro).")
+    assert([sentence.span for sentence in article.sentences] == [(0, 23), (25, 55)])
+    assert(article.sentences[1].buffer is article.text)
+    assert(article.sentences[1].originaltext == "It binds MDM2 (e.g. in vitro).")
+
+def utf16_len(text):
+    '''
+    Length of text in UTF-16 code units, as counted by StanfordCoreNLP
+    '''
+    return len(text.encode("utf-16-le")) // 2
+
+class FakeNLP(object):
+    '''
+    Splits sentences at line breaks and tokens at spaces, like a StanfordCoreNLP
+    server with ssplit.eolonly
+    '''
+    def __init__(self):
+        self.requests = list()
+
+    def annotate(self, text, properties=None):
+        self.requests.append(text)
+        sentences = list()
+        for line in re.finditer(r"[^\n]+", text):
+            tokens = list()
+            for word in re.finditer(r"\S+", line.group()):
+                tokens.append({
+                    'index': len(tokens) + 1, 'word': word.group(), 'ner': "O", 'pos': "NN",
+                    'characterOffsetBegin': utf16_len(text[:line.start() + word.start()]),
+                    'characterOffsetEnd': utf16_len(text[:line.start() + word.end()])
+                })
+            sentences.append({'tokens': tokens})
+        return json.dumps({'sentences': sentences})
+
+def test_annotate_sentences(monkeypatch):
+    '''
+    Tests if sentences and tokens are created from whole article annotations
+    '''
+    nlp = FakeNLP()
+    monkeypatch.setattr(core, "NLP", nlp)
+    article = core.Article(pmid="1234", fulltext="  MAPK4 binds &lt;MAPK2&gt;\n\U0001d6fc TP53 too\n" + "x y\n" * 10)
+    article.annotate_sentences(chunk_size=30)
+    assert(len(nlp.requests) > 1)
+    assert(len(article.sentences) == 12)
+    assert(article.sentences[0].originaltext == "MAPK4 binds <MAPK2>")
+    assert(article.sentences[1].originaltext == "\U0001d6fc TP53 too")
+    assert(article.sentences[0].tokens[2]['word'] == "<MAPK2>")
+    assert(article.sentences[-1].buffer is article.text)
+
+class SplittingNLP(FakeNLP):
+    '''
+    FakeNLP that also splits sentences after "; " and fails with long texts,
+    like a server that ignores ssplit.eolonly and times out
+    '''
+    def annotate(self, text, properties=None):
+        if len(text) > 40:
+            return "CoreNLP request timed out. Your document may be too long."
+        return FakeNLP.annotate(self, text.replace("; ", ";\n"), properties)
+
+def test_annotate_batch(monkeypatch):
+    '''
+    Tests if batched annotations are assigned back to their sentences
+    '''
+    nlp = FakeNLP()
+    monkeypatch.setattr(core, "NLP", nlp)
+    sentences = [ core.Sentence(originaltext="MAPK%s binds \U0001d6fc TP53." % idx) for idx in range(10) ]
+    sentences.append(core.Sentence(originaltext="  "))
+    core.annotate_batch(sentences, max_chars=100)
+    assert(len(nlp.requests) == 2)
+    for idx, sentence in enumerate(sentences[:10]):
+        assert([ token['word'] for token in sentence.tokens ] == ["MAPK%s" % idx, "binds", "\U0001d6fc", "TP53."])
+    assert(sentences[10].tokens == list())
+
+def test_annotate_batch_mismatch(monkeypatch):
+    '''
+    Tests batched annotations when the server splits the lines and fails with
+    long batches
+    '''
+    monkeypatch.setattr(core, "NLP", SplittingNLP())
+    sentences = [
+        core.Sentence(originaltext="MAPK1 binds TP53; it also binds MDM2."),
+        core.Sentence(originaltext="Short one."),
+        core.Sentence(originaltext="This sentence is far too long to be annotated by the server.")
+    ]
+    core.annotate_batch(sentences)
+    assert([ token['index'] for token in sentences[0].tokens ] == [1, 2, 3, 4, 5, 6, 7])
+    assert(sentences[0].tokens[4]['word'] == "also")
+    assert(len(sentences[1].tokens) == 2)
+    assert(sentences[2].tokens == list())
+    assert([ sentence.failed for sentence in sentences ] == [False, False, True])
+
+class FailingNLP(FakeNLP):
+    '''
+    FakeNLP that never returns annotations
+    '''
+    def annotate(self, text, properties=None):
+        self.requests.append(text)
+        return "CoreNLP request timed out. Your document may be too long."
+
+def test_failed_not_annotated_again(monkeypatch):
+    '''
+    Tests if sentences that failed in a batch are not sent again one by one
+    '''
+    nlp = FailingNLP()
+    monkeypatch.setattr(core, "NLP", nlp)
+    sentences = [ core.Sentence(originaltext="MAPK1 binds TP53."), core.Sentence(originaltext="   ") ]
+    core.annotate_batch(sentences)
+    assert(len(nlp.requests) == 1)
+    assert([ sentence.failed for sentence in sentences ] == [True, False])
+    for sentence in sentences:
+        sentence.get_candidates()
+        assert(sentence.candidates == list())
+    assert(len(nlp.requests) == 1)
+
+def test_annotate_sentences_fallback():
+    '''
+    Tests if pieces that can't be annotated are split in sentences that are
+    positions in the text of the article
+    '''
+    article = core.Article(pmid="1234", fulltext="MAPK1 binds TP53 and MDM2. It binds MDM2 &amp; MDM4.\n")
+    article.annotate_sentences(client=SplittingNLP())
+    assert([ sentence.span for sentence in article.sentences ] == [(0, 26), (27, 48)])
+    assert(article.sentences[1].buffer is article.text)
+    assert(article.sentences[1].originaltext == "It binds MDM2 & MDM4.")
+    assert(article.sentences[1].tokens[3]['word'] == "&")
+
+class SlowNLP(FakeNLP):
+    '''
+    FakeNLP that counts the requests processed at the same time
+    '''
+    def __init__(self):
+        FakeNLP.__init__(self)
+        self.lock    = threading.Lock()
+        self.running = 0
+        self.maximum = 0
+
+    def annotate(self, text, properties=None):
+        with self.lock:
+            self.running += 1
+            self.maximum = max(self.maximum, self.running)
+        time.sleep(0.05)
+        with self.lock:
+            self.running -= 1
+        return FakeNLP.annotate(self, text, properties)
+
+def test_annotate_articles():
+    '''
+    Tests if articles are annotated concurrently with the given client and
+    yielded in order
+    '''
+    client = SlowNLP()
+    articles = [ core.Article(pmid=str(idx), fulltext="MAPK%s binds TP53." % idx) for idx in range(12) ]
+    annotated = list(core.annotate_articles(iter(articles), client=client, workers=4))
+    assert([ article.pmid for article in annotated ] == [ str(idx) for idx in range(12) ])
+    assert(annotated[5].sentences[0].tokens[0]['word'] == "MAPK5")
+    assert(len(client.requests) == 12)
+    assert(client.maximum > 1)
+
+def test_annotation_cache(tmpdir):
+    '''
+    Tests if cached sentences and texts are not sent to the server
+    '''
+    annotations = cache.AnnotationCache(str(tmpdir.join("annotations.db")))
+    sentences = [ core.Sentence(originaltext="MAPK%s binds TP53." % idx) for idx in range(4) ]
+    core.annotate_batch(sentences[:2], client=FakeNLP(), cache=annotations)
+    nlp = FakeNLP()
+    core.annotate_batch(sentences, client=nlp, cache=annotations)
+    assert(nlp.requests == ["MAPK2 binds TP53.\nMAPK3 binds TP53."])
+    assert(sentences[0].tokens[0]['word'] == "MAPK0")
+    for idx in range(2):
+        article = core.Article(pmid="1234", fulltext="MAPK1 binds TP53.\nIt binds MDM2.")
+        article.annotate_sentences(client=nlp, cache=annotations)
+        assert([ sentence.originaltext for sentence in article.sentences ] == ["MAPK1 binds TP53.", "It binds MDM2."])
+    assert(len(nlp.requests) == 2)
+
+def test_annotate_dedup():
+    '''
+    Tests if sentences analyzed before in the run are not sent to the server
+    '''
+    index = dedup.SentenceIndex()
+    analyzed = core.Sentence(originaltext="MAPK1 binds TP53.")
+    core.annotate_batch([analyzed], client=FakeNLP())
+    index.add(analyzed)
+    nlp = FakeNLP()
+    article = core.Article(pmid="1234", fulltext="MAPK1 binds TP53. It binds MDM2.")
+    article.annotate(splitter="regex", client=nlp, index=index)
+    assert(nlp.requests == ["It binds MDM2."])
+    assert(not article.sentences[0].tokens)
+    assert(index.share(article.sentences[0]))
+    assert(article.sentences[0].tokens[0]['word'] == "MAPK1")
+
+def test_text_chunks():
+    '''
+    Tests if texts are cut in pieces at line breaks or spaces
+    '''
+    text = "one two three\nfour five"
+    assert(list(core.text_chunks(text, 16)) == [(0, 14), (14, 23)])
+    assert(list(core.text_chunks(text, 9)) == [(0, 8), (8, 14), (14, 23)])
+    assert(list(core.text_chunks("abcdef", 4)) == [(0, 4), (4, 6)])
+
 def test_stanford_corenlp_server():
     '''
-    Tests connection to stanford corenlp server
+    Tests connection to stanford corenlp server (the annotator backend of the
+    tests, see conftest.py)
     '''
-    try:
-        nlp = StanfordCoreNLP('http://localhost:9000')
-        nlp.annotate("HOLA")
-        assert(1 == 1)
-    except:
-        assert("Connection error" == "StanfordCoreNLP")
+    assert(len(core.annotate_text("HOLA")) == 1)
 
 def test_annotation():
     '''
     Tests if Stanford coreNLP NER works
     '''
     text = "MAPK seems to interact with chloroacetate esterase"
-    nlp = StanfordCoreNLP('http://localhost:9000')
     ner_list = list()
-    for token in json.loads(nlp.annotate(text))['sentences'][0]['tokens']:
+    for token in core.annotate_text(text)[0]:
         ner_list.append(token['ner'])
     assert("".join(ner_list) == "POOOOPP")
 
@@ -388,4 +594,81 @@ def test_predictions_method_empty():
     """
     article = core.Article(pmid="1234", fulltext=article_text)
     predictions = article.predictions
-    assert(predictions == [])
\ No newline at end of file
+    assert(predictions == [])
+
+def test_iter_pmc_articles():
+    '''
+    Tests streaming parsing of PMC XML
+    '''
+    xml = b"""<pmc-articleset>
+        <article>
+            <front>
+                <journal-meta><journal-id>PLoS One</journal-id></journal-meta>
+                <article-meta>
+                    <article-id pub-id-type="pmid">25615823</article-id>
+                    <article-id pub-id-type="pmc">4304798</article-id>
+                    <pub-date><year>2015</year></pub-date>
+                </article-meta>
+            </front>
+            <body><sec><p>MAPK binds <italic>in vivo</italic> to ALB.</p><p>Second paragraph.</p></sec></body>
+        </article>
+        <article>
+            <front><article-meta><article-id pub-id-type="pmid">1234</article-id></article-meta></front>
+            <body><p>No PMC identifier.</p></body>
+        </article>
+    </pmc-articleset>"""
+    articles = list(core.iter_pmc_articles(io.BytesIO(xml)))
+    assert(len(articles) == 1)
+    assert(articles[0].pmid == "25615823" and articles[0].pmcid == "4304798")
+    assert(articles[0].journal == "PLoS One" and articles[0].year == "2015")
+    assert(articles[0].fulltext == "MAPK binds   to ALB.\nSecond paragraph.")
+
+def test_iter_pubmed_articles():
+    '''
+    Tests streaming parsing of PubMed XML. Articles without abstract are skipped.
+    '''
+    xml = b"""<PubmedArticleSet>
+        <PubmedArticle><MedlineCitation>
+            <PMID Version="1">28869924</PMID>
+            <Article>
+                <Journal><Title>Aquatic toxicology (Amsterdam, Netherlands)</Title>
+                <JournalIssue><PubDate><Year>2017</Year></PubDate></JournalIssue></Journal>
+                <Abstract><AbstractText>First part.</AbstractText><AbstractText>Second part.</AbstractText></Abstract>
+            </Article>
+        </MedlineCitation></PubmedArticle>
+        <PubmedArticle><MedlineCitation>
+            <PMID Version="1">1234</PMID>
+            <Article><Journal><Title>Journal</Title></Journal></Article>
+        </MedlineCitation></PubmedArticle>
+    </PubmedArticleSet>"""
+    articles = list(core.iter_pubmed_articles(io.BytesIO(xml)))
+    assert(len(articles) == 1)
+    assert(articles[0].pmid == "28869924" and articles[0].year == "2017")
+    assert(articles[0].journal == "Aquatic toxicology (Amsterdam, Netherlands)")
+    assert(articles[0].abstract == "First part.\nSecond part.")
+
+def test_prefetcher_order():
+    '''
+    Tests if the prefetcher yields all the items in order
+    '''
+    assert(list(core.Prefetcher(iter(range(100)), depth=3)) == list(range(100)))
+
+def test_prefetcher_error():
+    '''
+    Tests if errors in the background thread are raised when reading
+    '''
+    def failing():
+        yield 1
+        raise core.PubMedQueryError("Can't connect to PMC")
+    prefetcher = core.Prefetcher(failing())
+    assert(next(prefetcher) == 1)
+    with pytest.raises(core.PubMedQueryError):
+        next(prefetcher)
+
+def test_bounded_map():
+    '''
+    Tests if bounded_map yields results in order
+    '''
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        assert(list(core.bounded_map(executor, lambda x: x * 2, range(10), 4)) == list(range(0, 20, 2)))
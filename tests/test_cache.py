@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+'''
+Tests for the on-disk caches
+'''
+from ppaxe import cache
+import os
+import sqlite3
+import time
+
+RECORD = dict({
+    'pmid':     "25615823",
+    'pmcid':    "4304798",
+    'journal':  "PLoS One",
+    'year':     "2015",
+    'fulltext': "Liver cancer is the sixth most frequent cancer.",
+    'abstract': None
+})
+
+def test_article_cache(tmpdir):
+    '''
+    Tests if articles can be retrieved from the cache by PMID and PMCID
+    '''
+    store = cache.ArticleCache(str(tmpdir.join("articles.db")))
+    store.put("PMC", [RECORD])
+    assert(store.get("PMC", "25615823") == RECORD)
+    assert(store.get("PMC", "PMC4304798") == RECORD)
+    assert(store.get("PUBMED", "25615823") is None)
+
+def test_article_cache_persistence(tmpdir):
+    '''
+    Tests if the cache is kept between runs
+    '''
+    path = str(tmpdir.join("articles.db"))
+    store = cache.ArticleCache(path)
+    store.put("PMC", [RECORD])
+    store.close()
+    assert(os.path.exists(path))
+    assert(cache.ArticleCache(path).get("PMC", "25615823") == RECORD)
+
+def test_article_cache_ttl(tmpdir):
+    '''
+    Tests if expired articles are not returned
+    '''
+    store = cache.ArticleCache(str(tmpdir.join("articles.db")), ttl=-1)
+    store.put("PMC", [RECORD])
+    assert(store.get("PMC", "25615823") is None)
+
+def test_notfound_cache(tmpdir):
+    '''
+    Tests negative cache of identifiers not found
+    '''
+    store = cache.ArticleCache(str(tmpdir.join("articles.db")))
+    store.put_notfound("PMC", ["99999999"])
+    assert(store.is_notfound("PMC", "99999999"))
+    assert(not store.is_notfound("PUBMED", "99999999"))
+
+TOKENS = [[
+    {'index': 1, 'word': "MAPK1", 'ner': "P", 'pos': "NN"},
+    {'index': 2, 'word': "binds", 'ner': "O", 'pos': "VBZ"}
+]]
+
+def test_annotation_cache(tmpdir):
+    '''
+    Tests if annotations are retrieved by text, properties and model
+    '''
+    path = str(tmpdir.join("annotations.db"))
+    store = cache.AnnotationCache(path, model="ner-1")
+    store.put([("MAPK1 binds", TOKENS)], {'ssplit.eolonly': 'true'})
+    assert(store.get("MAPK1 binds", {'ssplit.eolonly': 'true'}) == TOKENS)
+    assert(store.get("MAPK1 binds") is None)
+    assert(store.get("MAPK1 binds.", {'ssplit.eolonly': 'true'}) is None)
+    assert((store.hits, store.misses) == (1, 2))
+    store.close()
+    assert(cache.AnnotationCache(path, model="ner-1").get("MAPK1 binds", {'ssplit.eolonly': 'true'}) == TOKENS)
+    assert(cache.AnnotationCache(path, model="ner-2").get("MAPK1 binds", {'ssplit.eolonly': 'true'}) is None)
+
+def test_annotation_cache_eviction(tmpdir):
+    '''
+    Tests if the least recently used annotations are removed when the cache is full
+    '''
+    store = cache.AnnotationCache(str(tmpdir.join("annotations.db")), max_size=None)
+    store.put([ ("Sentence %s." % idx, TOKENS) for idx in range(10) ])
+    size = store.size
+    store.get("Sentence 0.")
+    store.max_size = size - 1
+    store.put([("Sentence 10.", TOKENS)])
+    assert(store.size <= store.max_size * 0.9)
+    assert(store.get("Sentence 0.") is not None)
+    assert(store.get("Sentence 1.") is None)
+    assert(store.get("Sentence 10.") is not None)
+
+def test_annotation_cache_used(tmpdir):
+    '''
+    Tests if the times of use of the annotations read are written with the next
+    put or when the cache is closed, not on every read
+    '''
+    path  = str(tmpdir.join("annotations.db"))
+    store = cache.AnnotationCache(path, max_size=None)
+    store.put([("Sentence 0.", TOKENS)])
+    def used():
+        return sqlite3.connect(path).execute("SELECT used FROM annotations").fetchone()[0]
+    written = used()
+    time.sleep(0.01)
+    store.get("Sentence 0.")
+    assert(used() == written)
+    store.close()
+    assert(used() > written)
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+'''
+Tests for the checkpoints of resumable runs
+'''
+from ppaxe.checkpoint import Checkpoint, CheckpointError
+import os
+import pytest
+
+def test_checkpoint_resume(tmpdir):
+    '''
+    Tests if a resumed run skips completed articles and keeps their lines
+    '''
+    path = str(tmpdir.join("output.tsv"))
+    checkpoint = Checkpoint(path)
+    checkpoint.write("1\tA\tB\n")
+    checkpoint.commit("1")
+    checkpoint.close()
+    checkpoint = Checkpoint(path, resume=True)
+    assert("1" in checkpoint)
+    checkpoint.write("2\tC\tD\n")
+    checkpoint.commit("2")
+    checkpoint.close()
+    with open(path) as fh:
+        assert(fh.read() == "1\tA\tB\n2\tC\tD\n")
+
+def test_checkpoint_crash(tmpdir):
+    '''
+    Tests if lines of articles not completed (and partial journal lines) are removed
+    '''
+    path = str(tmpdir.join("output.tsv"))
+    checkpoint = Checkpoint(path)
+    checkpoint.write("1\tA\tB\n")
+    checkpoint.commit("1")
+    # Crash while writing article 2
+    checkpoint.write("2\tC\tD\n")
+    checkpoint.output.flush()
+    checkpoint.journal.write(b"2\t1")
+    checkpoint.close()
+    checkpoint = Checkpoint(path, resume=True)
+    assert(checkpoint.done == set(["1"]))
+    checkpoint.write("2\tC\tD\n")
+    checkpoint.commit("2")
+    checkpoint.close()
+    with open(path) as fh:
+        assert(fh.read() == "1\tA\tB\n2\tC\tD\n")
+    assert(Checkpoint(path, resume=True).done == set(["1", "2"]))
+
+def test_checkpoint_overwrite(tmpdir):
+    '''
+    Tests if runs without resume start from scratch
+    '''
+    path = str(tmpdir.join("output.tsv"))
+    checkpoint = Checkpoint(path)
+    checkpoint.write("1\tA\tB\n")
+    checkpoint.commit("1")
+    checkpoint.close()
+    checkpoint = Checkpoint(path)
+    assert(not checkpoint.done)
+    checkpoint.close()
+    with open(path) as fh:
+        assert(fh.read() == "")
+
+def test_checkpoint_no_journal(tmpdir):
+    '''
+    Tests if an output without journal is not overwritten when resuming
+    '''
+    path = str(tmpdir.join("output.tsv"))
+    with open(path, "w") as fh:
+        fh.write("1\tA\tB\n")
+    with pytest.raises(CheckpointError):
+        Checkpoint(path, resume=True)
+    with open(path) as fh:
+        assert(fh.read() == "1\tA\tB\n")
+    # Nothing to resume
+    Checkpoint(str(tmpdir.join("new.tsv")), resume=True).close()
+
+def test_checkpoint_notfound(tmpdir):
+    '''
+    Tests if identifiers not found are skipped when resuming
+    '''
+    path = str(tmpdir.join("output.tsv"))
+    checkpoint = Checkpoint(path)
+    checkpoint.write("1\tA\tB\n")
+    checkpoint.commit("1")
+    checkpoint.commit_notfound(["2", "3"])
+    checkpoint.close()
+    checkpoint = Checkpoint(path, resume=True)
+    assert(checkpoint.done == set(["1", "2", "3"]))
+    checkpoint.write("4\tC\tD\n")
+    checkpoint.commit("4")
+    checkpoint.close()
+    with open(path) as fh:
+        assert(fh.read() == "1\tA\tB\n4\tC\tD\n")
+
+def test_checkpoint_sync(tmpdir, monkeypatch):
+    '''
+    Tests if the output is synced to disk before the journal line of each
+    article (and only if it grew)
+    '''
+    synced = list()
+    monkeypatch.setattr(os, "fsync", lambda fd: synced.append(fd))
+    checkpoint = Checkpoint(str(tmpdir.join("output.tsv")))
+    output, journal = checkpoint.output.fileno(), checkpoint.journal.fileno()
+    checkpoint.write("1\tA\tB\n")
+    checkpoint.commit("1")
+    assert(synced == [output, journal])
+    checkpoint.commit("2")
+    checkpoint.commit_notfound(["3"])
+    assert(synced == [output, journal, journal, journal])
+    checkpoint.close()
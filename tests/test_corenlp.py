@@ -0,0 +1,458 @@
+# -*- coding: utf-8 -*-
+'''
+Tests for the StanfordCoreNLP client
+'''
+from ppaxe.core import annotate_text, annotate_batch, Sentence
+from ppaxe.corenlp import CoreNLPClient, CoreNLPPool, CONLL_COLUMNS, decode_conll, decode_json
+from ppaxe.corenlp import Annotator, ServerError, ServerUnavailable, DEADLINE_TIME, FAILURE_THRESHOLD, MAX_INFLIGHT, RETRIES
+from ppaxe.corenlp import _clock
+from ppaxe.standin import StandInAnnotator, StandInServer
+from concurrent.futures import ThreadPoolExecutor
+import json
+import pytest
+import requests
+import socket
+import threading
+import time
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urlparse, parse_qs
+except ImportError:
+    # For python 2.7
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import urlparse, parse_qs
+
+
+class EchoHandler(BaseHTTPRequestHandler):
+    '''
+    Answers with the text, the properties and the client port of the request,
+    or with the errors of the server to texts that start with "Error",
+    "Timeout" or "Rejected"
+    '''
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        text = self.rfile.read(int(self.headers['Content-Length'])).decode('utf-8')
+        query = parse_qs(urlparse(self.path).query)
+        with self.server.lock:
+            self.server.active += 1
+            self.server.max_active = max(self.server.max_active, self.server.active)
+        # Texts with "slow" take SLOW_TIME seconds, the others 20 ms
+        time.sleep(SLOW_TIME if "slow" in text else 0.02)
+        with self.server.lock:
+            self.server.active -= 1
+        for prefix, status, message in ERRORS:
+            if text.startswith(prefix):
+                self.send_response(status)
+                self.send_header('Content-Length', str(len(message)))
+                self.end_headers()
+                self.wfile.write(message.encode('utf-8'))
+                return
+        body = json.dumps({
+            'sentences': list(),
+            'text': text,
+            'properties': json.loads(query['properties'][0]) if 'properties' in query else None,
+            'port': self.client_address[1]
+        }).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+class ThreadingServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, *args):
+        HTTPServer.__init__(self, *args)
+        self.lock       = threading.Lock()
+        self.active     = 0
+        self.max_active = 0
+
+SLOW_TIME = 0.5
+ERRORS    = [
+    ("Error", 500, "java.lang.RuntimeException: Error annotating text"),
+    ("Timeout", 500, "CoreNLP request timed out. Your document may be too long."),
+    ("Rejected", 400, "Bad request")
+]
+
+def start_server():
+    '''
+    Starts an EchoHandler server in a thread and returns it
+    '''
+    server = ThreadingServer(("127.0.0.1", 0), EchoHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+def test_client_annotate():
+    '''
+    Tests if text and properties are sent to the server
+    '''
+    server = start_server()
+    try:
+        client = CoreNLPClient("http://127.0.0.1:%s/" % server.server_address[1])
+        response = json.loads(client.annotate(u"MAPK1 binds α-actinin.", properties={'ssplit.eolonly': 'true'}))
+        assert(response['text'] == u"MAPK1 binds α-actinin.")
+        assert(response['properties'] == {'ssplit.eolonly': 'true'})
+    finally:
+        server.shutdown()
+
+def test_client_connections():
+    '''
+    Tests if every thread keeps its own persistent connection
+    '''
+    server = start_server()
+    try:
+        client = CoreNLPClient("http://127.0.0.1:%s" % server.server_address[1])
+        def ports(idx):
+            return [ json.loads(client.annotate("Sentence %s." % idx))['port'] for request in range(3) ]
+        first = ports(0)
+        assert(len(set(first)) == 1)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            others = list(executor.map(ports, [1, 2]))
+        assert(len(set(others[0])) == 1 and len(set(others[1])) == 1)
+        assert(others[0][0] != others[1][0])
+    finally:
+        server.shutdown()
+
+def test_client_errors():
+    '''
+    Tests if the errors of the server are raised instead of returned
+    '''
+    server = start_server()
+    try:
+        client = CoreNLPClient("http://127.0.0.1:%s" % server.server_address[1])
+        with pytest.raises(ServerError):
+            client.annotate("Error in MAPK1.")
+        with pytest.raises(requests.exceptions.ReadTimeout):
+            client.annotate("Timeout in MAPK1.")
+        with pytest.raises(requests.exceptions.HTTPError) as error:
+            client.annotate("Rejected MAPK1.")
+        assert(not isinstance(error.value, ServerError))
+        sentences = [ Sentence(originaltext=text) for text in ["Error in MAPK1.", "MAPK1 binds TP53.", "TP53 binds MAPK1."] ]
+        annotate_batch(sentences, client=CoreNLPPool([client.url], retries=0))
+        assert([ sentence.failed for sentence in sentences ] == [True, False, False])
+    finally:
+        server.shutdown()
+
+def dead_url():
+    '''
+    Returns the address of a closed port
+    '''
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return "http://127.0.0.1:%s" % port
+
+def test_pool_balance():
+    '''
+    Tests if requests are spread over the servers of the pool
+    '''
+    servers = [ start_server(), start_server() ]
+    try:
+        pool = CoreNLPPool([ "http://127.0.0.1:%s" % server.server_address[1] for server in servers ])
+        assert(pool.check() == 2)
+        for idx in range(6):
+            assert(json.loads(pool.annotate("Sentence %s." % idx))['text'] == "Sentence %s." % idx)
+        stats = pool.stats()
+        assert([ endpoint['requests'] for endpoint in stats ] == [3, 3])
+        assert(all(endpoint['outstanding'] == 0 for endpoint in stats))
+        assert(stats[0]['max_latency'] >= stats[0]['mean_latency'] > 0)
+    finally:
+        for server in servers:
+            server.shutdown()
+
+def test_pool_ejection():
+    '''
+    Tests if servers that can't be reached are ejected
+    '''
+    server = start_server()
+    try:
+        pool = CoreNLPPool([ dead_url(), "http://127.0.0.1:%s" % server.server_address[1] ])
+        for idx in range(4):
+            assert(json.loads(pool.annotate("Sentence %s." % idx))['text'] == "Sentence %s." % idx)
+        stats = pool.stats()
+        assert(stats[0]['failures'] == FAILURE_THRESHOLD and stats[0]['ejected'] is True)
+        assert(stats[1]['requests'] == 4)
+        assert(pool.check() == 1)
+    finally:
+        server.shutdown()
+
+def test_pool_check():
+    '''
+    Tests if the servers are checked periodically and the ones that can't be
+    reached are ejected before sending them requests
+    '''
+    server = start_server()
+    try:
+        pool = CoreNLPPool([ "http://127.0.0.1:%s" % server.server_address[1], dead_url() ])
+        pool.next_check = 0
+        for idx in range(4):
+            pool.annotate("Sentence %s." % idx)
+        stats = pool.stats()
+        assert(stats[1]['ejected'] is True and stats[1]['failures'] == 0)
+        assert(stats[0]['requests'] == 4)
+    finally:
+        server.shutdown()
+
+def test_pool_slots():
+    '''
+    Tests if the slots of rejected and broken requests are released, and if
+    requests stop waiting for a slot that is never released
+    '''
+    server = start_server()
+    try:
+        pool = CoreNLPPool(["http://127.0.0.1:%s" % server.server_address[1]], max_inflight=2, max_wait=0.5)
+        for idx in range(3):
+            with pytest.raises(requests.exceptions.HTTPError):
+                pool.annotate("Rejected MAPK%s." % idx)
+        client = pool.endpoints[0].client
+        def broken(text, properties=None):
+            raise requests.exceptions.ChunkedEncodingError("Connection broken")
+        client.annotate = broken
+        for idx in range(3):
+            with pytest.raises(requests.exceptions.ChunkedEncodingError):
+                pool.annotate("MAPK%s binds TP53." % idx)
+        assert(pool.stats()[0]['outstanding'] == 0)
+        del client.annotate
+        pool.check()
+        assert(json.loads(pool.annotate("MAPK1 binds TP53."))['text'] == "MAPK1 binds TP53.")
+        pool.endpoints[0].outstanding = 2
+        start = time.time()
+        with pytest.raises(ServerUnavailable):
+            pool.annotate("MAPK1 binds TP53.")
+        assert(time.time() - start < 5)
+    finally:
+        server.shutdown()
+
+def test_pool_unavailable():
+    '''
+    Tests if the error is raised when no server can be reached
+    '''
+    pool = CoreNLPPool([ dead_url(), dead_url() ], retries=1)
+    with pytest.raises(ServerUnavailable):
+        pool.annotate("Sentence.")
+    assert([ endpoint['failures'] for endpoint in pool.stats() ] == [2, 2])
+    # Retried until FAILURE_THRESHOLD failures, then all the servers are ejected
+    # and requests fail at once without waiting
+    pool = CoreNLPPool([ dead_url(), dead_url() ], max_wait=0)
+    with pytest.raises(ServerUnavailable):
+        pool.annotate("Sentence.")
+    assert([ endpoint['failures'] for endpoint in pool.stats() ] == [RETRIES + 1] * 2)
+    assert(all(endpoint['ejected'] for endpoint in pool.stats()))
+    start = time.time()
+    with pytest.raises(ServerUnavailable):
+        pool.annotate("Sentence.")
+    assert(time.time() - start < 1)
+    assert([ endpoint['failures'] for endpoint in pool.stats() ] == [RETRIES + 1] * 2)
+
+def test_pool_wait():
+    '''
+    Tests if requests wait for the end of an ejection when all the servers are
+    ejected, up to max_wait seconds
+    '''
+    server = start_server()
+    try:
+        url = "http://127.0.0.1:%s" % server.server_address[1]
+        pool = CoreNLPPool([url])
+        pool.endpoints[0].ejected_until = _clock() + 0.3
+        start = time.time()
+        assert(json.loads(pool.annotate("Sentence."))['text'] == "Sentence.")
+        assert(0.25 < time.time() - start < 2)
+        assert(pool.stats()[0]['ejected'] is False)
+        pool = CoreNLPPool([url], max_wait=0.1)
+        pool.endpoints[0].ejected_until = _clock() + 0.3
+        with pytest.raises(ServerUnavailable):
+            pool.annotate("Sentence.")
+    finally:
+        server.shutdown()
+
+def test_client_deadline():
+    '''
+    Tests if the deadline of a request grows with the text up to the read timeout
+    '''
+    client = CoreNLPClient(timeout=(5, 100))
+    assert(client.deadline("") == (5, DEADLINE_TIME))
+    assert(5 < client.deadline("word " * 1000)[1] - DEADLINE_TIME < 100)
+    assert(client.deadline("word " * 100000) == (5, 100))
+
+def test_pool_deadline():
+    '''
+    Tests if requests are not waited for after their deadline, and if a server
+    that times out gets fewer requests but is not ejected
+    '''
+    server = start_server()
+    try:
+        pool = CoreNLPPool(["http://127.0.0.1:%s" % server.server_address[1]], timeout=(5, 0.2))
+        for idx in range(FAILURE_THRESHOLD + 1):
+            start = time.time()
+            with pytest.raises(requests.exceptions.ReadTimeout):
+                pool.annotate("A slow sentence.")
+            assert(time.time() - start < SLOW_TIME)
+        stats = pool.stats()[0]
+        assert((stats['timeouts'], stats['failures'], stats['ejected']) == (FAILURE_THRESHOLD + 1, 0, False))
+        assert(stats['limit'] == MAX_INFLIGHT // 2 ** (FAILURE_THRESHOLD + 1))
+        assert(json.loads(pool.annotate("A fast sentence."))['text'] == "A fast sentence.")
+    finally:
+        server.shutdown()
+
+def test_pool_limit():
+    '''
+    Tests if the outstanding requests of a server are limited, and if the limit
+    is decreased after a slow answer
+    '''
+    server = start_server()
+    try:
+        pool = CoreNLPPool(["http://127.0.0.1:%s" % server.server_address[1]], max_inflight=2)
+        with ThreadPoolExecutor(max_workers=6) as executor:
+            texts = list(executor.map(lambda idx: json.loads(pool.annotate("Sentence %s." % idx))['text'], range(12)))
+        assert(texts == [ "Sentence %s." % idx for idx in range(12) ])
+        assert(server.max_active == 2)
+        assert(pool.stats()[0]['limit'] == 2)
+        pool.annotate("A slow sentence.")
+        assert(pool.stats()[0]['limit'] == 1)
+    finally:
+        server.shutdown()
+
+CONLL = u"""1\tMAPK1\tMAPK1\tNN\tP\t0\t5
+2\tbinds\tbind\tVBZ\tO\t6\t11
+3\tα-actinin\tα-actinin\tNN\tP\t12\t21
+4\t.\t.\t.\tO\t21\t22
+
+1\tIt\tit\tPRP\tO\t23\t25
+2\tworks\twork\tVBZ\tO\t26\t31
+
+"""
+
+def test_decode_conll():
+    '''
+    Tests if CoNLL responses are decoded to the same Tokens as JSON responses
+    '''
+    sentences = decode_conll(CONLL)
+    assert([ tokens.words for tokens in sentences ] == [[u"MAPK1", u"binds", u"α-actinin", u"."], [u"It", u"works"]])
+    assert([ (tokens.begin, tokens.end) for tokens in sentences ] == [(0, 22), (23, 31)])
+    response = {'sentences': list()}
+    for tokens in sentences:
+        response['sentences'].append({'tokens': [
+            dict(token, characterOffsetBegin=tokens.begin, characterOffsetEnd=tokens.end) for token in tokens
+        ]})
+    assert(decode_json(json.dumps(response)) == sentences)
+    with pytest.raises(ValueError):
+        decode_conll("java.util.concurrent.TimeoutException")
+    with pytest.raises(ValueError):
+        decode_json(json.dumps({'text': "MAPK1 binds"}))
+
+class RecordingClient(object):
+    '''
+    Client that records the properties of the request and answers in CoNLL format
+    '''
+    output_format = "conll"
+
+    def annotate(self, text, properties=None):
+        self.properties = properties
+        return CONLL
+
+def test_output_format():
+    '''
+    Tests if the properties of the output format are sent with the request
+    '''
+    client = RecordingClient()
+    sentences = annotate_text(u"MAPK1 binds α-actinin. It works", client=client, properties={'ssplit.eolonly': 'true'})
+    assert(len(sentences) == 2)
+    assert(client.properties['outputFormat'] == "conll")
+    assert(client.properties['output.columns'] == CONLL_COLUMNS)
+    assert(client.properties['ssplit.eolonly'] == "true")
+    with pytest.raises(ValueError):
+        CoreNLPPool(["http://127.0.0.1:9"], output_format="xml")
+
+def test_check_format():
+    '''
+    Tests if check refuses servers that don't answer in the output format
+    '''
+    server = start_server()
+    try:
+        url = "http://127.0.0.1:%s" % server.server_address[1]
+        assert(CoreNLPPool([url]).check() == 1)
+        # The server answers in JSON, as a server that ignores output.columns
+        # answers with all the CoNLL columns
+        with pytest.raises(ValueError):
+            CoreNLPPool([url], output_format="conll").check()
+        assert(CoreNLPPool([dead_url()], output_format="conll").check() == 0)
+    finally:
+        server.shutdown()
+
+class TimeoutClient(Annotator):
+    '''
+    Stand-in annotator that times out with the texts that have the word "slow"
+    '''
+    def __init__(self, error=requests.exceptions.ReadTimeout):
+        self.standin  = StandInAnnotator(dictionary=["MAPK1", "TP53"], verbs=["bind"])
+        self.error    = error
+        self.requests = 0
+
+    def annotate(self, text, properties=None):
+        self.requests += 1
+        if "slow" in text:
+            raise self.error("Deadline exceeded")
+        return self.standin.annotate(text, properties)
+
+def test_batch_timeout():
+    '''
+    Tests if batches that time out are split to annotate the other sentences,
+    and if batches are given up when no server is available
+    '''
+    texts = ["MAPK1 binds TP53.", "A slow sentence.", "TP53 binds MAPK1.", "MAPK1 is here."]
+    client = TimeoutClient()
+    sentences = [ Sentence(originaltext=text) for text in texts ]
+    annotate_batch(sentences, client=client)
+    assert([ len(sentence.tokens) for sentence in sentences ] == [4, 0, 4, 4])
+    assert(client.requests == 5)
+    client = TimeoutClient(error=ServerUnavailable)
+    sentences = [ Sentence(originaltext=text) for text in texts ]
+    with pytest.raises(ServerUnavailable):
+        annotate_batch(sentences, client=client)
+    assert(not any(sentence.tokens for sentence in sentences))
+    assert(client.requests == 1)
+
+class SlowAnnotator(StandInAnnotator):
+    '''
+    Stand-in annotator that takes SLOW_TIME seconds with the texts that have
+    the word "slow"
+    '''
+    def annotate(self, text, properties=None):
+        if "slow" in text:
+            time.sleep(SLOW_TIME)
+        return StandInAnnotator.annotate(self, text, properties)
+
+def test_batch_slow_sentence():
+    '''
+    Tests if a sentence that times out in every batch doesn't eject a healthy
+    server, so the other sentences are annotated
+    '''
+    server = StandInServer(("127.0.0.1", 0), SlowAnnotator(dictionary=["MAPK1", "TP53"], verbs=["bind"])).start()
+    try:
+        pool = CoreNLPPool([server.url], timeout=(5, 0.3))
+        sentences = [ Sentence(originaltext="A slow sentence.") ]
+        sentences.extend(Sentence(originaltext="MAPK%s binds TP53." % idx) for idx in range(7))
+        annotate_batch(sentences, client=pool)
+        assert([ bool(sentence.tokens) for sentence in sentences ] == [False] + [True] * 7)
+        assert(sentences[0].failed)
+        stats = pool.stats()[0]
+        assert(stats['timeouts'] > FAILURE_THRESHOLD)
+        assert((stats['failures'], stats['ejected']) == (0, False))
+    finally:
+        server.shutdown()
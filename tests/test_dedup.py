@@ -0,0 +1,59 @@
+'''
+Tests for the deduplication of sentences
+'''
+from ppaxe import core
+from ppaxe.dedup import SentenceIndex, sentence_key
+
+def annotated_sentence(text):
+    '''
+    Returns a Sentence of text with its words as tokens and the words in
+    capitals tagged as proteins
+    '''
+    sentence = core.Sentence(originaltext=text)
+    sentence.tokens = [
+        {'index': idx, 'word': word, 'lemma': word, 'pos': "NN", 'ner': "P" if word.isupper() else "O"}
+        for idx, word in enumerate(text.split(), 1)
+    ]
+    return sentence
+
+def test_sentence_key():
+    '''
+    Tests if sentences with different whitespace have the same key
+    '''
+    assert(sentence_key("MAPK1 binds\n TP53.") == sentence_key(" MAPK1  binds TP53. "))
+    assert(sentence_key("MAPK1 binds TP53.") != sentence_key("mapk1 binds TP53."))
+
+def test_sentence_index():
+    '''
+    Tests if the results of a sentence are shared by reference with identical
+    sentences of other articles
+    '''
+    index = SentenceIndex()
+    article = core.Article(pmid="1", fulltext="MAPK1 binds TP53. It is known.")
+    article.extract_sentences(mode="split")
+    first = article.sentences[0]
+    first.tokens = annotated_sentence(first.originaltext).tokens
+    first.get_candidates()
+    assert(first not in index)
+    index.add(first)
+    duplicate = core.Sentence(originaltext="MAPK1 binds  TP53.")
+    assert(duplicate in index)
+    assert(index.share(duplicate))
+    assert(duplicate.tokens is first.tokens)
+    assert(duplicate.candidates is first.candidates)
+    assert(duplicate.candidates[0].prot1.symbol == "MAPK1")
+    # Shared proteins don't keep the text of the article
+    assert(first.proteins[0].sentence.buffer == "MAPK1 binds TP53.")
+    assert(not index.share(core.Sentence(originaltext="It is known.")))
+    assert(index.hits == 1)
+
+def test_sentence_index_size():
+    '''
+    Tests if the least recently used sentences are forgotten
+    '''
+    index = SentenceIndex(max_sentences=2)
+    for text in ("A binds B.", "C binds D.", "E binds F."):
+        index.add(annotated_sentence(text))
+    assert(len(index) == 2)
+    assert(core.Sentence(originaltext="A binds B.") not in index)
+    assert(core.Sentence(originaltext="E binds F.") in index)
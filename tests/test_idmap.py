@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+'''
+Tests for the offline PMID-PMCID index
+'''
+from ppaxe import idmap
+import gzip
+
+CSV = """Journal Title,ISSN,eISSN,Year,Volume,Issue,Page,DOI,PMCID,PMID,Manuscript Id,Release Date
+PLoS One,,1932-6203,2015,10,1,e0115853,10.1371/journal.pone.0115853,PMC4304798,25615823,,live
+Breast Cancer Res,1465-5411,1465-542X,2000,3,1,55,10.1186/bcr271,PMC13900,11250746,,live
+Some Journal,,,2001,1,1,1,,PMC13901,,,live
+"""
+
+def build_index(tmpdir):
+    '''
+    Builds a small index from a gzipped CSV
+    '''
+    csv_path = str(tmpdir.join("PMC-ids.csv.gz"))
+    with gzip.open(csv_path, "wb") as fh:
+        fh.write(CSV.encode("utf-8"))
+    return idmap.PMCIdIndex.build(csv_path, str(tmpdir.join("pmc-ids.npy")))
+
+def test_index_lookup(tmpdir):
+    '''
+    Tests lookups in the PMID-PMCID index
+    '''
+    index = build_index(tmpdir)
+    assert(len(index) == 2)
+    assert(index.get("25615823") == "4304798")
+    assert(index.get("11250746") == "13900")
+    assert(index.get("99999999") is None)
+    assert(index.get("PMC13901") is None)
+
+def test_index_convert(tmpdir):
+    '''
+    Tests conversion of a list of identifiers with misses
+    '''
+    index = build_index(tmpdir)
+    (pmcids, missing) = index.convert(["25615823", "99999999"])
+    assert(pmcids == ["4304798"] and missing == ["99999999"])
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+'''
+Tests for the local PMC and PubMed loaders
+'''
+from ppaxe import loaders
+import gzip
+import io
+import tarfile
+
+NXML = """<?xml version="1.0" ?>
+<article>
+    <front>
+        <journal-meta><journal-id journal-id-type="nlm-ta">PLoS One</journal-id></journal-meta>
+        <article-meta>
+            <article-id pub-id-type="pmc">%s</article-id>
+            <article-id pub-id-type="pmid">%s</article-id>
+            <pub-date><year>2015</year></pub-date>
+        </article-meta>
+    </front>
+    <body><sec><p>MAPK interacts with ALB.</p></sec></body>
+</article>
+"""
+
+def write_tarball(path):
+    '''
+    Writes a tarball with two articles like the ones in PMC Open Access
+    '''
+    with tarfile.open(path, "w:gz") as tar:
+        for pmcid, pmid in [("4304798", "25615823"), ("13900", "11250746")]:
+            data = (NXML % (pmcid, pmid)).encode("utf-8")
+            info = tarfile.TarInfo("PLoS_One/PMC%s.nxml" % pmcid)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+
+def test_local_pmc_tarball(tmpdir):
+    '''
+    Tests reading articles from a PMC Open Access tarball
+    '''
+    path = str(tmpdir.join("oa.tar.gz"))
+    write_tarball(path)
+    articles = list(loaders.iter_local_pmc([path], processes=1))
+    assert([article.pmid for article in articles] == ["25615823", "11250746"])
+    assert(articles[0].pmcid == "4304798" and articles[0].journal == "PLoS One")
+    assert(articles[0].fulltext == "MAPK interacts with ALB.")
+
+def test_local_pmc_directory(tmpdir):
+    '''
+    Tests reading articles from a directory with worker processes and id filter
+    '''
+    for pmcid, pmid in [("4304798", "25615823"), ("13900", "11250746")]:
+        tmpdir.join("PMC%s.nxml" % pmcid).write(NXML % (pmcid, pmid))
+    articles = list(loaders.iter_local_pmc([str(tmpdir)], ids=set(["PMC13900"]), processes=2))
+    assert(len(articles) == 1 and articles[0].pmid == "11250746")
+
+PUBMED_XML = """<?xml version="1.0" ?>
+<PubmedArticleSet>
+    <PubmedArticle><MedlineCitation>
+        <PMID Version="1">%s</PMID>
+        <Article>
+            <Journal><Title>Aquatic toxicology (Amsterdam, Netherlands)</Title>
+            <JournalIssue><PubDate><Year>2017</Year></PubDate></JournalIssue></Journal>
+            <Abstract><AbstractText>MAPK interacts with ALB.</AbstractText></Abstract>
+        </Article>
+    </MedlineCitation></PubmedArticle>
+    <PubmedArticle><MedlineCitation>
+        <PMID Version="1">1</PMID>
+        <Article><Journal><Title>No abstract</Title></Journal></Article>
+    </MedlineCitation></PubmedArticle>
+</PubmedArticleSet>
+"""
+
+def test_local_pubmed(tmpdir):
+    '''
+    Tests reading abstracts from gzipped PubMed baseline files
+    '''
+    for number, pmid in [(1, "28869924"), (2, "28869925")]:
+        with gzip.open(str(tmpdir.join("pubmed18n%04d.xml.gz" % number)), "wb") as fh:
+            fh.write((PUBMED_XML % pmid).encode("utf-8"))
+    articles = list(loaders.iter_local_pubmed([str(tmpdir)], processes=2))
+    assert([article.pmid for article in articles] == ["28869924", "28869925"])
+    assert(articles[0].abstract == "MAPK interacts with ALB.")
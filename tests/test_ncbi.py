@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+'''
+Tests for the NCBI helpers
+'''
+from ppaxe import ncbi
+import time
+
+def test_token_bucket_rate():
+    '''
+    Tests if the token bucket spaces the requests according to its rate
+    '''
+    bucket = ncbi.TokenBucket(rate=20)
+    start = time.time()
+    for i in range(5):
+        bucket.acquire()
+    # First token is available right away, the other 4 need 1/20 s each
+    assert(time.time() - start >= 0.19)
+
+def test_shared_rate_limiter():
+    '''
+    Tests if limiters are shared between queries with the same API key
+    '''
+    assert(ncbi.get_rate_limiter() is ncbi.get_rate_limiter(None))
+    assert(ncbi.get_rate_limiter().rate == ncbi.ANONYMOUS_RATE)
+    assert(ncbi.get_rate_limiter("MYKEY").rate == ncbi.APIKEY_RATE)
+
+def test_eutils_params():
+    '''
+    Tests if identification parameters are added to the request
+    '''
+    params = ncbi.eutils_params({'db': 'pubmed'}, api_key="MYKEY", email="me@example.com")
+    assert(params == {'db': 'pubmed', 'tool': 'ppaxe', 'api_key': 'MYKEY', 'email': 'me@example.com'})
+
+def test_backoff_time():
+    '''
+    Tests exponential backoff bounds and Retry-After header
+    '''
+    for attempt in range(4):
+        assert(0 <= ncbi.backoff_time(attempt) <= ncbi.BACKOFF_FACTOR * 2 ** attempt)
+    assert(ncbi.backoff_time(0, retry_after="2") == 2)
+    assert(ncbi.backoff_time(0, retry_after="86400") == ncbi.MAX_BACKOFF)
+
+def test_get_retries(monkeypatch):
+    '''
+    Tests if transient errors are retried until a good response arrives
+    '''
+    class FakeResponse(object):
+        def __init__(self, status_code):
+            self.status_code = status_code
+            self.headers = dict()
+        def close(self):
+            pass
+
+    class FakeSession(object):
+        def __init__(self):
+            self.statuses = [503, 429, 200]
+        def get(self, url, params, timeout, stream):
+            return FakeResponse(self.statuses.pop(0))
+
+    monkeypatch.setattr(ncbi, "get_session", FakeSession)
+    monkeypatch.setattr(ncbi, "backoff_time", lambda attempt, retry_after=None: 0)
+    assert(ncbi.get(ncbi.EFETCH_URL, params={}, api_key="TESTKEY").status_code == 200)
+
+def test_batch_sizer():
+    '''
+    Tests if the batch size grows with fast requests and halves with failures
+    '''
+    sizer = ncbi.BatchSizer(20, maxsize=200, target_time=10, target_chars=1000000)
+    sizer.success(20, elapsed=1, chars=1000)
+    assert(sizer.size == 40)
+    sizer.success(40, elapsed=20, chars=1000)
+    assert(sizer.size == 20)
+    sizer.failure(20)
+    assert(sizer.size == 10)
+    for i in range(10):
+        sizer.failure(1)
+    assert(sizer.size == 1)
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+'''
+Tests for the prefilter of sentences
+'''
+from ppaxe import core
+from ppaxe.prefilter import Prefilter
+import json
+import pytest
+
+DICTIONARY = ["MAPK1", "ERK2", "ALBUMIN", "TP53", "P53", "CHLOROACETATE ESTERASE", "DYSFERLIN"]
+
+def test_prefilter_dictionary():
+    '''
+    Tests mentions of aliases of one and several words
+    '''
+    prefilter = Prefilter(DICTIONARY, mode="speed")
+    assert(prefilter.mentions("ERK2 binds albumin.") == 2)
+    assert(prefilter.mentions("MAPK seems to interact with chloroacetate esterase.") == 1)
+    assert(prefilter.mentions("Chloroacetate esterase and 'p53' bind.") == 2)
+    assert(prefilter.mentions("MAPK1/ERK2 is phosphorylated.") == 2)
+    assert(prefilter.mentions("ERK2's binding to TP53 doesn't need albumin's.") == 3)
+    assert(prefilter.keep("ERK2's binding to TP53"))
+    assert(prefilter.mentions("The thing is, Schmidtea mediterranea is a good model organism.") == 0)
+
+def test_prefilter_recall():
+    '''
+    Tests mentions of words that look like proteins in recall mode
+    '''
+    prefilter = Prefilter(DICTIONARY, mode="recall")
+    assert(prefilter.keep("MAPK seems to interact with chloroacetate esterase."))
+    assert(prefilter.keep("Here we show that KLF4 physically interacts with STAT3."))
+    assert(prefilter.keep("The Sak-p53 interaction needs IL-6."))
+    assert(not prefilter.keep("The Sak-p53 interaction."))
+    assert(prefilter.keep("MAPK is a better target for peroxydase."))
+    assert(not prefilter.keep("The thing is, Schmidtea mediterranea is a good model organism."))
+    assert(not prefilter.keep("However, ERK2 is better."))
+    assert((prefilter.checked, prefilter.skipped) == (7, 3))
+
+def test_prefilter_mode():
+    '''
+    Tests incorrect modes
+    '''
+    with pytest.raises(ValueError):
+        Prefilter(DICTIONARY, mode="fast")
+
+def test_prefilter_article():
+    '''
+    Tests if skipped sentences are not annotated
+    '''
+    class FakeNLP(object):
+        def __init__(self):
+            self.requests = list()
+        def annotate(self, text, properties=None):
+            self.requests.append(text)
+            sentences = [ {'tokens': [{'index': 1, 'word': line, 'characterOffsetBegin': 0}]} for line in text.split("\n") ]
+            return json.dumps({'sentences': sentences})
+    nlp = FakeNLP()
+    prefilter = Prefilter(DICTIONARY, mode="speed")
+    article = core.Article(pmid="1234", fulltext="ERK2 binds albumin. It is a good model organism. TP53 binds p53.")
+    article.annotate(splitter="regex", client=nlp, prefilter=prefilter)
+    assert([ sentence.originaltext for sentence in article.sentences ] == ["ERK2 binds albumin.", "TP53 binds p53."])
+    assert(nlp.requests == ["ERK2 binds albumin.\nTP53 binds p53."])
+    assert(prefilter.skipped == 1)
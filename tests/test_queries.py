@@ -3,6 +3,8 @@
 Test connections
 '''
 from ppaxe import core
+import io
+import threading
 
 def test_single_article_query():
     '''
@@ -99,3 +101,206 @@ def test_too_many_pmids_2():
     query = core.PMQuery(ids=identifiers, database="PUBMED")
     query.get_articles()
     assert(query.found == set(["26267445"]))
+
+def test_failed_batch_split(monkeypatch):
+    '''
+    Tests if failed batches are split so only the bad identifier is lost
+    '''
+    def fake_fetch(self, subset, retries=None):
+        if "3" in subset:
+            raise core.PubMedQueryError("Bad batch")
+        return [core.Article(pmid=identifier, abstract="Abstract") for identifier in subset]
+
+    monkeypatch.setattr(core.PMQuery, "_PMQuery__fetch", fake_fetch)
+    query = core.PMQuery(ids=[str(i) for i in range(10)], database="PUBMED")
+    query.get_articles()
+    assert(len(query.articles) == 9)
+    assert(query.failed == set(["3"]))
+    assert(query.notfound == set(["3"]))
+
+def test_esearch_history(monkeypatch):
+    '''
+    Tests if ESearch results are read from the history server response
+    '''
+    class FakeResponse(object):
+        status_code = 200
+        headers = dict()
+        content = b"""<eSearchResult><Count>1234</Count><RetMax>0</RetMax><QueryKey>1</QueryKey>
+        <WebEnv>MCID_TEST</WebEnv><TranslationStack><TermSet><Count>7</Count></TermSet></TranslationStack>
+        </eSearchResult>"""
+
+    class FakeSession(object):
+        def post(self, url, data, timeout):
+            assert(data['usehistory'] == "y")
+            return FakeResponse()
+
+    monkeypatch.setattr(core.ncbi, "get_session", FakeSession)
+    assert(core.esearch("pubmed", "MAPK1[tiab]") == ("MCID_TEST", "1", 1234))
+
+class FakeResponse(object):
+    '''
+    Response of the fake NCBI E-utilities
+    '''
+    status_code = 200
+    headers = dict()
+
+    def __init__(self, content):
+        self.content = content
+        self.raw = io.BytesIO(content)
+
+    def close(self):
+        pass
+
+def pubmed_xml(identifiers):
+    '''
+    Returns an efetch response of PubMed with an abstract for each identifier
+    '''
+    records = [
+        "<PubmedArticle><MedlineCitation><PMID>%s</PMID><Article><Journal><Title>Journal</Title></Journal>"
+        "<Abstract><AbstractText>Abstract of %s.</AbstractText></Abstract></Article></MedlineCitation></PubmedArticle>" % (identifier, identifier)
+        for identifier in identifiers
+    ]
+    return ("<PubmedArticleSet>%s</PubmedArticleSet>" % "".join(records)).encode('utf-8')
+
+class FakeEutils(object):
+    '''
+    Session that answers the E-utilities requests for the PubMed identifiers in
+    records, and keeps the url and parameters of each request
+    '''
+    def __init__(self, records):
+        self.records  = records
+        self.history  = list()
+        self.requests = list()
+
+    def get(self, url, params, timeout, stream=False):
+        self.requests.append((url, params))
+        if url == core.ncbi.ELINK_URL:
+            return FakeResponse(b"""<eLinkResult><LinkSet><LinkSetDbHistory><LinkName>pubmed_pmc</LinkName>
+            <QueryKey>3</QueryKey></LinkSetDbHistory><WebEnv>MCID_TEST</WebEnv></LinkSet></eLinkResult>""")
+        if 'WebEnv' in params:
+            start = int(params['retstart'])
+            identifiers = self.history[start:start + int(params['retmax'])]
+        else:
+            identifiers = [ identifier for identifier in params['id'].split(",") if identifier in self.records ]
+        return FakeResponse(pubmed_xml(identifiers))
+
+    def post(self, url, data, timeout):
+        self.requests.append((url, data))
+        if url == core.ncbi.EPOST_URL:
+            self.history = [ identifier for identifier in data['id'].split(",") if identifier in self.records ]
+            return FakeResponse(b"<ePostResult><QueryKey>1</QueryKey><WebEnv>MCID_TEST</WebEnv></ePostResult>")
+        return FakeResponse(("<eSearchResult><Count>%s</Count><QueryKey>2</QueryKey><WebEnv>MCID_TEST</WebEnv></eSearchResult>" % len(self.history)).encode('utf-8'))
+
+def fake_eutils(monkeypatch, records):
+    '''
+    Replaces the NCBI session (and rate limiter) with a FakeEutils for records and returns it
+    '''
+    class NoLimiter(object):
+        def acquire(self):
+            pass
+
+    session = FakeEutils(records)
+    monkeypatch.setattr(core.ncbi, "get_session", lambda: session)
+    monkeypatch.setattr(core.ncbi, "get_rate_limiter", lambda api_key=None: NoLimiter())
+    return session
+
+def test_iter_articles(monkeypatch):
+    '''
+    Tests if articles are retrieved on demand without keeping them, and if
+    "found" and "notfound" are updated while they are read
+    '''
+    session = fake_eutils(monkeypatch, [ str(idx) for idx in range(10) if idx != 7 ])
+    query = core.PMQuery(ids=[ str(idx) for idx in range(10) ], database="PUBMED", workers=1)
+    query.sizer = core.ncbi.BatchSizer(2)
+    articles = query.iter_articles()
+    assert(next(articles).pmid == "0")
+    assert(query.found == set(["0", "1"]) and not query.notfound)
+    assert(len(session.requests) < 5)
+    assert([ article.pmid for article in articles ] == ["1", "2", "3", "4", "5", "6", "8", "9"])
+    assert(query.articles == list())
+    assert(query.notfound == set(["7"]))
+    assert(list(query.pending_notfound) == [["7"]])
+    assert(len(session.requests) == 5)
+
+def test_prefetch(monkeypatch):
+    '''
+    Tests if prefetched articles are only kept with keep=True
+    '''
+    fake_eutils(monkeypatch, ["1", "2", "3"])
+    query = core.PMQuery(ids=["1", "2", "3", "4"], database="PUBMED")
+    assert([ article.pmid for article in query.prefetch(keep=False) ] == ["1", "2", "3"])
+    assert(query.articles == list())
+    assert((query.found, query.notfound) == (set(["1", "2", "3"]), set(["4"])))
+    query = core.PMQuery(ids=["1", "2", "3", "4"], database="PUBMED")
+    assert(len(list(query.prefetch())) == 3)
+    assert([ article.pmid for article in query.articles ] == ["1", "2", "3"])
+
+def test_prefetch_abandoned(monkeypatch):
+    '''
+    Tests if the background thread stops when the articles are not read to the end
+    '''
+    fake_eutils(monkeypatch, [ str(idx) for idx in range(100) ])
+    query = core.PMQuery(ids=[ str(idx) for idx in range(100) ], database="PUBMED", workers=1)
+    query.sizer = core.ncbi.BatchSizer(1)
+    before = set(threading.enumerate())
+    articles = query.prefetch(depth=1)
+    assert(next(articles).pmid == "0")
+    assert(set(threading.enumerate()) - before)
+    del articles
+    assert(not set(threading.enumerate()) - before)
+    assert(len(query.found) < 100)
+
+def test_history_pages(monkeypatch):
+    '''
+    Tests if identifiers are uploaded once with EPost and their articles are
+    retrieved in pages of the history server (retstart/retmax)
+    '''
+    session = fake_eutils(monkeypatch, ["11", "12", "13", "14", "15"])
+    query = core.PMQuery(ids=["11", "12", "13", "14", "15", "16"], database="PUBMED", history=True, workers=1)
+    query.sizer = core.ncbi.BatchSizer(2)
+    assert([ article.pmid for article in query.iter_articles() ] == ["11", "12", "13", "14", "15"])
+    (url, data) = session.requests[0]
+    assert(url == core.ncbi.EPOST_URL and data['id'] == "11,12,13,14,15,16" and data['db'] == "pubmed")
+    (url, data) = session.requests[1]
+    assert(url == core.ncbi.ESEARCH_URL and data['term'] == "#1" and data['WebEnv'] == "MCID_TEST")
+    pages = [ (params['WebEnv'], params['query_key'], params['retstart'], params['retmax']) for url, params in session.requests[2:] ]
+    assert(pages == [("MCID_TEST", "2", 0, 2), ("MCID_TEST", "2", 2, 2), ("MCID_TEST", "2", 4, 1)])
+    assert(list(query.pending_notfound) == [["16"]] and not query.failed)
+
+def test_history_lost_pages(monkeypatch):
+    '''
+    Tests if the identifiers not found are failed (not pending) when a page of
+    the history server is lost
+    '''
+    fake_eutils(monkeypatch, ["11", "12", "13", "14", "15"])
+    fetch_page = core.PMQuery._PMQuery__fetch_page
+    def failing_page(self, webenv, query_key, page, retries=None):
+        if 2 in page:
+            raise core.PubMedQueryError("Bad page")
+        return fetch_page(self, webenv, query_key, page, retries=retries)
+
+    monkeypatch.setattr(core.PMQuery, "_PMQuery__fetch_page", failing_page)
+    query = core.PMQuery(ids=["11", "12", "13", "14", "15", "16"], database="PUBMED", history=True, workers=1)
+    query.sizer = core.ncbi.BatchSizer(2)
+    assert([ article.pmid for article in query.iter_articles() ] == ["11", "12", "14", "15"])
+    assert(query.notfound == set(["13", "16"]) and query.failed == set(["13", "16"]))
+    assert(not query.pending_notfound)
+
+def test_elink_history(monkeypatch):
+    '''
+    Tests if history server queries are linked to PMC with ELink
+    '''
+    session = fake_eutils(monkeypatch, list())
+    assert(core.elink_history("pubmed", "pmc", "pubmed_pmc", "MCID_TEST", "1") == ("MCID_TEST", "3"))
+    (url, params) = session.requests[0]
+    assert(url == core.ncbi.ELINK_URL)
+    assert((params['cmd'], params['linkname'], params['query_key']) == ("neighbor_history", "pubmed_pmc", "1"))
+    # No link with that name
+    assert(core.elink_history("pubmed", "pmc", "pubmed_pmc_refs", "MCID_TEST", "1") == ("MCID_TEST", None))
+    # PMC queries are linked before paging through them
+    session = fake_eutils(monkeypatch, ["11", "12"])
+    query = core.PMQuery(ids=["11", "12"], database="PMC", history=True)
+    list(query.iter_articles())
+    assert([ url for url, params in session.requests[:3] ] == [core.ncbi.EPOST_URL, core.ncbi.ELINK_URL, core.ncbi.ESEARCH_URL])
+    assert((session.requests[2][1]['db'], session.requests[2][1]['term']) == ("pmc", "#3"))
+    assert(all(params['db'] == "pmc" for url, params in session.requests[3:]))
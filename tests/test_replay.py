@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+'''
+Tests for the record/replay annotator backend
+'''
+from ppaxe import core
+from ppaxe.replay import RecordReplay, AnnotationNotRecorded
+from ppaxe.standin import StandInAnnotator
+import pytest
+
+DICTIONARY = ["MAPK1", "TP53", "MDM2"]
+
+class CountingAnnotator(StandInAnnotator):
+    '''
+    StandInAnnotator that counts the requests
+    '''
+    def __init__(self):
+        StandInAnnotator.__init__(self, dictionary=DICTIONARY, verbs=["bind"])
+        self.requests = 0
+
+    def annotate(self, text, properties=None):
+        self.requests += 1
+        return StandInAnnotator.annotate(self, text, properties)
+
+def test_record_replay(tmpdir):
+    '''
+    Tests if recorded responses are replayed without the server
+    '''
+    path = str(tmpdir.join("annotations.jsonl"))
+    server = CountingAnnotator()
+    recorder = RecordReplay(path, client=server)
+    article = core.Article(pmid="1234", fulltext=u"MAPK1 binds TP53. It binds MDM2 (α).")
+    article.annotate(splitter="regex", client=recorder)
+    recorded = [ sentence.tokens for sentence in article.sentences ]
+    article = core.Article(pmid="1234", fulltext=u"MAPK1 binds TP53. It binds MDM2 (α).")
+    article.annotate(splitter="regex", client=recorder)
+    assert(server.requests == 1)
+    assert((recorder.hits, recorder.misses) == (1, 1))
+    replay = RecordReplay(path)
+    article = core.Article(pmid="1234", fulltext=u"MAPK1 binds TP53. It binds MDM2 (α).")
+    article.annotate(splitter="regex", client=replay)
+    assert([ sentence.tokens for sentence in article.sentences ] == recorded)
+    article.sentences[0].get_candidates()
+    assert(str(article.sentences[0].candidates[0]) == "[MAPK1] may interact with [TP53]")
+
+def test_replay_missing(tmpdir):
+    '''
+    Tests if requests that are not recorded raise AnnotationNotRecorded
+    '''
+    path = str(tmpdir.join("annotations.jsonl"))
+    RecordReplay(path, client=CountingAnnotator()).annotate("MAPK1 binds TP53.")
+    replay = RecordReplay(path)
+    assert(len(replay) == 1)
+    replay.annotate("MAPK1 binds TP53.")
+    with pytest.raises(AnnotationNotRecorded):
+        replay.annotate("MAPK1 binds TP53.", properties={'outputFormat': "conll"})
+
+def test_replay_missing_batch(tmpdir):
+    '''
+    Tests if the sentences of requests that are not recorded fail instead of
+    stopping the run
+    '''
+    path = str(tmpdir.join("annotations.jsonl"))
+    sentences = [ core.Sentence(originaltext="MAPK1 binds TP53.") ]
+    core.annotate_batch(sentences, client=RecordReplay(path, client=CountingAnnotator()))
+    sentences.append(core.Sentence(originaltext="TP53 binds MDM2."))
+    core.annotate_batch(sentences, client=RecordReplay(path))
+    assert([ sentence.failed for sentence in sentences ] == [True, True])
+    article = core.Article(pmid="1234", fulltext="MAPK1 binds TP53.")
+    article.annotate_sentences(client=RecordReplay(path))
+    assert([ sentence.failed for sentence in article.sentences ] == [False])
+    article = core.Article(pmid="1234", fulltext="TP53 binds MDM2.")
+    article.annotate_sentences(client=RecordReplay(path))
+    assert([ sentence.failed for sentence in article.sentences ] == [True])
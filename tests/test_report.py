@@ -4,7 +4,6 @@ Tests for the summary/report of the analyses
 '''
 from ppaxe import core
 from ppaxe import report
-from pycorenlp import StanfordCoreNLP
 import json
 
 
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+'''
+Tests for the sentence splitter
+'''
+from ppaxe import splitter
+import io
+import json
+import os
+import re
+import types
+
+CORPUS = os.path.join(os.path.dirname(__file__), "data", "sentences.json")
+
+def test_splitter_regression():
+    '''
+    Tests if the sentences of the regression corpus are the same as the ones
+    of the previous (one regex substitution per rule) splitter
+    '''
+    with io.open(CORPUS, encoding="utf-8") as fh:
+        cases = json.load(fh)
+    for case in cases:
+        assert(list(splitter.split_sentences(case['text'])) == case['sentences'])
+
+def test_splitter_generator():
+    '''
+    Tests if sentences are yielded lazily
+    '''
+    sentences = splitter.split_sentences("Dr. Smith studied TP53. It binds MDM2 (e.g. in vitro).")
+    assert(isinstance(sentences, types.GeneratorType))
+    assert(list(sentences) == ["Dr. Smith studied TP53.", "It binds MDM2 (e.g. in vitro)."])
+
+def test_mark_periods():
+    '''
+    Tests the marks of the rules that change the text
+    '''
+    assert(splitter.mark_periods("Abcam Inc. They") == " Abcam Inc<stop> They  ")
+    assert(splitter.mark_periods("in 4A. cells") == " in  4<prd> cells  ")
+    assert(splitter.mark_periods("(S.mediterranea)") == " (S<prd> mediterranea)  ")
+
+def test_split_spans():
+    '''
+    Tests if split_spans finds the sentences of split_sentences in the text, in
+    order and without overlapping
+    '''
+    def rewritten(text):
+        # The changes split_sentences makes to the sentences of the text
+        text = " ".join(splitter.unescape(text).split())
+        text = re.sub(r"(?<=[0-9])[A-Z](?=\.)", "", text)                # rule 11
+        text = re.sub(r"(?<=[^\s0-9][A-Z])\.(?=[a-z])", ". ", text)      # rule 14
+        text = re.sub(r"\b(Inc|Ltd|Jr|Sr|Co)\.$", r"\1", text)           # rule 8
+        for old, new in ((u".\u201d", u"\u201d."), (".\"", "\"."), ("!\"", "\"!"), ("?\"", "\"?")):
+            text = text.replace(old, new)
+        return text
+
+    with io.open(CORPUS, encoding="utf-8") as fh:
+        cases = json.load(fh)
+    for case in cases:
+        spans = splitter.split_spans(case['text'])
+        assert(all(start < end and case['text'][start:end] == case['text'][start:end].strip() for start, end in spans))
+        assert(all(previous[1] <= span[0] for previous, span in zip(spans, spans[1:])))
+        sentences = [ rewritten(case['text'][start:end]) for start, end in spans ]
+        assert(sentences == [ " ".join(sentence.split()) for sentence in case['sentences'] ])
+    text = u"Abcam Inc. They said \"MAPK1 binds TP53.\"\n(S.mediterranea) in 4A. cells."
+    assert([ text[start:end] for start, end in splitter.split_spans(text) ] == [
+        u"Abcam Inc.", u"They said \"MAPK1 binds TP53.\"", u"(S.mediterranea) in 4A. cells."
+    ])
+    assert([ rewritten(text[start:end]) for start, end in splitter.split_spans(text) ] == [
+        u"Abcam Inc", u"They said \"MAPK1 binds TP53\".", u"(S. mediterranea) in 4. cells."
+    ])
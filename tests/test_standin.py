@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+'''
+Tests for the stand-in of the StanfordCoreNLP server
+'''
+from ppaxe import core
+from ppaxe.corenlp import CoreNLPClient
+from ppaxe.standin import StandInAnnotator, StandInServer
+
+DICTIONARY = ["MAPK1", "TP53", "CHLOROACETATE ESTERASE"]
+
+def test_standin_annotator():
+    '''
+    Tests the tokens, sentences and tags of the stand-in annotator
+    '''
+    annotator = StandInAnnotator(dictionary=DICTIONARY, verbs=["bind", "phosphorylate"])
+    sentences = annotator.sentences(u"MAPK1 binds TP53. It phosphorylated α-actinin\nin cells.")
+    assert([ [ token['word'] for token in tokens ] for tokens in sentences ] == [
+        ["MAPK1", "binds", "TP53", "."], ["It", "phosphorylated", u"α-actinin", "in", "cells", "."]
+    ])
+    assert([ token['ner'] for token in sentences[0] ] == ["P", "O", "P", "O"])
+    assert((sentences[1][1]['lemma'], sentences[1][1]['pos']) == ("phosphorylate", "VBN"))
+    assert(len(annotator.sentences(u"MAPK1 binds TP53\nIt binds", eolonly=True)) == 2)
+
+def test_standin_server():
+    '''
+    Tests if the stand-in server answers like StanfordCoreNLP in both output formats
+    '''
+    server = StandInServer(("127.0.0.1", 0), StandInAnnotator(dictionary=DICTIONARY, verbs=["bind"])).start()
+    try:
+        for output_format in ("json", "conll"):
+            client = CoreNLPClient(server.url, output_format=output_format)
+            sentences = [ core.Sentence(originaltext=u"MAPK1 binds TP53 \U0001d6fc."), core.Sentence(originaltext="It binds.") ]
+            core.annotate_batch(sentences, client=client)
+            assert(sentences[0].tokens.words == ["MAPK1", "binds", "TP53", u"\U0001d6fc", "."])
+            assert(sentences[1].tokens.words == ["It", "binds", "."])
+            sentences[0].get_candidates()
+            assert(len(sentences[0].candidates) == 1)
+    finally:
+        server.shutdown()
@@ -0,0 +1,49 @@
+'''
+Tests for the compact tokens
+'''
+from ppaxe import core
+from ppaxe.tokens import Tokens, POS, LEMMAS
+
+CORENLP_TOKENS = [
+    {'index': 1, 'word': "MAPK1", 'originalText': "MAPK1", 'lemma': "MAPK1", 'pos': "NN", 'ner': "P",
+     'characterOffsetBegin': 10, 'characterOffsetEnd': 15, 'before': "", 'after': " "},
+    {'index': 2, 'word': "binds", 'originalText': "binds", 'lemma': "bind", 'pos': "VBZ", 'ner': "O",
+     'characterOffsetBegin': 16, 'characterOffsetEnd': 21, 'before': " ", 'after': " "},
+    {'index': 3, 'word': "TP53", 'originalText': "TP53", 'lemma': "TP53", 'pos': "NN", 'ner': "P",
+     'characterOffsetBegin': 22, 'characterOffsetEnd': 26, 'before': " ", 'after': ""}
+]
+
+def test_tokens():
+    '''
+    Tests if StanfordCoreNLP tokens are converted to arrays of interned ids
+    '''
+    tokens = Tokens.from_corenlp(CORENLP_TOKENS)
+    assert(len(tokens) == 3)
+    assert(tokens.words == ["MAPK1", "binds", "TP53"])
+    assert(tokens.pos[0] == tokens.pos[2] == POS.id("NN"))
+    assert(LEMMAS[tokens.lemmas[1]] == "bind")
+    assert((tokens.begin, tokens.end) == (10, 26))
+    assert(tokens[1] == {'index': 2, 'word': "binds", 'lemma': "bind", 'pos': "VBZ", 'ner': "O"})
+    assert(tokens[-1]['word'] == "TP53")
+    assert(tokens[1:].words == ["binds", "TP53"])
+    assert([ token['index'] for token in tokens ] == [1, 2, 3])
+
+def test_tokens_json():
+    '''
+    Tests if tokens are stored and read back (also in the format of StanfordCoreNLP)
+    '''
+    tokens = Tokens.from_corenlp(CORENLP_TOKENS)
+    assert(Tokens.from_json(tokens.to_json()) == tokens)
+    assert(Tokens.from_json(CORENLP_TOKENS) == tokens)
+    assert(Tokens() == list())
+
+def test_sentence_tokens():
+    '''
+    Tests if the tokens assigned to a Sentence are converted and used to find candidates
+    '''
+    sentence = core.Sentence(originaltext="MAPK1 binds TP53")
+    sentence.tokens = CORENLP_TOKENS
+    assert(isinstance(sentence.tokens, Tokens))
+    sentence.get_candidates()
+    assert(str(sentence.candidates[0]) == "[MAPK1] may interact with [TP53]")
+    assert(sentence.candidates[0].to_html() == '<span class="prot"> MAPK1 </span> <span class="verb">binds</span> <span class="prot"> TP53 </span>')